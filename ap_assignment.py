@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the AP assignment database, loaded from a CSV file or a SQLite database, with the floor each AP
+# is provisioned to. The assignments are indexed by AP hostname, serial number and MAC address.
+
+import csv
+import re
+
+import dnac_apis
+
+
+ASSIGNMENT_FIELDS = ['device_hostname', 'serial_number', 'mac_address', 'site_name', 'floor_name', 'rf_profile']
+
+
+def normalize_mac(mac_address):
+    """
+    This function will normalize the {mac_address} to the format aa:bb:cc:dd:ee:ff
+    :param mac_address: MAC address in any format, example 'AABB.CCDD.EEFF', 'aa-bb-cc-dd-ee-ff'
+    :return: normalized MAC address, or '' if not a valid MAC address
+    """
+    mac_hex = re.sub(r'[^0-9a-f]', '', (mac_address or '').lower())
+    if len(mac_hex) != 12:
+        return ''
+    return ':'.join(mac_hex[i:i + 2] for i in range(0, 12, 2))
+
+
+def load_assignment_csv(csv_file_name):
+    """
+    This function will load the AP assignments from the CSV file {csv_file_name}
+    CSV columns: device_hostname, serial_number, mac_address, site_name, floor_name, rf_profile
+    :param csv_file_name: CSV file name
+    :return: list of AP assignments
+    """
+    with open(csv_file_name, 'r') as csv_file:
+        return [dict(row) for row in csv.DictReader(csv_file)]
+
+
+def load_assignment_sqlite(db_file_name, table_name='ap_assignment'):
+    """
+    This function will load the AP assignments from the table {table_name} of the SQLite database {db_file_name}
+    The table columns are the same as the CSV file columns
+    :param db_file_name: SQLite database file name
+    :param table_name: table name
+    :return: list of AP assignments
+    """
+    import sqlite3  # only required for the SQLite assignment databases
+    connection = sqlite3.connect(db_file_name)
+    connection.row_factory = sqlite3.Row
+    try:
+        rows = connection.execute('SELECT * FROM ' + table_name).fetchall()
+    finally:
+        connection.close()
+    return [dict(row) for row in rows]
+
+
+def build_assignment_db(assignment_list):
+    """
+    This function will build the AP assignment database, with one index for each AP hostname, serial number and
+    MAC address
+    :param assignment_list: list of AP assignments
+    :return: AP assignment database
+    """
+    assignment_db = {'hostname': {}, 'serial': {}, 'mac': {}, 'floor_ids': {}}
+    for assignment in assignment_list:
+        assignment = {field: (assignment.get(field) or '').strip() for field in ASSIGNMENT_FIELDS}
+        assignment['rf_profile'] = assignment['rf_profile'] or 'TYPICAL'
+        if assignment['device_hostname']:
+            assignment_db['hostname'][assignment['device_hostname']] = assignment
+        if assignment['serial_number']:
+            assignment_db['serial'][assignment['serial_number'].upper()] = assignment
+        mac_address = normalize_mac(assignment['mac_address'])
+        if mac_address:
+            assignment_db['mac'][mac_address] = assignment
+    return assignment_db
+
+
+def load_assignment_db(file_name):
+    """
+    This function will load the AP assignment database from the CSV file or SQLite database {file_name}
+    :param file_name: file name, .csv for CSV files, any other extension for SQLite databases
+    :return: AP assignment database
+    """
+    if file_name.endswith('.csv'):
+        assignment_list = load_assignment_csv(file_name)
+    else:
+        assignment_list = load_assignment_sqlite(file_name)
+    return build_assignment_db(assignment_list)
+
+
+def get_assignment_list(assignment_db):
+    """
+    This function will return the list with all the unique AP assignments in the {assignment_db}
+    :param assignment_db: AP assignment database
+    :return: list of AP assignments
+    """
+    assignment_dict = {}
+    for index_name in ['hostname', 'serial', 'mac']:
+        for assignment in assignment_db[index_name].values():
+            assignment_dict[id(assignment)] = assignment
+    return list(assignment_dict.values())
+
+
+def resolve_floor_ids(assignment_db, dnac_jwt_token):
+    """
+    This function will find the floor id for each unique floor in the {assignment_db}, using one site hierarchy API
+    call for all the floors. The floors already resolved are skipped, the floors not found are looked up again, they may
+    be created later
+    :param assignment_db: AP assignment database
+    :param dnac_jwt_token: DNA C token
+    :return: list of the floors not found, {site_name/floor_name}
+    """
+    # index the floors by the parent building name and floor name
+    site_list = dnac_apis.get_all_site_records(dnac_jwt_token)
+    floor_index = {}
+    for site in site_list:
+        name_hierarchy = site.hierarchy.split('/')
+        if len(name_hierarchy) >= 2:
+            floor_index[(name_hierarchy[-2], name_hierarchy[-1])] = site.site_id
+
+    missing_floors = []
+    checked_floors = set()
+    for assignment in get_assignment_list(assignment_db):
+        floor_key = (assignment['site_name'], assignment['floor_name'])
+        if floor_key in checked_floors or assignment_db['floor_ids'].get(floor_key) is not None:
+            continue
+        checked_floors.add(floor_key)
+        floor_id = floor_index.get(floor_key)
+        assignment_db['floor_ids'][floor_key] = floor_id
+        if floor_id is None:
+            missing_floors.append('/'.join(floor_key))
+    return missing_floors
+
+
+def lookup_pnp_device(assignment_db, hostname=None, serial_number=None, mac_address=None):
+    """
+    This function will find the assignment for the PnP device, matching the hostname, serial number or MAC address
+    :param assignment_db: AP assignment database
+    :param hostname: PnP device hostname
+    :param serial_number: PnP device serial number
+    :param mac_address: PnP device MAC address
+    :return: AP assignment, including the {floor_id} if resolved, or {None} if the device is not assigned
+    """
+    assignment = None
+    if hostname:
+        assignment = assignment_db['hostname'].get(hostname)
+    if assignment is None and serial_number:
+        assignment = assignment_db['serial'].get(serial_number.upper())
+    if assignment is None and mac_address:
+        assignment = assignment_db['mac'].get(normalize_mac(mac_address))
+    if assignment is None:
+        return None
+    floor_id = assignment_db['floor_ids'].get((assignment['site_name'], assignment['floor_name']))
+    return dict(assignment, floor_id=floor_id)
+
+
+def match_pnp_devices(assignment_db, pnp_device_list):
+    """
+    This function will match each PnP device in the {pnp_device_list} with the AP assignment database
+    :param assignment_db: AP assignment database
+    :param pnp_device_list: list of dnac_models.PnPDevice
+    :return: list of (PnP device, AP assignment) for the matched devices, list of the unmatched PnP devices
+    """
+    matched_list = []
+    unmatched_list = []
+    for pnp_device in pnp_device_list:
+        assignment = lookup_pnp_device(assignment_db, pnp_device.hostname, pnp_device.serial_number,
+                                       pnp_device.mac_address)
+        if assignment is None or assignment['floor_id'] is None:
+            unmatched_list.append(pnp_device)
+        else:
+            matched_list.append((pnp_device, assignment))
+    return matched_list, unmatched_list
+
+
+def report_unmatched_devices(unmatched_list):
+    """
+    This function will print the PnP devices not found in the AP assignment database
+    :param unmatched_list: list of the unmatched PnP devices
+    :return:
+    """
+    if unmatched_list:
+        print('\nPnP devices not found in the AP assignment database, or floor not found:')
+        for pnp_device in unmatched_list:
+            print(' - Hostname: ', pnp_device.hostname, ' , Serial Number: ', pnp_device.serial_number,
+                  ' , MAC Address: ', pnp_device.mac_address)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the post-provision AP verification. The independent inventory lookups for the APs are made
+# concurrently: AP device info, AP location, physical topology and WLC info. The physical topology and the WLC info
+# are shared by all the APs and are cached. The AP summary includes the reachability, IP address, access switch and
+# port, location and WLC info.
+
+import time
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+import dnac_apis
+import dnac_cache
+import dnac_models
+import metrics
+
+from config import TOPOLOGY_CACHE_TTL, WLC_CACHE_TTL
+from config import VERIFY_WORKERS, VERIFY_TARGET_TIME
+
+LOGGER = logging.getLogger(__name__)
+
+# reference data reused by the AP verification: the physical topology, indexed by the link start port IP address,
+# and the WLC info, by WLC IP address
+TOPOLOGY_CACHE = dnac_cache.TTLCache(TOPOLOGY_CACHE_TTL)
+WLC_CACHE = dnac_cache.TTLCache(WLC_CACHE_TTL)
+
+
+def run_traced(trace_id, function, *args):
+    """
+    This function will call the {function} with the {args}, the API calls are recorded for the {trace_id} and the
+    verification stage. Used to run the lookups in the worker threads
+    :param trace_id: trace id, the PnP device id
+    :param function: function to call
+    :return: the function return value
+    """
+    metrics.set_trace_id(trace_id)
+    metrics.set_stage('verification')
+    try:
+        return function(*args)
+    finally:
+        metrics.set_trace_id(None)
+        metrics.set_stage(None)
+
+
+def get_ap_device_info(ap_name, dnac_jwt_token):
+    """
+    This function will find the AP inventory info, for the APs not found by the inventory change feed
+    :param ap_name: AP hostname
+    :param dnac_jwt_token: DNA C token
+    :return: AP device info, dnac_models.NetworkDevice
+    """
+    ap_device_id = dnac_apis.get_device_id_name(ap_name, dnac_jwt_token)
+    return dnac_models.NetworkDevice.from_json(dnac_apis.get_device_info(ap_device_id, dnac_jwt_token))
+
+
+def get_topology_info(dnac_jwt_token):
+    """
+    :return: the physical topology, dnac_models.Topology, from the cache if available. Cached for each cluster
+    """
+    return TOPOLOGY_CACHE.get((dnac_apis.get_dnac_url(), 'physical'), lambda: dnac_models.Topology(
+        *dnac_apis.get_physical_topology_records(dnac_jwt_token)))
+
+
+def get_wlc_info(wlc_ip, dnac_jwt_token):
+    """
+    :return: the WLC device info, dnac_models.NetworkDevice, for the WLC with the management IP address {wlc_ip},
+    from the cache if available. Cached for each cluster, the WLC not found (no hostname or id) is not cached
+    """
+    cache_key = (dnac_apis.get_dnac_url(), wlc_ip)
+    wlc_info = WLC_CACHE.get(cache_key)
+    if wlc_info is None:
+        wlc_info = dnac_models.NetworkDevice.from_json(dnac_apis.get_device_info_ip(wlc_ip, dnac_jwt_token))
+        if wlc_info.hostname and wlc_info.device_id:
+            WLC_CACHE.set(cache_key, wlc_info)
+    return wlc_info
+
+
+def verify_aps(ap_list, dnac_jwt_token, max_workers=VERIFY_WORKERS, target_time=VERIFY_TARGET_TIME):
+    """
+    This function will collect the provisioned APs info from the Cisco DNA Center Inventory, the lookups are made
+    concurrently, with up to {max_workers} lookups in progress
+    :param ap_list: list of dict with the AP {device_name}, the PnP {device_id} and the AP inventory {device_info},
+    dnac_models.NetworkDevice, {None} if not yet retrieved
+    :param dnac_jwt_token: DNA C token
+    :param max_workers: maximum number of lookups in progress at one time
+    :param target_time: verification latency target, in seconds, the slower verifications are logged
+    :return: dict with the AP name: AP summary, see {get_ap_summary}
+    """
+    start_time = time.time()
+    ap_summaries = {}
+    run_lookup = dnac_apis.with_cluster(run_traced)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # the topology is retrieved once, while the APs lookups are in progress
+        topology_future = executor.submit(run_lookup, None, get_topology_info, dnac_jwt_token)
+        info_futures = {}
+        for ap in ap_list:
+            if ap['device_info'] is None:
+                info_futures[ap['device_name']] = executor.submit(run_lookup, ap['device_id'], get_ap_device_info,
+                                                                  ap['device_name'], dnac_jwt_token)
+
+        # the location and the WLC lookups start as soon as the AP device info is available
+        ap_lookups = []
+        wlc_futures = {}
+        for ap in ap_list:
+            try:
+                device_info = ap['device_info'] or info_futures[ap['device_name']].result()
+            except Exception as lookup_error:
+                ap_summaries[ap['device_name']] = {'device_name': ap['device_name'], 'error': repr(lookup_error)}
+                continue
+            location_future = executor.submit(run_lookup, ap['device_id'], dnac_apis.get_device_location_id,
+                                              device_info.device_id, dnac_jwt_token)
+            wlc_ip = device_info.wlc_ip
+            if wlc_ip not in wlc_futures:
+                wlc_futures[wlc_ip] = executor.submit(run_lookup, ap['device_id'], get_wlc_info, wlc_ip,
+                                                      dnac_jwt_token)
+            ap_lookups.append((ap, device_info, location_future))
+
+        for ap, device_info, location_future in ap_lookups:
+            try:
+                ap_summaries[ap['device_name']] = get_ap_summary(
+                    ap['device_name'], device_info, location_future.result(), topology_future.result(),
+                    wlc_futures[device_info.wlc_ip].result())
+            except Exception as lookup_error:
+                ap_summaries[ap['device_name']] = {'device_name': ap['device_name'], 'error': repr(lookup_error)}
+
+    verify_time = time.time() - start_time
+    for ap in ap_list:
+        metrics.record_stage('verification', start_time, start_time + verify_time, [ap['device_id']])
+    if verify_time > target_time:
+        LOGGER.warning('AP verification time %.2f seconds, over the %.2f seconds target, APs count: %d',
+                       verify_time, target_time, len(ap_list))
+    return ap_summaries
+
+
+def get_ap_summary(ap_name, device_info, location, topology_info, wlc_info):
+    """
+    This function will build the AP summary from the lookups results
+    :param ap_name: AP hostname
+    :param device_info: AP inventory info, dnac_models.NetworkDevice
+    :param location: AP location
+    :param topology_info: physical topology, dnac_models.Topology
+    :param wlc_info: WLC inventory info, dnac_models.NetworkDevice
+    :return: dict with the AP {device_name}, {reachability}, {ip_address}, {switch_hostname}, {switch_port},
+    {location}, {wlc_hostname}, {wlc_ip}, and the {error} if the WLC or the location is not found
+    """
+    switch_hostname, switch_port = topology_info.find_connection(device_info.ip_address)
+    error = None
+    if wlc_info.hostname is None:
+        error = 'WLC not found, IP address: ' + str(device_info.wlc_ip)
+    elif location is None:
+        error = 'AP location not found'
+    return {'device_name': ap_name,
+            'reachability': device_info.reachability,
+            'ip_address': device_info.ip_address,
+            'switch_hostname': switch_hostname,
+            'switch_port': switch_port,
+            'location': location,
+            'wlc_hostname': wlc_info.hostname,
+            'wlc_ip': device_info.wlc_ip,
+            'error': error}
+
+
+def format_ap_comment(ap_summary):
+    """
+    This function will format the AP summary as the ServiceNow incident comment
+    :param ap_summary: AP summary
+    :return: comment with the AP info
+    """
+    if ap_summary['error']:
+        return '\nProvisioned Access Point Info not available: ' + ap_summary['error']
+    comment = '\nProvisioned Access Point Info:\n - Reachability: ' + str(ap_summary['reachability'])
+    comment += '\n - IP Address: ' + str(ap_summary['ip_address'])
+    comment += '\n - Connected to: ' + str(ap_summary['switch_hostname']) + ' , Interface: ' + str(
+        ap_summary['switch_port'])
+    comment += '\n - Location: ' + str(ap_summary['location'])
+    comment += '\n - WLC Controller: ' + str(ap_summary['wlc_hostname']) + ' , IP Address: ' + str(
+        ap_summary['wlc_ip'])
+    return comment
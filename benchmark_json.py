@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the JSON decoding benchmark for the large DNA Center and ServiceNow responses. The network device
+# inventory, physical topology, PnP device list, site floors and incidents responses, with the API fields, are
+# generated and decoded with each installed JSON backend: to the full dicts, and to the compact records from
+# "dnac_models.py". The decode time, and the memory used by the decoded objects, are reported for each 10k objects.
+
+import gc
+import sys
+import json
+import time
+import argparse
+import functools
+import tracemalloc
+
+import dnac_json
+import dnac_models
+
+
+def build_device(index):
+    """
+    :return: network device info, with the fields returned by '/api/v1/network-device'
+    """
+    return {'id': '%08x-0000-4000-8000-%012x' % (index, index), 'hostname': 'SW-%06d' % index,
+            'managementIpAddress': '10.%d.%d.%d' % (index >> 16 & 255, index >> 8 & 255, index & 255),
+            'serialNumber': 'FOC%08d' % index, 'macAddress': '00:00:0c:%02x:%02x:%02x' % (index >> 16 & 255,
+                                                                                       index >> 8 & 255, index & 255),
+            'family': 'Switches and Hubs', 'type': 'Cisco Catalyst 9300 Switch', 'platformId': 'C9300-48U',
+            'softwareVersion': '16.12.4', 'softwareType': 'IOS-XE', 'role': 'ACCESS', 'roleSource': 'AUTO',
+            'reachabilityStatus': 'Reachable', 'reachabilityFailureReason': '', 'associatedWlcIp': '',
+            'lastUpdateTime': 1600000000000 + index, 'lastUpdated': '2020-09-13 12:26:40',
+            'upTime': '1 days, 00:00:00.00', 'bootDateTime': '2020-09-12 12:26:40', 'collectionStatus': 'Managed',
+            'collectionInterval': 'Global Default', 'errorCode': None, 'errorDescription': None,
+            'interfaceCount': '56', 'lineCardCount': '2', 'lineCardId': 'a1b2c3d4, e5f6a7b8', 'memorySize': 'NA',
+            'inventoryStatusDetail': '<status><general code="SUCCESS"/></status>',
+            'series': 'Cisco Catalyst 9300 Series Switches', 'snmpContact': '', 'snmpLocation': '',
+            'tagCount': '0', 'tunnelUdpPort': None, 'waasDeviceMode': None, 'apManagerInterfaceIp': '',
+            'locationName': None, 'location': None, 'instanceTenantId': '5d817bf369136f00c74cb23b',
+            'instanceUuid': '%08x-0000-4000-8000-%012x' % (index, index)}
+
+
+def build_pnp_device(index):
+    """
+    :return: PnP device info, with the fields returned by '/dna/intent/api/v1/onboarding/pnp-device'
+    """
+    mac_address = '00:b0:26:%02x:%02x:%02x' % (index >> 16 & 255, index >> 8 & 255, index & 255)
+    return {'id': '%024x' % index, 'version': 2, 'tenantId': '5d817bf369136f00c74cb23b',
+            'deviceInfo': {'serialNumber': 'FGL%08d' % index, 'hostname': 'AP%06d' % index, 'name': 'AP%06d' % index,
+                           'macAddress': mac_address, 'pid': 'AIR-AP3802I-B-K9', 'state': 'Unclaimed',
+                           'onbState': 'Initialized', 'source': 'Network', 'family': 'Wireless',
+                           'agentType': 'IOS', 'sudiRequired': False, 'lastContact': 1600000000000 + index,
+                           'firstContact': 1600000000000, 'reloadRequested': False, 'populateInventory': True,
+                           'imageVersion': '8.10.130.0', 'imageFile': 'ap3g3-k9w8-tar.153-3.JPJ5',
+                           'addedOn': 1600000000000, 'addnMacAddrs': [mac_address], 'neighborLinks': [],
+                           'ipInterfaces': [], 'httpHeaders': [{'key': 'clientAddress', 'value': '10.95.%d.%d' % (
+                               index >> 8 & 255, index & 255)}, {'key': 'clientPort', 'value': '61000'}],
+                           'stack': False, 'deviceSudiSerialNos': ['FGL%08d' % index]},
+            'systemResetWorkflow': {'id': 'workflow', 'name': 'Reset Workflow', 'tasks': []},
+            'workflowParameters': {'configList': []}, 'runSummaryList': [], 'dayZeroConfig': {'config': ''}}
+
+
+def build_floor(index):
+    """
+    :return: site floor info, with the fields returned by '/api/v1/group?groupType=SITE'
+    """
+    return {'id': '%08x-0000-4000-9000-%012x' % (index, index), 'name': 'Floor %d' % (index % 10 + 1),
+            'groupNameHierarchy': 'Global/Site-%d/Building-%d/Floor %d' % (index // 1000, index // 10,
+                                                                           index % 10 + 1),
+            'groupTypeList': ['SITE'], 'systemGroup': False, 'parentId': '%08x-0000-4000-9000-building' % (index // 10),
+            'instanceTenantId': '5d817bf369136f00c74cb23b', 'groupHierarchy': 'a/b/c/d',
+            'additionalInfo': [{'nameSpace': 'Location', 'attributes': {'type': 'floor'}},
+                               {'nameSpace': 'mapGeometry', 'attributes': {'offsetX': '0.0', 'offsetY': '0.0',
+                                                                           'width': '200.0', 'length': '100.0',
+                                                                           'geometryType': 'DUMMYTYPE',
+                                                                           'height': '20.0'}},
+                               {'nameSpace': 'mapsSummary', 'attributes': {'floorIndex': str(index % 10 + 1),
+                                                                           'rfModel': 'Cubes And Walled Offices'}},
+                               {'nameSpace': 'com.wireless.managingwlc', 'attributes': {}}]}
+
+
+def build_incident(index):
+    """
+    :return: incident info, with some of the fields returned by the ServiceNow '/table/incident'
+    """
+    incident = {'sys_id': '%032x' % index, 'number': 'INC%07d' % index, 'state': '1', 'priority': '3',
+                'urgency': '3', 'impact': '3', 'severity': '3', 'short_description': 'AP PnP API Provisioning: AP%06d'
+                % index, 'description': '', 'opened_at': '2020-09-13 12:26:40', 'sys_updated_on': '2020-09-13 12:30:00',
+                'sys_created_on': '2020-09-13 12:26:40', 'sys_created_by': 'devnetuser', 'sys_updated_by': 'devnetuser',
+                'category': 'inquiry', 'subcategory': '', 'active': 'true', 'close_code': '', 'close_notes': '',
+                'caller_id': {'link': 'https://instance/api/now/table/sys_user/abc', 'value': 'abc'},
+                'opened_by': {'link': 'https://instance/api/now/table/sys_user/abc', 'value': 'abc'},
+                'assignment_group': '', 'assigned_to': '', 'sys_class_name': 'incident', 'sys_mod_count': '2',
+                'escalation': '0', 'upon_approval': 'proceed', 'notify': '1', 'knowledge': 'false',
+                'made_sla': 'true', 'contact_type': '', 'reassignment_count': '0', 'reopen_count': '0'}
+    return incident
+
+
+def build_responses(device_count):
+    """
+    :return: the inventory response, and the physical topology response, JSON bytes
+    """
+    device_list = [build_device(index) for index in range(device_count)]
+    node_list = [{'id': device['id'], 'label': device['hostname'], 'ip': device['managementIpAddress'],
+                  'deviceType': device['type'], 'family': device['family'], 'platformId': device['platformId'],
+                  'role': device['role'], 'softwareVersion': device['softwareVersion'], 'nodeType': 'device',
+                  'greyOut': False, 'additionalInfo': {'macAddress': device['macAddress'], 'siteid': 'site'}}
+                 for device in device_list]
+    link_list = [{'id': str(index), 'source': device_list[index]['id'], 'target': device_list[index // 48]['id'],
+                  'startPortID': 'port-a-%d' % index, 'startPortName': 'GigabitEthernet1/0/49',
+                  'startPortIpv4Address': device_list[index]['managementIpAddress'], 'startPortSpeed': '1000000',
+                  'endPortID': 'port-b-%d' % index, 'endPortName': 'GigabitEthernet1/0/%d' % (index % 48 + 1),
+                  'endPortIpv4Address': None, 'endPortSpeed': '1000000', 'linkStatus': 'up', 'greyOut': False,
+                  'additionalInfo': {}} for index in range(1, device_count)]
+    inventory_content = json.dumps({'response': device_list, 'version': '1.0'}).encode('utf-8')
+    topology_content = json.dumps({'response': {'nodes': node_list, 'links': link_list}, 'version': '1.0'})
+    return inventory_content, topology_content.encode('utf-8')
+
+
+def measure(decode_function, content, repeat):
+    """
+    Decode the {content} with the {decode_function}
+    :return: the fastest decode time in seconds, and the memory used by the decoded objects in bytes
+    """
+    gc.collect()
+    decode_time = None
+    for run in range(repeat):
+        start_time = time.perf_counter()
+        decode_function(content)
+        elapsed_time = time.perf_counter() - start_time
+        decode_time = elapsed_time if decode_time is None else min(decode_time, elapsed_time)
+    tracemalloc.start()
+    decoded = decode_function(content)
+    memory_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del decoded
+    return decode_time, memory_size
+
+
+def main():
+    """
+    Measure the decode time and memory for each response and JSON backend, full dicts and compact records
+    """
+    parser = argparse.ArgumentParser(description='JSON decoding benchmark, DNA Center and ServiceNow responses')
+    parser.add_argument('--count', type=int, default=10000, help='number of devices, and objects of each type')
+    parser.add_argument('--repeat', type=int, default=5, help='decode runs, the fastest is reported')
+    parser.add_argument('--json', default=None, help='file name to save the results, JSON format')
+    args = parser.parse_args()
+
+    inventory_content, topology_content = build_responses(args.count)
+    pnp_content = json.dumps([build_pnp_device(index) for index in range(args.count)]).encode('utf-8')
+    site_content = json.dumps({'response': [build_floor(index) for index in range(args.count)]}).encode('utf-8')
+    incident_content = json.dumps({'result': [build_incident(index) for index in range(args.count)]}).encode('utf-8')
+    topology_specs = [(('response', 'nodes'), dnac_models.TopologyNode),
+                      (('response', 'links'), dnac_models.TopologyLink)]
+    tests = [('inventory', inventory_content, [(('response',), dnac_models.NetworkDevice)]),
+             ('topology', topology_content, topology_specs),
+             ('pnp', pnp_content, [((), dnac_models.PnPDevice)]),
+             ('floors', site_content, [(('response',), dnac_models.Floor)]),
+             ('incidents', incident_content, [(('result',), dnac_models.Incident)])]
+
+    scale = 10000.0 / args.count
+    print('\nObjects of each type: ', args.count, ' , results for each 10k objects:')
+    print('\n%-10s %-8s %-8s %14s %14s' % ('response', 'backend', 'result', 'decode (ms)', 'memory (MB)'))
+    result_list = []
+    for response_name, content, list_specs in tests:
+        for result_type in ['dicts', 'records']:
+            for backend in dnac_json.JSON_BACKENDS:
+                if result_type == 'dicts':
+                    decode_function = functools.partial(dnac_json.loads, backend=backend)
+                else:
+                    decode_function = functools.partial(dnac_json.decode_record_lists, list_specs=list_specs,
+                                                        backend=backend)
+                decode_time, memory_size = measure(decode_function, content, args.repeat)
+                result_list.append({'response': response_name, 'backend': backend, 'result': result_type,
+                                    'decode_ms': decode_time * 1000 * scale, 'memory_mb': memory_size / 1e6 * scale})
+                print('%-10s %-8s %-8s %14.1f %14.1f' % (response_name, backend, result_type,
+                                                          decode_time * 1000 * scale, memory_size / 1e6 * scale))
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(result_list, json_file, indent=4)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the AP onboarding benchmark. The full "dnac_pnp_ap.py" onboarding flow is run for N APs against
+# the local stub server, and the wall time, the API request counts and the p50/p99 API call latencies are reported.
+
+import io
+import sys
+import json
+import time
+import argparse
+
+from contextlib import redirect_stdout
+
+import dnac_apis
+import service_now_apis
+import ap_assignment
+import dnac_pnp_ap
+import dnac_stub_server
+import metrics
+
+
+def percentile(value_list, percent):
+    """
+    This function will return the {percent} percentile of the {value_list}, nearest rank method
+    :param value_list: list of values
+    :param percent: percentile, between 0 and 100
+    :return: percentile value, or 0 if the list is empty
+    """
+    if not value_list:
+        return 0.0
+    sorted_list = sorted(value_list)
+    index = max(0, int(round(percent / 100.0 * len(sorted_list) + 0.5)) - 1)
+    return sorted_list[min(index, len(sorted_list) - 1)]
+
+
+def run_onboarding_benchmark(ap_count, inventory_size=100, latency=0.02, error_rate=0.0, provision_time=3.0,
+                             poll_interval=1.0):
+    """
+    This function will run the onboarding flow for {ap_count} APs against a new stub server
+    :param ap_count: number of APs to onboard
+    :param inventory_size: number of switches in the stub inventory
+    :param latency: average stub response latency, in seconds
+    :param error_rate: fraction of the stub requests failed
+    :param provision_time: time from the AP claim to the Provisioned state, in seconds
+    :param poll_interval: PnP state poll interval, in seconds
+    :return: dict with the benchmark results
+    """
+    server, base_url = dnac_stub_server.start_stub_server(ap_count=ap_count, inventory_size=inventory_size,
+                                                          latency=latency, error_rate=error_rate,
+                                                          provision_time=provision_time)
+    dnac_apis.DNAC_URL = base_url
+    service_now_apis.SNOW_URL = base_url + '/api/now'
+    metrics.reset()
+
+    assignment_list = [{'device_hostname': pnp_device['deviceInfo']['hostname'],
+                        'site_name': dnac_stub_server.SITE_NAME, 'floor_name': dnac_stub_server.FLOOR_NAME}
+                       for pnp_device in server.state.pnp_devices]
+
+    onboarded_count = 0
+    error = None
+    start_time = time.time()
+    try:
+        with redirect_stdout(io.StringIO()):
+            dnac_token = dnac_apis.get_dnac_jwt_token(dnac_apis.DNAC_AUTH)
+            assignment_db = ap_assignment.build_assignment_db(assignment_list)
+            ap_assignment.resolve_floor_ids(assignment_db, dnac_token)
+            matched_list = dnac_pnp_ap.discover_pnp_devices(assignment_db, dnac_token)
+            onboarding_list = dnac_pnp_ap.onboard_pnp_devices(matched_list, dnac_token, poll_interval=poll_interval,
+                                                              settle_time=0)
+            onboarded_count = len(onboarding_list)
+    except Exception as benchmark_error:
+        error = repr(benchmark_error)
+    wall_time = time.time() - start_time
+    server.shutdown()
+    server.server_close()
+
+    # the responses served from the HTTP cache are not requests to the server
+    call_list = [record for record in metrics.CALL_RECORDS if record['status'] != 'cache_hit']
+    latency_list = [record['latency'] for record in call_list]
+    endpoint_counts = {}
+    for record in call_list:
+        endpoint = record['method'] + ' ' + record['endpoint']
+        endpoint_counts[endpoint] = endpoint_counts.get(endpoint, 0) + 1
+    return {'aps': ap_count, 'onboarded': onboarded_count, 'error': error, 'wall_time': wall_time,
+            'requests': server.request_count, 'requests_per_ap': server.request_count / float(ap_count),
+            'p50_latency': percentile(latency_list, 50), 'p99_latency': percentile(latency_list, 99),
+            'endpoint_counts': endpoint_counts}
+
+
+def main():
+    """
+    Run the onboarding benchmark for each of the AP counts, and print the results
+    """
+    parser = argparse.ArgumentParser(description='AP onboarding benchmark, using the stub server')
+    parser.add_argument('--aps', default='1,10,50', help='comma separated AP counts, one run for each')
+    parser.add_argument('--inventory-size', type=int, default=100, help='number of switches in the inventory')
+    parser.add_argument('--latency', type=float, default=0.02, help='average response latency, seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of the requests failed')
+    parser.add_argument('--provision-time', type=float, default=3.0, help='AP claim to Provisioned time, seconds')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='PnP state poll interval, seconds')
+    parser.add_argument('--json', default=None, help='file name to save the results, JSON format')
+    args = parser.parse_args()
+
+    result_list = []
+    print('\n   APs  onboarded   wall time (s)   requests   requests/AP   p50 (ms)   p99 (ms)')
+    for ap_count in [int(count) for count in args.aps.split(',')]:
+        result = run_onboarding_benchmark(ap_count, args.inventory_size, args.latency, args.error_rate,
+                                          args.provision_time, args.poll_interval)
+        result_list.append(result)
+        print('%6d  %9d   %13.2f   %8d   %11.1f   %8.1f   %8.1f' % (
+            result['aps'], result['onboarded'], result['wall_time'], result['requests'], result['requests_per_ap'],
+            result['p50_latency'] * 1000, result['p99_latency'] * 1000))
+        if result['error']:
+            print('        run failed: ', result['error'])
+
+    print('\nRequests for each endpoint, last run:')
+    for endpoint, count in sorted(result_list[-1]['endpoint_counts'].items(), key=lambda item: -item[1]):
+        print('%8d  %s' % (count, endpoint))
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(result_list, json_file, indent=4)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
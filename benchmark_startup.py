@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the startup benchmark for the applications entry points. Each entry point module is imported in
+# a new interpreter with "python -X importtime", and the module import time is compared with the budget.
+# The heavy optional dependencies are loaded only by the code paths using them, the benchmark fails if any of them is
+# imported at startup.
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+# modules imported only when needed: SSH to the WLC, YAML site plans, SQLite assignment database, daemon status server
+LAZY_MODULES = ['netmiko', 'paramiko', 'cryptography', 'yaml', 'sqlite3', 'http.server']
+
+# entry point module: the lazy modules the entry point needs at startup
+ENTRY_POINTS = {'dnac_pnp_ap': [],
+                'dnac_pnp_ap_reset': [],
+                'site_plan': [],
+                'pnp_daemon': ['http.server']}
+
+
+def parse_importtime(output):
+    """
+    This function will parse the "python -X importtime" output
+    :param output: the interpreter stderr output
+    :return: list of dict with the {module}, {level}, {self_us} and {cumulative_us}, in the import order
+    """
+    import_list = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative_time, module_name = line[len('import time:'):].split('|')
+        import_list.append({'module': module_name.strip(),
+                            'level': (len(module_name) - len(module_name.lstrip()) - 1) // 2,
+                            'self_us': int(self_time), 'cumulative_us': int(cumulative_time)})
+    return import_list
+
+
+def measure_import(module_name, repeat=5):
+    """
+    This function will import the {module_name} in a new interpreter, {repeat} times
+    :param module_name: entry point module name
+    :param repeat: number of runs, the fastest run is reported
+    :return: dict with the {module}, the import time {import_ms}, the {lazy_violations} and the {top_imports}
+    """
+    best_import_list = None
+    best_time = None
+    for run in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module_name],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            return {'module': module_name, 'import_ms': None, 'lazy_violations': [],
+                    'top_imports': [], 'error': result.stderr.strip().splitlines()[-1]}
+        import_list = parse_importtime(result.stderr)
+        module_time = [record['cumulative_us'] for record in import_list if record['module'] == module_name][-1]
+        if best_time is None or module_time < best_time:
+            best_time = module_time
+            best_import_list = import_list
+
+    imported_modules = set(record['module'] for record in best_import_list)
+    lazy_violations = [lazy_module for lazy_module in LAZY_MODULES
+                       if lazy_module in imported_modules and lazy_module not in ENTRY_POINTS[module_name]]
+    top_imports = sorted([record for record in best_import_list if record['level'] == 1],
+                         key=lambda record: -record['cumulative_us'])[:5]
+    return {'module': module_name, 'import_ms': best_time / 1000.0, 'lazy_violations': lazy_violations,
+            'top_imports': [(record['module'], record['cumulative_us'] / 1000.0) for record in top_imports],
+            'error': None}
+
+
+def main():
+    """
+    Measure the import time of each entry point, print the results, exit status 1 if any entry point is over budget
+    """
+    parser = argparse.ArgumentParser(description='Entry points startup benchmark, using python -X importtime')
+    parser.add_argument('--budget-ms', type=float, default=250.0, help='import time budget, milliseconds')
+    parser.add_argument('--repeat', type=int, default=5, help='runs for each entry point, the fastest is reported')
+    parser.add_argument('--json', default=None, help='file name to save the results, JSON format')
+    args = parser.parse_args()
+
+    result_list = []
+    failed = False
+    print('\n%-20s %12s   %s' % ('entry point', 'import (ms)', 'slowest imports (ms)'))
+    for module_name in ENTRY_POINTS:
+        result = measure_import(module_name, args.repeat)
+        result_list.append(result)
+        if result['error']:
+            print('%-20s %12s   %s' % (module_name, 'failed', result['error']))
+            failed = True
+            continue
+        top_imports = ', '.join('%s %.1f' % (name, import_ms) for name, import_ms in result['top_imports'])
+        print('%-20s %12.1f   %s' % (module_name, result['import_ms'], top_imports))
+        if result['import_ms'] > args.budget_ms:
+            print('    over the %.0f ms budget' % args.budget_ms)
+            failed = True
+        if result['lazy_violations']:
+            print('    imported at startup: ', ', '.join(result['lazy_violations']))
+            failed = True
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(result_list, json_file, indent=4)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,6 +22,19 @@ SNOW_DEV = 'admin'
 SNOW_PASS = 'Cisco123!'
 SNOW_INSTANCE = 'dev12345'
 
+# Time to live of the incidents and users sys_id cached by the ServiceNow functions, in seconds
+SNOW_CACHE_TTL = 3600
+
+
+# Update this section with the Google API key, used for the building address geolocation
+GOOGLE_API_KEY = 'google_api_key'
+
+# Local geolocation cache file, cache entries time to live in seconds (None - never expire), and the offline mode.
+# In offline mode the Google API is not called, only the cached addresses may be used to create buildings
+GEO_CACHE_FILE = 'geo_cache.json'
+GEO_CACHE_TTL = None
+GEO_OFFLINE = False
+
 
 # Update this section with AP PnP Controller
 PnP_WLC_IP = '10.1.1.2'
@@ -31,4 +44,131 @@ PnP_WLC_NAME = 'C9800-CL'
 
 
 # Update this section with the AP Assignment info
+# AP_ASSIGN_FILE - CSV file or SQLite database with the AP assignments, columns: device_hostname, serial_number,
+# mac_address, site_name, floor_name, rf_profile. AP_ASSIGN_SITE is used if the AP_ASSIGN_FILE does not exist
 AP_ASSIGN_SITE = {'device_hostname': 'APB026.80DF.6E18', 'site_name': 'PDX', 'floor_name': 'Floor 3'}
+AP_ASSIGN_FILE = 'ap_assignment.csv'
+
+
+# Local file with the digests of the last committed CLI templates content, used to skip unchanged template uploads
+TEMPLATE_DIGEST_FILE = 'template_digests.json'
+
+
+# Maximum number of site hierarchy nodes created in parallel, at each level, by the site plan loader
+SITE_PLAN_WORKERS = 10
+
+
+# Maximum number of PnP AP claim requests in progress at one time, for the bulk claims
+PNP_CLAIM_CHUNK_SIZE = 10
+
+
+# Onboarding latency instrumentation, Prometheus metrics file (textfile collector format) and JSON AP traces directory
+METRICS_FILE = 'onboarding_metrics.prom'
+TRACE_DIR = 'onboarding_traces'
+
+
+# Application logging: JSON records to the LOG_FILE, rotated when the size reaches LOG_MAX_BYTES, LOG_BACKUP_COUNT
+# rotated files kept. Only the LOG_DEBUG_SAMPLE_RATE fraction of the per-request HTTP debug records are logged
+LOG_FILE = 'application_run.log'
+LOG_LEVEL = 'DEBUG'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_DEBUG_SAMPLE_RATE = 0.1
+
+
+# PnP onboarding timers, in seconds: the PnP state poll interval, and the maximum time to wait for the provisioned APs
+# to be added to the inventory after the WLC re-sync. The maximum time to wait for the claimed devices to be
+# provisioned, the devices not provisioned are failed, and the number of consecutive PnP poll errors after which a new
+# DNA Center token is created
+PNP_POLL_INTERVAL = 5
+INVENTORY_SETTLE_TIME = 60
+PNP_PROVISION_TIMEOUT = 900
+PNP_POLL_MAX_ERRORS = 3
+
+
+# DNA Center JWT token reuse, a new token is created when the token age reaches DNAC_TOKEN_MAX_AGE, in seconds
+DNAC_TOKEN_MAX_AGE = 3000
+
+
+# Maximum number of raw stage and API call records kept in memory by the latency instrumentation
+METRICS_MAX_RECORDS = 100000
+
+
+# Onboarding daemon: PnP scan interval (seconds), number of onboarding workers, maximum number of devices onboarded
+# in one batch, and the local HTTP status endpoint port. The time after which the devices not onboarded are queued
+# again, if found in the PnP scan. Reference data cache time to live, in seconds
+DAEMON_SCAN_INTERVAL = 10
+DAEMON_WORKERS = 2
+DAEMON_BATCH_SIZE = 50
+DAEMON_STATUS_PORT = 8081
+DAEMON_RETRY_INTERVAL = 300
+TOPOLOGY_CACHE_TTL = 300
+WLC_CACHE_TTL = 3600
+SITE_CACHE_TTL = 3600
+
+
+# Inventory delta sync: devices retrieved with each API call, the time after which the changed devices are retrieved
+# even if the device count is unchanged, and the inventory poll interval while waiting for the new APs, in seconds
+INVENTORY_SYNC_PAGE_SIZE = 100
+INVENTORY_SYNC_FORCE_INTERVAL = 60
+INVENTORY_POLL_INTERVAL = 5
+
+
+# Post-provision AP verification: maximum number of inventory lookups in progress at one time, and the verification
+# latency target for each batch of APs, in seconds. The slower verifications are logged
+VERIFY_WORKERS = 10
+VERIFY_TARGET_TIME = 5
+
+
+# Device health collector: collection interval (seconds), maximum number of health requests in progress at one time,
+# local time series store file, and the number of samples kept for each device
+HEALTH_INTERVAL = 300
+HEALTH_WORKERS = 10
+HEALTH_STORE_FILE = 'device_health.dat'
+HEALTH_MAX_SAMPLES = 2016
+
+
+# Local devices configuration archive directory: compressed configurations, and the SQLite versions index
+CONFIG_ARCHIVE_DIR = 'config_archive'
+
+
+# Path trace batch runner: maximum number of path traces in progress at one time, completed path traces cache time
+# to live, and the maximum time to wait for each path trace, in seconds
+PATH_TRACE_MAX_IN_FLIGHT = 5
+PATH_TRACE_CACHE_TTL = 300
+PATH_TRACE_TIMEOUT = 120
+
+
+# Host table snapshot cache: snapshot time to live (seconds), hosts retrieved with each API call, and the maximum
+# number of pages retrieved at one time
+HOST_CACHE_TTL = 300
+HOST_PAGE_SIZE = 500
+HOST_LOAD_WORKERS = 5
+
+
+# DNA Center GET responses cache: time to live for each endpoint (seconds), the responses with ETag or Last-Modified
+# headers are revalidated after the time to live, or on each call for the endpoints not listed. Maximum number of
+# cached responses and total size, and the optional disk cache directory
+HTTP_CACHE_TTLS = {
+    '/api/v1/template-programmer/project': 300,
+    '/api/v1/network-device-poller/cli/legit-reads': 3600,
+    '/api/v1/group': 300
+}
+HTTP_CACHE_MAX_ENTRIES = 256
+HTTP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+HTTP_CACHE_DIR = None
+
+
+# DNA Center clusters, for the multi-cluster operations in "dnac_clusters.py": cluster name: URL, username, password
+# and region. Maximum number of clusters queried at one time, and the cross-cluster inventory cache time to live
+DNAC_CLUSTERS = {
+    'default': {'url': DNAC_URL, 'username': DNAC_USER, 'password': DNAC_PASS, 'region': 'default'}
+}
+CLUSTER_WORKERS = 8
+CLUSTER_CACHE_TTL = 300
+
+
+# Offline configuration analytics: number of parser processes, default the number of CPUs, and the number of
+# configurations sent to a parser process at one time
+CONFIG_ANALYTICS_WORKERS = None
+CONFIG_ANALYTICS_BATCH_SIZE = 50
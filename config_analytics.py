@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the offline configuration analytics. The running configurations, retrieved from DNA Center or
+# read from the local configuration archive, are streamed in batches to a pool of parser processes, one for each CPU
+# by default. Each process parses the interfaces and the "ip address" commands, and the results are aggregated: the
+# IP address usage, the duplicate IP addresses, the subnets, and the interface inventory of each device. The archived
+# configurations are read and decompressed by the parser processes.
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import dnac_apis
+import config_archive
+
+from config import CONFIG_ARCHIVE_DIR, CONFIG_ANALYTICS_WORKERS, CONFIG_ANALYTICS_BATCH_SIZE
+
+
+INTERFACE_PATTERN = re.compile(r'^interface (\S+)')
+IP_ADDRESS_PATTERN = re.compile(r'^ ip address (\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}) '
+                                r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})( secondary)?')
+
+
+def parse_config(config_text):
+    """
+    This function will parse the interfaces from the device configuration, see {utils.identify_ipv4_address}
+    :param config_text: running configuration
+    :return: list of (interface name, description, shutdown, list of (IPv4 address, subnet, secondary))
+    """
+    interface_list = []
+    interface = None
+    for line in config_text.splitlines():
+        if not line.startswith(' '):
+            interface = None
+            match = INTERFACE_PATTERN.match(line)
+            if match:
+                interface = {'name': match.group(1), 'description': None, 'shutdown': False, 'addresses': []}
+                interface_list.append(interface)
+        elif interface is not None:
+            if line.startswith(' ip address '):
+                match = IP_ADDRESS_PATTERN.match(line)
+                subnet = get_subnet(match.group(1), match.group(2)) if match else None
+                if subnet:
+                    interface['addresses'].append((match.group(1), subnet, bool(match.group(3))))
+            elif line.startswith(' description '):
+                interface['description'] = line[len(' description '):].strip()
+            elif line.strip() == 'shutdown':
+                interface['shutdown'] = True
+    # tuples, smaller to send back from the parser process
+    return [(interface['name'], interface['description'], interface['shutdown'], interface['addresses'])
+            for interface in interface_list]
+
+
+def get_subnet(ip_address, mask):
+    """
+    This function will return the subnet for the IPv4 {ip_address} and {mask}, integer math, the ipaddress module is
+    much slower for the thousands of addresses in the configurations
+    :param ip_address: IPv4 address, example '10.93.130.1'
+    :param mask: subnet mask, example '255.255.255.0'
+    :return: the subnet, example '10.93.130.0/24', or {None} if the address or the mask is not valid
+    """
+    address_octets = [int(octet) for octet in ip_address.split('.')]
+    mask_octets = [int(octet) for octet in mask.split('.')]
+    if max(address_octets) > 255 or max(mask_octets) > 255:
+        return None
+    mask_value = (mask_octets[0] << 24) | (mask_octets[1] << 16) | (mask_octets[2] << 8) | mask_octets[3]
+    prefix_length = bin(mask_value).count('1')
+    if mask_value != (0xffffffff << (32 - prefix_length)) & 0xffffffff:
+        return None
+    return '.'.join(str(address_octet & mask_octet) for address_octet, mask_octet in
+                    zip(address_octets, mask_octets)) + '/' + str(prefix_length)
+
+
+def parse_batch(config_batch):
+    """
+    This function will parse a batch of configurations, in the parser process
+    :param config_batch: list of (hostname, configuration text, archived configuration file name), the file is read
+    if the configuration text is {None}
+    :return: list of (hostname, interface list, error), see {parse_config}
+    """
+    result_list = []
+    for hostname, config_text, file_name in config_batch:
+        try:
+            if config_text is None:
+                config_text = config_archive.read_object_file(file_name)
+            result_list.append((hostname, parse_config(config_text), None))
+        except Exception as parse_error:
+            result_list.append((hostname, None, repr(parse_error)))
+    return result_list
+
+
+class ConfigAnalysis:
+    """
+    The configuration analytics results: the IP address usage, the subnets and the interfaces of each device
+    """
+
+    def __init__(self):
+        self.ip_usage = {}  # IPv4 address: first (hostname, interface name)
+        self.duplicates = {}  # IPv4 address: list of (hostname, interface name), the addresses used more than once
+        self.subnets = {}  # subnet: number of addresses configured
+        self.interfaces = {}  # hostname: interface list, see {parse_config}
+        self.errors = {}  # hostname: parse error
+        self.config_count = 0
+
+    def add_results(self, result_list):
+        """
+        Add the parser results for a batch of configurations, see {parse_batch}. The parser processes do the CPU
+        bound work, this function is kept short, it runs in the main process for all the configurations
+        """
+        ip_usage = self.ip_usage
+        subnets = self.subnets
+        for hostname, interface_list, error in result_list:
+            self.config_count += 1
+            if error is not None:
+                self.errors[hostname] = error
+                continue
+            self.interfaces[hostname] = interface_list
+            for name, description, shutdown, address_list in interface_list:
+                for ip_address, subnet, secondary in address_list:
+                    usage = (hostname, name)
+                    first_usage = ip_usage.setdefault(ip_address, usage)
+                    if first_usage is not usage:
+                        self.duplicates.setdefault(ip_address, [first_usage]).append(usage)
+                    subnets[subnet] = subnets.get(subnet, 0) + 1
+
+    def get_duplicates(self):
+        """
+        :return: dict with the IPv4 address: list of (hostname, interface name), for the addresses configured on more
+        than one interface
+        """
+        return self.duplicates
+
+    def get_inventory(self):
+        """
+        :return: dict with the hostname: list of dict with the interface {name}, {description}, {shutdown} and
+        {addresses}, list of dict with the {ip_address}, {subnet} and {secondary}
+        """
+        return dict((hostname, [{'name': name, 'description': description, 'shutdown': shutdown,
+                                 'addresses': [{'ip_address': ip_address, 'subnet': subnet, 'secondary': secondary}
+                                               for ip_address, subnet, secondary in address_list]}
+                                for name, description, shutdown, address_list in interface_list])
+                    for hostname, interface_list in self.interfaces.items())
+
+    def get_report(self):
+        """
+        :return: dict with the summary, the duplicate IP addresses, the subnets and the interfaces inventory
+        """
+        return {'configs': self.config_count,
+                'interfaces': sum(len(device_interfaces) for device_interfaces in self.interfaces.values()),
+                'addresses': len(self.ip_usage),
+                'duplicates': self.get_duplicates(),
+                'subnets': self.subnets,
+                'errors': self.errors,
+                'inventory': self.get_inventory()}
+
+
+def iter_batches(config_source, batch_size):
+    """
+    This function will group the configurations from the {config_source} in batches of {batch_size}
+    """
+    config_batch = []
+    for config_item in config_source:
+        config_batch.append(config_item)
+        if len(config_batch) == batch_size:
+            yield config_batch
+            config_batch = []
+    if config_batch:
+        yield config_batch
+
+
+def iter_dnac_configs(dnac_jwt_token):
+    """
+    This function will retrieve all the devices configurations from DNA Center
+    :param dnac_jwt_token: DNA C token
+    :return: generator of (hostname, configuration text, None)
+    """
+    hostnames = dict((device.device_id, device.hostname)
+                     for device in dnac_apis.get_all_device_records(dnac_jwt_token))
+    for config in dnac_apis.get_all_configs(dnac_jwt_token):
+        yield hostnames.get(config['id']) or config['id'], config['runningConfig'], None
+
+
+def iter_archive_configs(archive_dir=CONFIG_ARCHIVE_DIR):
+    """
+    This function will list the latest archived configuration of each device, the configurations are read by the
+    parser processes
+    :param archive_dir: configuration archive directory
+    :return: generator of (hostname, None, configuration file name)
+    """
+    archive = config_archive.ConfigArchive(archive_dir)
+    try:
+        version_list = archive.get_latest_versions()
+    finally:
+        archive.close()
+    for hostname, digest in version_list:
+        yield hostname, None, config_archive.get_object_file_name(archive_dir, digest)
+
+
+def analyze_configs(config_source, max_workers=CONFIG_ANALYTICS_WORKERS, batch_size=CONFIG_ANALYTICS_BATCH_SIZE):
+    """
+    This function will parse the configurations from the {config_source}, with a pool of {max_workers} processes.
+    The configurations are streamed: up to two batches for each process are waiting or in progress at one time.
+    The results are merged in this process. The merge allocates many small tuples, and its time includes the garbage
+    collector passes over the growing results; the collector is not paused, it is shared by all the process threads
+    :param config_source: iterable of (hostname, configuration text, archived configuration file name)
+    :param max_workers: number of parser processes, default the number of CPUs, 0 to parse in this process
+    :param batch_size: number of configurations sent to a parser process at one time
+    :return: ConfigAnalysis
+    """
+    analysis = ConfigAnalysis()
+    batches = iter_batches(config_source, batch_size)
+    if max_workers == 0:
+        for config_batch in batches:
+            analysis.add_results(parse_batch(config_batch))
+        return analysis
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = set()
+        for config_batch in batches:
+            in_flight.add(executor.submit(parse_batch, config_batch))
+            if len(in_flight) >= max_workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    analysis.add_results(future.result())
+        for future in in_flight:
+            analysis.add_results(future.result())
+    return analysis
+
+
+def main():
+    """
+    Analyze the devices configurations, and print the summary and the duplicate IP addresses
+    """
+    parser = argparse.ArgumentParser(description='Offline configuration analytics, parallel configuration parsing')
+    parser.add_argument('source', choices=['dnac', 'archive'], help='configurations source')
+    parser.add_argument('--archive-dir', default=CONFIG_ARCHIVE_DIR, help='configuration archive directory')
+    parser.add_argument('--workers', type=int, default=CONFIG_ANALYTICS_WORKERS,
+                        help='parser processes, default the number of CPUs, 0 to parse in this process')
+    parser.add_argument('--batch-size', type=int, default=CONFIG_ANALYTICS_BATCH_SIZE,
+                        help='configurations sent to a parser process at one time')
+    parser.add_argument('--json', default=None, help='file name to save the report, JSON format')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.source == 'dnac':
+        config_source = iter_dnac_configs(dnac_apis.get_dnac_token())
+    else:
+        config_source = iter_archive_configs(args.archive_dir)
+    analysis = analyze_configs(config_source, args.workers, args.batch_size)
+    elapsed_time = time.time() - start_time
+
+    report = analysis.get_report()
+    for ip_address, usage_list in sorted(report['duplicates'].items()):
+        print('%-16s %s' % (ip_address, ' , '.join(hostname + ' ' + name for hostname, name in usage_list)))
+    print('\nConfigurations: ', report['configs'], ' , interfaces: ', report['interfaces'], ' , IP addresses: ',
+          report['addresses'], ' , subnets: ', len(report['subnets']), ' , duplicate IP addresses: ',
+          len(report['duplicates']), ' , errors: ', len(report['errors']))
+    config_rate = report['configs'] / max(elapsed_time, 1e-6)
+    print('Time: %.2f seconds, %.0f configurations/second' % (elapsed_time, config_rate))
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(report, json_file, indent=4)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
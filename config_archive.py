@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the local devices configuration archive. Each configuration is saved once, zlib compressed, to
+# a file named by the SHA-256 digest of the content. A new version is indexed, in the SQLite database, only when the
+# device configuration digest changes. The configuration versions may be listed, read and compared by device and
+# date, without any DNA Center API calls.
+
+import os
+import sys
+import mmap
+import time
+import zlib
+import sqlite3
+import difflib
+import hashlib
+import argparse
+
+import dnac_apis
+
+from config import CONFIG_ARCHIVE_DIR
+
+
+INDEX_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS device (
+    device_id TEXT PRIMARY KEY,
+    hostname TEXT,
+    digest TEXT,
+    checked REAL
+);
+CREATE TABLE IF NOT EXISTS config_version (
+    device_id TEXT,
+    hostname TEXT,
+    digest TEXT,
+    archived REAL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS config_version_hostname ON config_version (hostname, archived);
+CREATE INDEX IF NOT EXISTS config_version_device ON config_version (device_id, archived);
+'''
+
+
+class ConfigArchive:
+    """
+    Content addressed, compressed, configuration archive, with the SQLite index of the configuration versions
+    """
+
+    def __init__(self, archive_dir=CONFIG_ARCHIVE_DIR):
+        """
+        :param archive_dir: archive directory name, created if missing
+        """
+        self.archive_dir = archive_dir
+        if not os.path.isdir(os.path.join(archive_dir, 'objects')):
+            os.makedirs(os.path.join(archive_dir, 'objects'))
+        self.index = sqlite3.connect(os.path.join(archive_dir, 'index.db'))
+        self.index.executescript(INDEX_SCHEMA)
+
+    def close(self):
+        self.index.close()
+
+    def object_file_name(self, digest):
+        """
+        :return: the file name for the configuration with the {digest}, objects/{digest[:2]}/{digest}.z
+        """
+        return get_object_file_name(self.archive_dir, digest)
+
+    def store_config(self, device_id, hostname, config_text, timestamp=None):
+        """
+        Save the device configuration, if changed since the last version
+        :param device_id: DNA C device id
+        :param hostname: device hostname
+        :param config_text: running configuration
+        :param timestamp: archive epoch time, default now
+        :return: the configuration digest, and {True} if a new version was saved
+        """
+        timestamp = timestamp or time.time()
+        config_bytes = config_text.encode('utf-8')
+        digest = hashlib.sha256(config_bytes).hexdigest()
+        row = self.index.execute('SELECT digest FROM device WHERE device_id = ?', (device_id,)).fetchone()
+        self.index.execute('INSERT OR REPLACE INTO device (device_id, hostname, digest, checked) VALUES (?, ?, ?, ?)',
+                           (device_id, hostname, digest, timestamp))
+        if row is not None and row[0] == digest:
+            return digest, False
+
+        # the same configuration content is saved only once, for all the devices
+        file_name = self.object_file_name(digest)
+        if not os.path.isfile(file_name):
+            if not os.path.isdir(os.path.dirname(file_name)):
+                os.makedirs(os.path.dirname(file_name))
+            with open(file_name + '.tmp', 'wb') as object_file:
+                object_file.write(zlib.compress(config_bytes, 9))
+            os.replace(file_name + '.tmp', file_name)
+        self.index.execute('INSERT INTO config_version (device_id, hostname, digest, archived, size) '
+                           'VALUES (?, ?, ?, ?, ?)', (device_id, hostname, digest, timestamp, len(config_bytes)))
+        return digest, True
+
+    def archive_all(self, dnac_jwt_token):
+        """
+        Retrieve all the devices configurations, and save the changed configurations
+        :param dnac_jwt_token: DNA C token
+        :return: number of configurations retrieved, and number of new versions saved
+        """
+        hostnames = dict((device.device_id, device.hostname)
+                         for device in dnac_apis.get_all_device_records(dnac_jwt_token))
+        config_list = dnac_apis.get_all_configs(dnac_jwt_token)
+        timestamp = time.time()
+        changed_count = 0
+        for config in config_list:
+            digest, changed = self.store_config(config['id'], hostnames.get(config['id']), config['runningConfig'],
+                                                timestamp)
+            changed_count += changed
+        self.index.commit()
+        return len(config_list), changed_count
+
+    def read_config(self, digest):
+        """
+        Read the configuration with the {digest}, the compressed file is memory mapped and decompressed
+        :param digest: configuration digest
+        :return: configuration text
+        """
+        return read_object_file(self.object_file_name(digest))
+
+    def get_latest_versions(self):
+        """
+        List the latest configuration version of each device
+        :return: list of (hostname, digest), sorted by hostname
+        """
+        return self.index.execute('SELECT hostname, digest FROM device WHERE digest IS NOT NULL '
+                                  'ORDER BY hostname').fetchall()
+
+    def get_versions(self, hostname, start_time=None, end_time=None):
+        """
+        List the configuration versions for the device with the {hostname}, between {start_time} and {end_time}
+        :return: list of dict with the {digest}, {archived} epoch time and {size}, oldest first
+        """
+        query = 'SELECT digest, archived, size FROM config_version WHERE hostname = ? AND archived >= ? ' \
+                'AND archived <= ? ORDER BY archived'
+        rows = self.index.execute(query, (hostname, start_time or 0, end_time or float('inf'))).fetchall()
+        return [{'digest': digest, 'archived': archived, 'size': size} for digest, archived, size in rows]
+
+    def get_version_digest(self, hostname, at_time=None):
+        """
+        :return: the digest of the configuration of the device with the {hostname} at the time {at_time}, default
+        the latest, or {None} if not archived
+        """
+        row = self.index.execute('SELECT digest FROM config_version WHERE hostname = ? AND archived <= ? '
+                                 'ORDER BY archived DESC LIMIT 1', (hostname, at_time or float('inf'))).fetchone()
+        return row[0] if row else None
+
+    def get_config(self, hostname, at_time=None):
+        """
+        :return: the configuration of the device with the {hostname} at the time {at_time}, default the latest, or
+        {None} if not archived
+        """
+        digest = self.get_version_digest(hostname, at_time)
+        return self.read_config(digest) if digest else None
+
+    def diff_configs(self, hostname, from_time, to_time=None, context_lines=3):
+        """
+        Compare the configurations of the device with the {hostname} at the times {from_time} and {to_time}
+        :param hostname: device hostname
+        :param from_time: epoch time of the first configuration
+        :param to_time: epoch time of the second configuration, default the latest
+        :param context_lines: number of unchanged lines around each change
+        :return: the unified diff lines, empty if the configurations are the same
+        """
+        from_digest = self.get_version_digest(hostname, from_time)
+        to_digest = self.get_version_digest(hostname, to_time)
+        if from_digest is None or to_digest is None or from_digest == to_digest:
+            return []
+        return list(difflib.unified_diff(self.read_config(from_digest).splitlines(),
+                                         self.read_config(to_digest).splitlines(),
+                                         fromfile=hostname + ' ' + format_time(from_time),
+                                         tofile=hostname + ' ' + format_time(to_time),
+                                         n=context_lines, lineterm=''))
+
+
+def get_object_file_name(archive_dir, digest):
+    """
+    :return: the file name for the configuration with the {digest}, in the archive directory {archive_dir}
+    """
+    return os.path.join(archive_dir, 'objects', digest[:2], digest + '.z')
+
+
+def read_object_file(file_name):
+    """
+    This function will read the configuration from the compressed file, memory mapped and decompressed. Used by the
+    archive, and by the config analytics worker processes, without the SQLite index
+    :param file_name: configuration object file name
+    :return: configuration text
+    """
+    with open(file_name, 'rb') as object_file:
+        with mmap.mmap(object_file.fileno(), 0, access=mmap.ACCESS_READ) as object_map:
+            return zlib.decompress(object_map).decode('utf-8')
+
+
+def parse_time(date_string):
+    """
+    :param date_string: local date and time, 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM', or {None}
+    :return: epoch time, or {None}
+    """
+    if not date_string:
+        return None
+    date_format = '%Y-%m-%d %H:%M' if ' ' in date_string else '%Y-%m-%d'
+    return time.mktime(time.strptime(date_string, date_format))
+
+
+def format_time(epoch_time):
+    """
+    :return: the local date and time for the {epoch_time}, 'latest' if {None}
+    """
+    if epoch_time is None:
+        return 'latest'
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(epoch_time))
+
+
+def main():
+    """
+    Archive the devices configurations, or list, show and compare the archived configurations
+    """
+    parser = argparse.ArgumentParser(description='Devices configuration archive')
+    parser.add_argument('command', choices=['archive', 'history', 'show', 'diff'])
+    parser.add_argument('hostname', nargs='?', help='device hostname, for history, show and diff')
+    parser.add_argument('--date', default=None, help='configuration date, "YYYY-MM-DD [HH:MM]", for show and diff')
+    parser.add_argument('--to-date', default=None, help='second configuration date for diff, default the latest')
+    parser.add_argument('--archive-dir', default=CONFIG_ARCHIVE_DIR, help='archive directory')
+    args = parser.parse_args()
+
+    config_archive = ConfigArchive(args.archive_dir)
+    if args.command == 'archive':
+        config_count, changed_count = config_archive.archive_all(dnac_apis.get_dnac_token())
+        print('Configurations retrieved: ', config_count, ' , new versions archived: ', changed_count)
+    elif args.command == 'history':
+        for version in config_archive.get_versions(args.hostname):
+            print(format_time(version['archived']), version['digest'][:12], version['size'])
+    elif args.command == 'show':
+        print(config_archive.get_config(args.hostname, parse_time(args.date)))
+    else:
+        for line in config_archive.diff_configs(args.hostname, parse_time(args.date), parse_time(args.to_date)):
+            print(line)
+    config_archive.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,22 +4,102 @@
 # developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
 
 
-import requests
 import json
+import os
 import time
+import hashlib
 import urllib3
+import threading
 import utils
+import geo_cache
+import metrics
+import dnac_session
+import dnac_json
+import dnac_models
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib3.exceptions import InsecureRequestWarning  # for insecure https warnings
 from requests.auth import HTTPBasicAuth  # for Basic Auth
 
 from config import DNAC_URL, DNAC_PASS, DNAC_USER
+from config import TEMPLATE_DIGEST_FILE
+from config import GOOGLE_API_KEY
+from config import PNP_CLAIM_CHUNK_SIZE
+from config import DNAC_TOKEN_MAX_AGE
 
 
 urllib3.disable_warnings(InsecureRequestWarning)  # disable insecure https warnings
 
 DNAC_AUTH = HTTPBasicAuth(DNAC_USER, DNAC_PASS)
 
+# one HTTP session for all the API calls, the connections are reused, the identical concurrent GET requests are
+# coalesced, each call is recorded by the metrics module
+DNAC_SESSION = dnac_session.DnacSession()
+
+# the Google Geocoding API calls use their own HTTP session, not cached or coalesced, and not bound to a cluster
+GOOGLE_SESSION = metrics.TimedSession()
+
+DNAC_TOKEN_INFO = {'token': None, 'time': 0}  # the token reused by get_dnac_token, and the time it was created
+DNAC_TOKEN_LOCK = threading.Lock()
+
+# the DNA Center cluster for the API calls made by each thread, see "dnac_clusters.py". The API calls made without a
+# cluster use DNAC_URL, DNAC_SESSION and DNAC_TOKEN_INFO
+CLUSTER_CONTEXT = threading.local()
+
+TEMPLATE_UPLOAD_SKIPPED = 0  # count of the template uploads skipped, content unchanged since the last commit
+
+
+def set_cluster(cluster):
+    """
+    This function will set the DNA Center cluster for the API calls made by the current thread
+    :param cluster: dnac_clusters.DnacCluster, {None} for the DNA Center with the DNAC_URL
+    :return: the previous cluster
+    """
+    previous_cluster = getattr(CLUSTER_CONTEXT, 'cluster', None)
+    CLUSTER_CONTEXT.cluster = cluster
+    return previous_cluster
+
+
+def get_cluster():
+    """
+    :return: the DNA Center cluster for the API calls made by the current thread, {None} if not set
+    """
+    return getattr(CLUSTER_CONTEXT, 'cluster', None)
+
+
+def get_dnac_url():
+    """
+    :return: the DNA Center URL for the current thread cluster, default DNAC_URL
+    """
+    cluster = get_cluster()
+    return DNAC_URL if cluster is None else cluster.url
+
+
+def get_dnac_session():
+    """
+    :return: the HTTP session for the current thread cluster, default DNAC_SESSION
+    """
+    cluster = get_cluster()
+    return DNAC_SESSION if cluster is None else cluster.session
+
+
+def with_cluster(function):
+    """
+    This function will return a function calling the {function} with the current thread cluster. Used to run the API
+    calls in the worker threads
+    :param function: function to call
+    :return: new function
+    """
+    cluster = get_cluster()
+
+    def call_with_cluster(*args, **kwargs):
+        previous_cluster = set_cluster(cluster)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            set_cluster(previous_cluster)
+    return call_with_cluster
+
 
 def pprint(json_data):
     """
@@ -38,26 +118,97 @@ def get_dnac_jwt_token(dnac_auth):
     :return: DNA C JWT token
     """
 
-    url = DNAC_URL + '/dna/system/api/v1/auth/token'
+    url = get_dnac_url() + '/dna/system/api/v1/auth/token'
     header = {'content-type': 'application/json'}
-    response = requests.post(url, auth=dnac_auth, headers=header, verify=False)
+    response = get_dnac_session().post(url, auth=dnac_auth, headers=header, verify=False)
     dnac_jwt_token = response.json()['Token']
     return dnac_jwt_token
 
 
+def get_dnac_token(dnac_auth=DNAC_AUTH, max_age=DNAC_TOKEN_MAX_AGE):
+    """
+    This function will return a valid DNA C JWT token. The token is reused, and a new token is created only when the
+    existing token age is more than {max_age}. Each cluster has its own token
+    :param dnac_auth: DNA C Basic Auth string, default the current thread cluster auth
+    :param max_age: maximum token age, in seconds. The DNA C tokens expire after 60 minutes
+    :return: DNA C JWT token
+    """
+    token_info, token_lock = DNAC_TOKEN_INFO, DNAC_TOKEN_LOCK
+    cluster = get_cluster()
+    if cluster is not None:
+        token_info, token_lock = cluster.token_info, cluster.token_lock
+        if dnac_auth is DNAC_AUTH:
+            dnac_auth = cluster.auth
+    with token_lock:
+        if token_info['token'] is None or time.time() - token_info['time'] > max_age:
+            token_info['token'] = get_dnac_jwt_token(dnac_auth)
+            token_info['time'] = time.time()
+        return token_info['token']
+
+
 def get_all_device_info(dnac_jwt_token):
     """
     The function will return all network devices info
     :param dnac_jwt_token: DNA C token
     :return: DNA C device inventory info
     """
-    url = DNAC_URL + '/api/v1/network-device'
+    url = get_dnac_url() + '/api/v1/network-device'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    all_device_response = requests.get(url, headers=header, verify=False)
+    all_device_response = get_dnac_session().get(url, headers=header, verify=False)
     all_device_info = all_device_response.json()
     return all_device_info['response']
 
 
+def get_device_count(dnac_jwt_token):
+    """
+    The function will return the number of network devices in the inventory
+    :param dnac_jwt_token: DNA C token
+    :return: device count
+    """
+    url = get_dnac_url() + '/api/v1/network-device/count'
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    response = get_dnac_session().get(url, headers=header, verify=False)
+    device_count = response.json()['response']
+    return device_count
+
+
+def get_device_record_page(dnac_jwt_token, offset=1, limit=500, sort_by='lastUpdateTime', sort_order='desc'):
+    """
+    The function will return one page of the network devices, as compact records, sorted by the DNA C server
+    :param dnac_jwt_token: DNA C token
+    :param offset: index of the first device to return, starting with 1
+    :param limit: maximum number of devices to return
+    :param sort_by: device field to sort by, default the last update time
+    :param sort_order: 'asc' or 'desc'
+    :return: list of dnac_models.NetworkDevice for the devices in the page
+    """
+    url = get_dnac_url() + '/api/v1/network-device'
+    param = {'offset': offset, 'limit': limit, 'sortBy': sort_by, 'sortOrder': sort_order}
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    response = get_dnac_session().get(url, headers=header, params=param, verify=False)
+    return dnac_json.decode_records(response.content, dnac_models.NetworkDevice)
+
+
+def get_all_device_records(dnac_jwt_token, page_size=500):
+    """
+    The function will return all network devices, as compact records, retrieved one page at a time, sorted by
+    hostname. Use for the inventories larger than one page
+    :param dnac_jwt_token: DNA C token
+    :param page_size: number of devices retrieved with each API call
+    :return: list of dnac_models.NetworkDevice
+    """
+    all_device_list = []
+    offset = 1
+    while True:
+        device_list = get_device_record_page(dnac_jwt_token, offset=offset, limit=page_size, sort_by='hostname',
+                                             sort_order='asc')
+        all_device_list += device_list
+        if len(device_list) < page_size:
+            break
+        offset += page_size
+    return all_device_list
+
+
 def get_device_info(device_id, dnac_jwt_token):
     """
     This function will retrieve all the information for the device with the DNA C device id
@@ -65,9 +216,9 @@ def get_device_info(device_id, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: device info
     """
-    url = DNAC_URL + '/api/v1/network-device?id=' + device_id
+    url = get_dnac_url() + '/api/v1/network-device?id=' + device_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    device_response = requests.get(url, headers=header, verify=False)
+    device_response = get_dnac_session().get(url, headers=header, verify=False)
     device_info = device_response.json()
     return device_info['response'][0]
 
@@ -79,9 +230,9 @@ def delete_device(device_id, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: delete status
     """
-    url = DNAC_URL + '/dna/intent/api/v1/network-device/' + device_id
+    url = get_dnac_url() + '/dna/intent/api/v1/network-device/' + device_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.delete(url, headers=header, verify=False)
+    response = get_dnac_session().delete(url, headers=header, verify=False)
     delete_response = response.json()
     delete_status = delete_response['response']
     return delete_status
@@ -94,9 +245,9 @@ def get_project_id(project_name, dnac_jwt_token):
     :param dnac_jwt_token: DNA token
     :return: project id
     """
-    url = DNAC_URL + '/api/v1/template-programmer/project?name=' + project_name
+    url = get_dnac_url() + '/api/v1/template-programmer/project?name=' + project_name
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     proj_json = response.json()
     proj_id = proj_json[0]['id']
     return proj_id
@@ -109,9 +260,9 @@ def get_project_info(project_name, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: list of all templates, including names and ids
     """
-    url = DNAC_URL + '/api/v1/template-programmer/project?name=' + project_name
+    url = get_dnac_url() + '/api/v1/template-programmer/project?name=' + project_name
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     project_json = response.json()
     template_list = project_json[0]['templates']
     return template_list
@@ -125,7 +276,7 @@ def create_commit_template(template_name, project_name, cli_template, dnac_jwt_t
     :param project_name: Project name
     :param cli_template: CLI template text content
     :param dnac_jwt_token: DNA C token
-    :return:
+    :return: {True} if the template was created and committed
     """
     project_id = get_project_id(project_name, dnac_jwt_token)
 
@@ -159,15 +310,19 @@ def create_commit_template(template_name, project_name, cli_template, dnac_jwt_t
     #    delete_template(template_name, project_name, dnac_jwt_token)
 
     # create the new template
-    url = DNAC_URL + '/api/v1/template-programmer/project/' + project_id + '/template'
+    url = get_dnac_url() + '/api/v1/template-programmer/project/' + project_id + '/template'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.post(url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_dnac_session().post(url, data=json.dumps(payload), headers=header, verify=False)
+    if not check_template_response(response, dnac_jwt_token):
+        return False
 
     # get the template id
     template_id = get_template_id(template_name, project_name, dnac_jwt_token)
+    if not template_id:
+        return False
 
     # commit template
-    commit_template(template_id, 'committed by Python script', dnac_jwt_token)
+    return commit_template(template_id, 'committed by Python script', dnac_jwt_token)
 
 
 def commit_template(template_id, comments, dnac_jwt_token):
@@ -176,15 +331,33 @@ def commit_template(template_id, comments, dnac_jwt_token):
     :param template_id: template id
     :param comments: text with comments
     :param dnac_jwt_token: DNA C token
-    :return:
+    :return: {True} if the template was committed
     """
-    url = DNAC_URL + '/api/v1/template-programmer/template/version'
+    url = get_dnac_url() + '/api/v1/template-programmer/template/version'
     payload = {
             "templateId": template_id,
             "comments": comments
         }
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.post(url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_dnac_session().post(url, data=json.dumps(payload), headers=header, verify=False)
+    return check_template_response(response, dnac_jwt_token)
+
+
+def check_template_response(response, dnac_jwt_token):
+    """
+    This function will check the template programmer API {response}: the HTTP status, and the result of the task
+    started by the request, if any
+    :param response: requests response
+    :param dnac_jwt_token: DNA C token
+    :return: {True} if the request and the task succeeded
+    """
+    if not response.ok:
+        return False
+    try:
+        task_id = response.json()['response']['taskId']
+    except (ValueError, KeyError, TypeError):
+        return True
+    return wait_task_list([task_id], dnac_jwt_token).get(task_id) == 'SUCCESS'
 
 
 def update_commit_template(template_name, project_name, cli_template, dnac_jwt_token):
@@ -194,14 +367,14 @@ def update_commit_template(template_name, project_name, cli_template, dnac_jwt_t
     :param project_name: project name
     :param cli_template: CLI template text content
     :param dnac_jwt_token: DNA C token
-    :return:
+    :return: {True} if the template was updated and committed
     """
     # get the project id
     project_id = get_project_id(project_name, dnac_jwt_token)
 
     # get the template id
     template_id = get_template_id(template_name, project_name, dnac_jwt_token)
-    url = DNAC_URL + '/api/v1/template-programmer/template'
+    url = get_dnac_url() + '/api/v1/template-programmer/template'
 
     # prepare the template param to sent to DNA C
     payload = {
@@ -228,10 +401,12 @@ def update_commit_template(template_name, project_name, cli_template, dnac_jwt_t
         "parentTemplateId": project_id
     }
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.put(url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_dnac_session().put(url, data=json.dumps(payload), headers=header, verify=False)
+    if not check_template_response(response, dnac_jwt_token):
+        return False
 
     # commit template
-    commit_template(template_id, 'committed by Python script', dnac_jwt_token)
+    return commit_template(template_id, 'committed by Python script', dnac_jwt_token)
 
 
 def upload_template(template_name, project_name, cli_template, dnac_jwt_token):
@@ -241,13 +416,68 @@ def upload_template(template_name, project_name, cli_template, dnac_jwt_token):
     :param project_name: project name
     :param cli_template: CLI template text content
     :param dnac_jwt_token: DNA C token
-    :return:
+    :return: upload status - {CREATED}, {UPDATED}, {SKIPPED} if the content did not change since the last commit, or
+    {FAILED}. The digest is saved only for the content committed
     """
+    global TEMPLATE_UPLOAD_SKIPPED
+
+    # compare the template content with the digest of the last content committed to this DNA Center cluster
+    template_key = get_dnac_url() + '/' + project_name + '/' + template_name
+    template_digest = get_template_digest(cli_template)
+    template_digests = load_template_digests()
+
     template_id = get_template_id(template_name, project_name, dnac_jwt_token)
     if template_id:
-        update_commit_template(template_name, project_name, cli_template, dnac_jwt_token)
+        if template_digests.get(template_key) == template_digest:
+            TEMPLATE_UPLOAD_SKIPPED += 1
+            return 'SKIPPED'
+        committed = update_commit_template(template_name, project_name, cli_template, dnac_jwt_token)
+        upload_status = 'UPDATED'
     else:
-        create_commit_template(template_name, project_name, cli_template, dnac_jwt_token)
+        committed = create_commit_template(template_name, project_name, cli_template, dnac_jwt_token)
+        upload_status = 'CREATED'
+    if not committed:
+        return 'FAILED'
+
+    # save the digest of the committed content
+    template_digests[template_key] = template_digest
+    save_template_digests(template_digests)
+    return upload_status
+
+
+def get_template_digest(cli_template):
+    """
+    This function will return the SHA-256 digest for the CLI template text content {cli_template}
+    :param cli_template: CLI template text content
+    :return: hex digest
+    """
+    return hashlib.sha256(cli_template.encode('utf-8')).hexdigest()
+
+
+def load_template_digests():
+    """
+    This function will load the digests of the last committed content for each template, from the local file
+    {TEMPLATE_DIGEST_FILE}
+    :return: dict with the digests, key {DNA Center URL/project_name/template_name}, empty if the file does not
+    exist
+    """
+    try:
+        with open(TEMPLATE_DIGEST_FILE, 'r') as digest_file:
+            return json.load(digest_file)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_template_digests(template_digests):
+    """
+    This function will save the digests of the last committed content for each template to the local file
+    {TEMPLATE_DIGEST_FILE}. The file is replaced only after the new content is written
+    :param template_digests: dict with the digests, key {DNA Center URL/project_name/template_name}
+    :return:
+    """
+    with open(TEMPLATE_DIGEST_FILE + '.tmp', 'w') as digest_file:
+        json.dump(template_digests, digest_file, indent=4)
+    os.replace(TEMPLATE_DIGEST_FILE + '.tmp', TEMPLATE_DIGEST_FILE)
 
 
 def delete_template(template_name, project_name, dnac_jwt_token):
@@ -259,9 +489,9 @@ def delete_template(template_name, project_name, dnac_jwt_token):
     :return:
     """
     template_id = get_template_id(template_name, project_name, dnac_jwt_token)
-    url = DNAC_URL + '/api/v1/template-programmer/template/' + template_id
+    url = get_dnac_url() + '/api/v1/template-programmer/template/' + template_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.delete(url, headers=header, verify=False)
+    response = get_dnac_session().delete(url, headers=header, verify=False)
 
 
 def get_all_template_info(dnac_jwt_token):
@@ -270,9 +500,9 @@ def get_all_template_info(dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: all info for all templates
     """
-    url = DNAC_URL + '/api/v1/template-programmer/template'
+    url = get_dnac_url() + '/api/v1/template-programmer/template'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     all_template_list = response.json()
     return all_template_list
 
@@ -286,9 +516,9 @@ def get_template_name_info(template_name, project_name, dnac_jwt_token):
     :return: all info for all templates
     """
     template_id = get_template_id(template_name, project_name, dnac_jwt_token)
-    url = DNAC_URL + '/api/v1/template-programmer/template/' + template_id
+    url = get_dnac_url() + '/api/v1/template-programmer/template/' + template_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     template_json = response.json()
     return template_json
 
@@ -320,9 +550,9 @@ def get_template_id_version(template_name, project_name, dnac_jwt_token):
     :return: DNA C template id for the last version
     """
     project_id = get_project_id(project_name, dnac_jwt_token)
-    url = DNAC_URL + '/api/v1/template-programmer/template?projectId=' + project_id + '&includeHead=false'
+    url = get_dnac_url() + '/api/v1/template-programmer/template?projectId=' + project_id + '&includeHead=false'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     project_json = response.json()
     for template in project_json:
         if template['name'] == template_name:
@@ -357,9 +587,9 @@ def deploy_template(template_name, project_name, device_name, dnac_jwt_token):
                 }
             ]
         }
-    url = DNAC_URL + '/api/v1/template-programmer/template/deploy'
+    url = get_dnac_url() + '/api/v1/template-programmer/template/deploy'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.post(url, headers=header, data=json.dumps(payload), verify=False)
+    response = get_dnac_session().post(url, headers=header, data=json.dumps(payload), verify=False)
     depl_task_id = (response.json())["deploymentId"]
     return depl_task_id
 
@@ -371,9 +601,9 @@ def check_template_deployment_status(depl_task_id, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: status - {SUCCESS} or {FAILURE}
     """
-    url = DNAC_URL + '/api/v1/template-programmer/template/deploy/status/' + depl_task_id
+    url = get_dnac_url() + '/api/v1/template-programmer/template/deploy/status/' + depl_task_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     response_json = response.json()
     deployment_status = response_json["status"]
     return deployment_status
@@ -386,9 +616,9 @@ def get_client_info(client_ip, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: client info, or {None} if client does not found
     """
-    url = DNAC_URL + '/api/v1/host?hostIp=' + client_ip
+    url = get_dnac_url() + '/api/v1/host?hostIp=' + client_ip
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     client_json = response.json()
     try:
         client_info = client_json['response'][0]
@@ -397,6 +627,35 @@ def get_client_info(client_ip, dnac_jwt_token):
         return None
 
 
+def get_host_count(dnac_jwt_token):
+    """
+    This function will return the number of hosts (clients) known by DNA C
+    :param dnac_jwt_token: DNA C token
+    :return: host count
+    """
+    url = get_dnac_url() + '/api/v1/host/count'
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    response = get_dnac_session().get(url, headers=header, verify=False)
+    host_count = response.json()['response']
+    return host_count
+
+
+def get_host_page(dnac_jwt_token, offset=1, limit=500):
+    """
+    This function will retrieve one page of the hosts (clients) info
+    :param dnac_jwt_token: DNA C token
+    :param offset: index of the first host to return, starting with 1
+    :param limit: maximum number of hosts to return
+    :return: hosts info for the hosts in the page
+    """
+    url = get_dnac_url() + '/api/v1/host'
+    param = {'offset': offset, 'limit': limit}
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    response = get_dnac_session().get(url, headers=header, params=param, verify=False)
+    host_list = dnac_json.loads(response.content)['response']
+    return host_list
+
+
 def locate_client_ip(client_ip, dnac_jwt_token):
     """
     Locate a wired client device in the infrastructure by using the client IP address
@@ -473,14 +732,32 @@ def get_device_id_sn(device_sn, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: DNA C device id
     """
-    url = DNAC_URL + '/api/v1/network-device/serial-number/' + device_sn
+    url = get_dnac_url() + '/api/v1/network-device/serial-number/' + device_sn
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    device_response = requests.get(url, headers=header, verify=False)
+    device_response = get_dnac_session().get(url, headers=header, verify=False)
     device_info = device_response.json()
     device_id = device_info['response']['id']
     return device_id
 
 
+def get_device_record_sn(device_sn, dnac_jwt_token):
+    """
+    The function will return the device info for the device with serial number {device_sn}, as a compact record
+    :param device_sn: network device SN
+    :param dnac_jwt_token: DNA C token
+    :return: dnac_models.NetworkDevice, or {None} if not found
+    """
+    url = get_dnac_url() + '/api/v1/network-device/serial-number/' + device_sn
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    response = get_dnac_session().get(url, headers=header, verify=False)
+    if response.status_code == 404:
+        return None
+    device_info = dnac_json.loads(response.content)['response']
+    if 'errorCode' in device_info:
+        return None
+    return dnac_models.NetworkDevice.from_json(device_info)
+
+
 def get_device_location(device_name, dnac_jwt_token):
     """
     This function will find the location for the device with the name {device_name}
@@ -489,9 +766,19 @@ def get_device_location(device_name, dnac_jwt_token):
     :return: the location
     """
     device_id = get_device_id_name(device_name, dnac_jwt_token)
-    url = DNAC_URL + '/api/v1/group/member/' + device_id + '?groupType=SITE'
+    return get_device_location_id(device_id, dnac_jwt_token)
+
+
+def get_device_location_id(device_id, dnac_jwt_token):
+    """
+    This function will find the location for the device with the DNA C device id {device_id}
+    :param device_id: DNA C device id
+    :param dnac_jwt_token: DNA C token
+    :return: the location
+    """
+    url = get_dnac_url() + '/api/v1/group/member/' + device_id + '?groupType=SITE'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    device_response = requests.get(url, headers=header, verify=False)
+    device_response = get_dnac_session().get(url, headers=header, verify=False)
     device_info = (device_response.json())['response']
     device_location = device_info[0]['groupNameHierarchy']
     return device_location
@@ -502,7 +789,7 @@ def create_site(site_name, dnac_jwt_token):
     The function will create a new site with the name {site_name}
     :param site_name: DNA C site name
     :param dnac_jwt_token: DNA C token
-    :return: none
+    :return: the site creation task id
     """
     payload = {
         "additionalInfo": [
@@ -522,9 +809,37 @@ def create_site(site_name, dnac_jwt_token):
         "name": site_name,
         "id": ""
     }
-    url = DNAC_URL + '/api/v1/group'
+    url = get_dnac_url() + '/api/v1/group'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    requests.post(url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_dnac_session().post(url, data=json.dumps(payload), headers=header, verify=False)
+    task_id = response.json()['response']['taskId']
+    return task_id
+
+
+def get_all_sites(dnac_jwt_token):
+    """
+    The function will return all the DNA C site groups: areas, buildings and floors
+    :param dnac_jwt_token: DNA C token
+    :return: list with all the site groups info, including names, ids and name hierarchy
+    """
+    url = get_dnac_url() + '/api/v1/group?groupType=SITE'
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    site_response = get_dnac_session().get(url, headers=header, verify=False)
+    site_json = site_response.json()
+    return site_json['response']
+
+
+def get_all_site_records(dnac_jwt_token):
+    """
+    The function will return all the DNA C site groups, as compact records
+    :param dnac_jwt_token: DNA C token
+    :return: list of dnac_models.Site, dnac_models.Building for the buildings and dnac_models.Floor for the floors
+    """
+    url = get_dnac_url() + '/api/v1/group?groupType=SITE'
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    site_response = get_dnac_session().get(url, headers=header, verify=False)
+    site_list = dnac_json.loads(site_response.content)['response']
+    return [dnac_models.site_from_json(site) for site in site_list]
 
 
 def get_site_id(site_name, dnac_jwt_token):
@@ -535,9 +850,9 @@ def get_site_id(site_name, dnac_jwt_token):
     :return: DNA C site id
     """
     site_id = None
-    url = DNAC_URL + '/api/v1/group?groupType=SITE'
+    url = get_dnac_url() + '/api/v1/group?groupType=SITE'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    site_response = requests.get(url, headers=header, verify=False)
+    site_response = get_dnac_session().get(url, headers=header, verify=False)
     site_json = site_response.json()
     site_list = site_json['response']
     for site in site_list:
@@ -546,22 +861,29 @@ def get_site_id(site_name, dnac_jwt_token):
     return site_id
 
 
-def create_building(site_name, building_name, address, dnac_jwt_token):
+def create_building(site_name, building_name, address, dnac_jwt_token, site_id=None, geo_info=None):
     """
     The function will create a new building with the name {building_name}, part of the site with the name {site_name}
     :param site_name: DNA C site name
     :param building_name: DNA C building name
     :param address: building address
     :param dnac_jwt_token: DNA C token
-    :return: none
+    :param site_id: DNA C site id, optional, if not provided it will be found using the {site_name}
+    :param geo_info: address longitude/latitude, optional, if not provided it will be found using the {address}
+    :return: the building creation task id, or {None} if the geolocation info is not available offline
     """
     # get the site id for the site name
-    site_id = get_site_id(site_name, dnac_jwt_token)
-
-    # get the geolocation info for address
-    geo_info = get_geo_info(address, GOOGLE_API_KEY)
-    print('\nGeolocation info for the address ', address, ' is:')
-    pprint(geo_info)
+    if site_id is None:
+        site_id = get_site_id(site_name, dnac_jwt_token)
+
+    # get the geolocation info for address, from the local geolocation cache if available
+    if geo_info is None:
+        geo_info = geo_cache.get_geo_info_cached(address, GOOGLE_API_KEY)
+        if geo_info is None:
+            print('\nGeolocation info not available offline for the address ', address)
+            return None
+        print('\nGeolocation info for the address ', address, ' is:')
+        pprint(geo_info)
 
     payload = {
         "additionalInfo": [
@@ -585,9 +907,11 @@ def create_building(site_name, building_name, address, dnac_jwt_token):
         "name": building_name,
         "id": ""
     }
-    url = DNAC_URL + '/api/v1/group'
+    url = get_dnac_url() + '/api/v1/group'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    requests.post(url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_dnac_session().post(url, data=json.dumps(payload), headers=header, verify=False)
+    task_id = response.json()['response']['taskId']
+    return task_id
 
 
 def get_building_id(building_name, dnac_jwt_token):
@@ -598,9 +922,9 @@ def get_building_id(building_name, dnac_jwt_token):
     :return: DNA C building id
     """
     building_id = None
-    url = DNAC_URL + '/api/v1/group?groupType=SITE'
+    url = get_dnac_url() + '/api/v1/group?groupType=SITE'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    building_response = requests.get(url, headers=header, verify=False)
+    building_response = get_dnac_session().get(url, headers=header, verify=False)
     building_json = building_response.json()
     building_list = building_json['response']
     for building in building_list:
@@ -609,17 +933,19 @@ def get_building_id(building_name, dnac_jwt_token):
     return building_id
 
 
-def create_floor(building_name, floor_name, floor_number, dnac_jwt_token):
+def create_floor(building_name, floor_name, floor_number, dnac_jwt_token, building_id=None):
     """
     The function will  create a floor in the building with the name {site_name}
     :param building_name: DNA C site name
     :param floor_name: floor name
     :param floor_number: floor number
     :param dnac_jwt_token: DNA C token
-    :return: none
+    :param building_id: DNA C building id, optional, if not provided it will be found using the {building_name}
+    :return: the floor creation task id
     """
     # get the site id
-    building_id = get_building_id(building_name, dnac_jwt_token)
+    if building_id is None:
+        building_id = get_building_id(building_name, dnac_jwt_token)
 
     payload = {
         "additionalInfo": [
@@ -656,9 +982,11 @@ def create_floor(building_name, floor_name, floor_number, dnac_jwt_token):
         "systemGroup": False,
         "id": ""
     }
-    url = DNAC_URL + '/api/v1/group'
+    url = get_dnac_url() + '/api/v1/group'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    requests.post(url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_dnac_session().post(url, data=json.dumps(payload), headers=header, verify=False)
+    task_id = response.json()['response']['taskId']
+    return task_id
 
 
 def get_floor_id(building_name, floor_name, dnac_jwt_token):
@@ -672,9 +1000,9 @@ def get_floor_id(building_name, floor_name, dnac_jwt_token):
     """
     floor_id = None
     building_id = get_building_id(building_name, dnac_jwt_token)
-    url = DNAC_URL + '/api/v1/group/' + building_id + '/child?level=1'
+    url = get_dnac_url() + '/api/v1/group/' + building_id + '/child?level=1'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    building_response = requests.get(url, headers=header, verify=False)
+    building_response = get_dnac_session().get(url, headers=header, verify=False)
     building_json = building_response.json()
     floor_list = building_json['response']
     for floor in floor_list:
@@ -695,10 +1023,10 @@ def assign_device_sn_building(device_sn, building_name, dnac_jwt_token):
     building_id = get_building_id(building_name, dnac_jwt_token)
     device_id = get_device_id_sn(device_sn, dnac_jwt_token)
 
-    url = DNAC_URL + '/api/v1/group/' + building_id + '/member'
+    url = get_dnac_url() + '/api/v1/group/' + building_id + '/member'
     payload = {"networkdevice": [device_id]}
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.post(url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_dnac_session().post(url, data=json.dumps(payload), headers=header, verify=False)
     print('\nDevice with the SN: ', device_sn, 'assigned to building: ', building_name)
 
 
@@ -714,10 +1042,10 @@ def assign_device_name_building(device_name, building_name, dnac_jwt_token):
     building_id = get_building_id(building_name, dnac_jwt_token)
     device_id = get_device_id_name(device_name, dnac_jwt_token)
 
-    url = DNAC_URL + '/api/v1/group/' + building_id + '/member'
+    url = get_dnac_url() + '/api/v1/group/' + building_id + '/member'
     payload = {"networkdevice": [device_id]}
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.post(url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_dnac_session().post(url, data=json.dumps(payload), headers=header, verify=False)
     print('\nDevice with the name: ', device_name, 'assigned to building: ', building_name)
 
 
@@ -730,7 +1058,7 @@ def get_geo_info(address, google_key):
     """
     url = 'https://maps.googleapis.com/maps/api/geocode/json?address=' + address + '&key=' + google_key
     header = {'content-type': 'application/json'}
-    response = requests.get(url, headers=header, verify=False)
+    response = GOOGLE_SESSION.get(url, headers=header, verify=False)
     response_json = response.json()
     location_info = response_json['results'][0]['geometry']['location']
     return location_info
@@ -745,9 +1073,9 @@ def sync_device(device_name, dnac_jwt_token):
     """
     device_id = get_device_id_name(device_name, dnac_jwt_token)
     param = [device_id]
-    url = DNAC_URL + '/api/v1/network-device/sync?forceSync=true'
+    url = get_dnac_url() + '/api/v1/network-device/sync?forceSync=true'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    sync_response = requests.put(url, data=json.dumps(param), headers=header, verify=False)
+    sync_response = get_dnac_session().put(url, data=json.dumps(param), headers=header, verify=False)
     task = sync_response.json()['response']['taskId']
     return sync_response.status_code, task
 
@@ -759,11 +1087,13 @@ def check_task_id_status(task_id, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: status - {SUCCESS} or {FAILURE}
     """
-    url = DNAC_URL + '/api/v1/task/' + task_id
+    url = get_dnac_url() + '/api/v1/task/' + task_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    task_response = requests.get(url, headers=header, verify=False)
+    task_response = get_dnac_session().get(url, headers=header, verify=False)
     task_json = task_response.json()
     task_status = task_json['response']['isError']
+    if task_status or 'endTime' in task_json['response']:
+        get_dnac_session().complete_task(task_id)
     if not task_status:
         task_result = 'SUCCESS'
     else:
@@ -778,12 +1108,12 @@ def check_task_id_output(task_id, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: status - {SUCCESS} or {FAILURE}
     """
-    url = DNAC_URL + '/api/v1/task/' + task_id
+    url = get_dnac_url() + '/api/v1/task/' + task_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
     completed = 'no'
     while completed == 'no':
         try:
-            task_response = requests.get(url, headers=header, verify=False)
+            task_response = get_dnac_session().get(url, headers=header, verify=False)
             task_json = task_response.json()
             task_output = task_json['response']
             completed = 'yes'
@@ -792,6 +1122,46 @@ def check_task_id_output(task_id, dnac_jwt_token):
     return task_output
 
 
+def wait_task_list(task_id_list, dnac_jwt_token, timeout=300):
+    """
+    This function will wait for all the tasks with the ids in the {task_id_list} to complete. All pending tasks are
+    checked each poll, the poll interval is increased from 1 to 5 seconds while tasks are still running
+    :param task_id_list: list of task ids
+    :param dnac_jwt_token: DNA C token
+    :param timeout: maximum time to wait, in seconds
+    :return: dict with the status for each task id - {SUCCESS}, {FAILURE} or {TIMEOUT}
+    """
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    task_status = {}
+    pending_tasks = [task_id for task_id in task_id_list if task_id]
+    poll_interval = 1
+    end_time = time.time() + timeout
+    while pending_tasks:
+        for task_id in list(pending_tasks):
+            url = get_dnac_url() + '/api/v1/task/' + task_id
+            try:
+                task_json = get_dnac_session().get(url, headers=header, verify=False).json()['response']
+            except:
+                continue
+            if task_json.get('isError'):
+                task_status[task_id] = 'FAILURE'
+            elif 'endTime' in task_json:
+                task_status[task_id] = 'SUCCESS'
+            else:
+                continue
+            get_dnac_session().complete_task(task_id)
+            pending_tasks.remove(task_id)
+        if not pending_tasks:
+            break
+        if time.time() + poll_interval > end_time:
+            for task_id in pending_tasks:
+                task_status[task_id] = 'TIMEOUT'
+            break
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, 5)
+    return task_status
+
+
 def create_path_trace(src_ip, dest_ip, dnac_jwt_token):
     """
     This function will create a new Path Trace between the source IP address {src_ip} and the
@@ -808,9 +1178,9 @@ def create_path_trace(src_ip, dest_ip, dnac_jwt_token):
         'sourceIP': src_ip
     }
 
-    url = DNAC_URL + '/api/v1/flow-analysis'
+    url = get_dnac_url() + '/api/v1/flow-analysis'
     header = {'accept': 'application/json', 'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    path_response = requests.post(url, data=json.dumps(param), headers=header, verify=False)
+    path_response = get_dnac_session().post(url, data=json.dumps(param), headers=header, verify=False)
     path_json = path_response.json()
     path_id = path_json['response']['flowAnalysisId']
     return path_id
@@ -824,9 +1194,9 @@ def get_path_trace_info(path_id, dnac_jwt_token):
     :return: Path visualisation status, and the details in a list [device,interface_out,interface_in,device...]
     """
 
-    url = DNAC_URL + '/api/v1/flow-analysis/' + path_id
+    url = get_dnac_url() + '/api/v1/flow-analysis/' + path_id
     header = {'accept': 'application/json', 'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    path_response = requests.get(url, headers=header, verify=False)
+    path_response = get_dnac_session().get(url, headers=header, verify=False)
     path_json = path_response.json()
     path_info = path_json['response']
     path_status = path_info['request']['status']
@@ -858,9 +1228,9 @@ def check_ipv4_network_interface(ip_address, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: None, or device_hostname and interface_name
     """
-    url = DNAC_URL + '/api/v1/interface/ip-address/' + ip_address
+    url = get_dnac_url() + '/api/v1/interface/ip-address/' + ip_address
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     response_json = response.json()
     try:
         response_info = response_json['response'][0]
@@ -882,9 +1252,9 @@ def get_device_info_ip(ip_address, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: device information, or None
     """
-    url = DNAC_URL + '/api/v1/network-device/ip-address/' + ip_address
+    url = get_dnac_url() + '/api/v1/network-device/ip-address/' + ip_address
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     response_json = response.json()
     device_info = response_json['response']
     if 'errorCode' == 'Not found':
@@ -899,9 +1269,9 @@ def get_legit_cli_command_runner(dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: list of CLI commands
     """
-    url = DNAC_URL + '/api/v1/network-device-poller/cli/legit-reads'
+    url = get_dnac_url() + '/api/v1/network-device-poller/cli/legit-reads'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     response_json = response.json()
     cli_list = response_json['response']
     return cli_list
@@ -914,9 +1284,9 @@ def get_content_file_id(file_id, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: file
     """
-    url = DNAC_URL + '/api/v1/file/' + file_id
+    url = get_dnac_url() + '/api/v1/file/' + file_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False, stream=True)
+    response = get_dnac_session().get(url, headers=header, verify=False, stream=True)
     response_json = response.json()
     return response_json
 
@@ -940,9 +1310,9 @@ def get_output_command_runner(command, device_name, dnac_jwt_token):
         "deviceUuids": [device_id],
         "timeout": 0
         }
-    url = DNAC_URL + '/api/v1/network-device-poller/cli/read-request'
+    url = get_dnac_url() + '/api/v1/network-device-poller/cli/read-request'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.post(url, data=json.dumps(payload), headers=header, verify=False)
+    response = get_dnac_session().post(url, data=json.dumps(payload), headers=header, verify=False)
     response_json = response.json()
     task_id = response_json['response']['taskId']
 
@@ -970,10 +1340,10 @@ def get_all_configs(dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: Return all config files in a list
     """
-    url = DNAC_URL + '/api/v1/network-device/config'
+    url = get_dnac_url() + '/api/v1/network-device/config'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
-    config_json = response.json()
+    response = get_dnac_session().get(url, headers=header, verify=False)
+    config_json = dnac_json.loads(response.content)
     config_files = config_json['response']
     return config_files
 
@@ -986,9 +1356,9 @@ def get_device_config(device_name, dnac_jwt_token):
     :return: configuration file
     """
     device_id = get_device_id_name(device_name, dnac_jwt_token)
-    url = DNAC_URL + '/api/v1/network-device/' + device_id + '/config'
+    url = get_dnac_url() + '/api/v1/network-device/' + device_id + '/config'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     config_json = response.json()
     config_file = config_json['response']
     return config_file
@@ -1023,9 +1393,9 @@ def check_ipv4_address_configs(ipv4_address, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: True/False
     """
-    url = DNAC_URL + '/api/v1/network-device/config'
+    url = get_dnac_url() + '/api/v1/network-device/config'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     config_json = response.json()
     config_files = config_json['response']
     for config in config_files:
@@ -1098,10 +1468,22 @@ def get_device_health(device_name, epoch_time, dnac_jwt_token):
     :return: detailed network device information
     """
     device_id = get_device_id_name(device_name, dnac_jwt_token)
-    url = DNAC_URL + '/dna/intent/api/v1/device-detail?timestamp=' + str(epoch_time) + '&searchBy=' + device_id
+    return get_device_health_id(device_id, epoch_time, dnac_jwt_token)
+
+
+def get_device_health_id(device_id, epoch_time, dnac_jwt_token):
+    """
+    This function will call the device health intent API and return the detailed network device information, for the
+    device with the DNA C device id {device_id}
+    :param device_id: DNA C device id
+    :param epoch_time: epoch time including msec
+    :param dnac_jwt_token: DNA C token
+    :return: detailed network device information
+    """
+    url = get_dnac_url() + '/dna/intent/api/v1/device-detail?timestamp=' + str(epoch_time) + '&searchBy=' + device_id
     url += '&identifier=uuid'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     device_detail_json = response.json()
     device_detail = device_detail_json['response']
     return device_detail
@@ -1114,10 +1496,10 @@ def pnp_get_device_count(device_state, dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: device count
     """
-    url = DNAC_URL + '/dna/intent/api/v1/onboarding/pnp-device/count'
-    payload = {'state': device_state}
+    url = get_dnac_url() + '/dna/intent/api/v1/onboarding/pnp-device/count'
+    param = {'state': device_state}
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, data=json.dumps(payload), verify=False)
+    response = get_dnac_session().get(url, headers=header, params=param, verify=False)
     pnp_device_count = response.json()
     return pnp_device_count['response']
 
@@ -1128,13 +1510,71 @@ def pnp_get_device_list(dnac_jwt_token):
     :param dnac_jwt_token: DNA C token
     :return: PnP device info
     """
-    url = DNAC_URL + '/dna/intent/api/v1/onboarding/pnp-device'
+    url = get_dnac_url() + '/dna/intent/api/v1/onboarding/pnp-device'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     pnp_device_json = response.json()
     return pnp_device_json
 
 
+def pnp_get_device_records(dnac_jwt_token):
+    """
+    This function will retrieve the PnP device list, as compact records
+    :param dnac_jwt_token: DNA C token
+    :return: list of dnac_models.PnPDevice
+    """
+    url = get_dnac_url() + '/dna/intent/api/v1/onboarding/pnp-device'
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    response = get_dnac_session().get(url, headers=header, verify=False)
+    return dnac_json.decode_records(response.content, dnac_models.PnPDevice, list_path=())
+
+
+def pnp_get_device_page(dnac_jwt_token, limit=50, offset=0, state=None, onb_state=None, serial_number=None):
+    """
+    This function will retrieve one page of the PnP device list, filtered by the DNA C server
+    :param dnac_jwt_token: DNA C token
+    :param limit: maximum number of PnP devices to return
+    :param offset: index of the first PnP device to return
+    :param state: device state filter, example 'Unclaimed', optional
+    :param onb_state: onboarding state filter, example 'Initialized', optional
+    :param serial_number: serial number, or list of serial numbers, filter, optional
+    :return: PnP device info for the devices in the page
+    """
+    url = get_dnac_url() + '/dna/intent/api/v1/onboarding/pnp-device'
+    param = {'limit': limit, 'offset': offset}
+    if state:
+        param['state'] = state
+    if onb_state:
+        param['onbState'] = onb_state
+    if serial_number:
+        param['serialNumber'] = serial_number
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    response = get_dnac_session().get(url, headers=header, params=param, verify=False)
+    pnp_device_json = response.json()
+    return pnp_device_json
+
+
+def pnp_query_devices(dnac_jwt_token, state=None, onb_state=None, serial_number=None, page_size=50):
+    """
+    This function will return the PnP devices matching the {state}, {onb_state} and {serial_number} filters. The filters
+    are applied by the DNA C server, and the device list is retrieved one page at a time, as it is consumed
+    :param dnac_jwt_token: DNA C token
+    :param state: device state filter, example 'Unclaimed', optional
+    :param onb_state: onboarding state filter, example 'Initialized', optional
+    :param serial_number: serial number, or list of serial numbers, filter, optional
+    :param page_size: number of PnP devices retrieved with each API call
+    :return: generator of dnac_models.PnPDevice
+    """
+    offset = 0
+    while True:
+        pnp_device_page = pnp_get_device_page(dnac_jwt_token, page_size, offset, state, onb_state, serial_number)
+        for pnp_device in pnp_device_page:
+            yield dnac_models.PnPDevice.from_json(pnp_device)
+        if len(pnp_device_page) < page_size:
+            break
+        offset += page_size
+
+
 def pnp_claim_ap_site(device_id, floor_id, rf_profile, dnac_jwt_token):
     """
     This function will delete claim the AP with the {device_id} to the floor with the {floor_id}
@@ -1150,14 +1590,40 @@ def pnp_claim_ap_site(device_id, floor_id, rf_profile, dnac_jwt_token):
         "deviceId": device_id,
         "rfProfile": rf_profile
         }
-    url = DNAC_URL + '/dna/intent/api/v1/onboarding/pnp-device/site-claim'
+    url = get_dnac_url() + '/dna/intent/api/v1/onboarding/pnp-device/site-claim'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.post(url, headers=header, data=json.dumps(payload), verify=False)
+    response = get_dnac_session().post(url, headers=header, data=json.dumps(payload), verify=False)
     claim_status_json = response.json()
     claim_status = claim_status_json['response']
     return claim_status
 
 
+def pnp_claim_ap_site_bulk(claim_list, dnac_jwt_token, chunk_size=PNP_CLAIM_CHUNK_SIZE):
+    """
+    This function will claim all the APs in the {claim_list}. The AP site claim API accepts one device for each
+    request: all the claims are submitted at one time, and up to {chunk_size} claim requests are in progress, the
+    next claim starts as soon as one completes.
+    :param claim_list: list of claims, dict with the PnP {device_id}, {floor_id} and {rf_profile}
+    :param dnac_jwt_token: Cisco DNA C token
+    :param chunk_size: maximum number of claim requests in progress at one time
+    :return: dict with the claim result for each PnP device id, the claim status or the error message
+    """
+    def claim_ap(claim):
+        metrics.set_trace_id(claim['device_id'])
+        try:
+            return pnp_claim_ap_site(claim['device_id'], claim['floor_id'], claim['rf_profile'], dnac_jwt_token)
+        except Exception as error:
+            return 'Error: ' + str(error)
+
+    claim_results = {}
+    run_claim = with_cluster(claim_ap)
+    with ThreadPoolExecutor(max_workers=chunk_size) as executor:
+        claim_futures = dict((executor.submit(run_claim, claim), claim['device_id']) for claim in claim_list)
+        for claim_future in as_completed(claim_futures):
+            claim_results[claim_futures[claim_future]] = claim_future.result()
+    return claim_results
+
+
 def pnp_delete_provisioned_device(device_id, dnac_jwt_token):
     """
     This function will delete the provisioned device with the {device_id} from the PnP database
@@ -1165,9 +1631,9 @@ def pnp_delete_provisioned_device(device_id, dnac_jwt_token):
     :param dnac_jwt_token: Cisco DNA C token
     :return:
     """
-    url = DNAC_URL + '/dna/intent/api/v1/onboarding/pnp-device/' + device_id
+    url = get_dnac_url() + '/dna/intent/api/v1/onboarding/pnp-device/' + device_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.delete(url, headers=header, verify=False)
+    response = get_dnac_session().delete(url, headers=header, verify=False)
     delete_status = response.json()
     return delete_status
 
@@ -1179,9 +1645,9 @@ def pnp_get_device_info(device_id, dnac_jwt_token):
     :param dnac_jwt_token: Cisco DNA C token
     :return:
     """
-    url = DNAC_URL + '/api/v1/onboarding/pnp-device/' + device_id
+    url = get_dnac_url() + '/api/v1/onboarding/pnp-device/' + device_id
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
+    response = get_dnac_session().get(url, headers=header, verify=False)
     device_info_json = response.json()
     device_info = device_info_json['deviceInfo']
     return device_info
@@ -1194,10 +1660,46 @@ def get_physical_topology(ip_address, dnac_jwt_token):
     :param dnac_jwt_token: Cisco DNA C token
     :return: topology info - connected device hostname and interface
     """
-    url = DNAC_URL + '/api/v1/topology/physical-topology'
+    topology_json = get_physical_topology_info(dnac_jwt_token)
+    return find_topology_connection(topology_json, ip_address)
+
+
+def get_physical_topology_info(dnac_jwt_token):
+    """
+    This function will retrieve the physical topology, all nodes and links
+    :param dnac_jwt_token: Cisco DNA C token
+    :return: topology info - dict with the {nodes} and {links}
+    """
+    url = get_dnac_url() + '/api/v1/topology/physical-topology'
+    header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
+    response = get_dnac_session().get(url, headers=header, verify=False)
+    topology_json = dnac_json.loads(response.content)['response']
+    return topology_json
+
+
+def get_physical_topology_records(dnac_jwt_token):
+    """
+    This function will retrieve the physical topology, as compact records
+    :param dnac_jwt_token: Cisco DNA C token
+    :return: list of dnac_models.TopologyNode, and list of dnac_models.TopologyLink
+    """
+    url = get_dnac_url() + '/api/v1/topology/physical-topology'
     header = {'content-type': 'application/json', 'x-auth-token': dnac_jwt_token}
-    response = requests.get(url, headers=header, verify=False)
-    topology_json = response.json()['response']
+    response = get_dnac_session().get(url, headers=header, verify=False)
+    node_list, link_list = dnac_json.decode_record_lists(response.content,
+                                                         [(('response', 'nodes'), dnac_models.TopologyNode),
+                                                          (('response', 'links'), dnac_models.TopologyLink)])
+    return node_list, link_list
+
+
+def find_topology_connection(topology_json, ip_address):
+    """
+    This function will find the connected device and interface for the device/client with the {ip_address}, in the
+    physical topology {topology_json}
+    :param topology_json: topology info - dict with the {nodes} and {links}
+    :param ip_address: device/interface IP address
+    :return: topology info - connected device hostname and interface
+    """
     topology_nodes = topology_json['nodes']
     topology_links = topology_json['links']
 
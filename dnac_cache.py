@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the in memory time to live cache, used to keep the DNA Center reference data (sites, topology,
+# WLC info) warm between the onboarding workflows.
+
+import time
+import threading
+
+
+class TTLCache:
+    """
+    In memory cache, the entries expire {ttl} seconds after they are loaded
+    """
+
+    def __init__(self, ttl):
+        """
+        :param ttl: entries time to live, in seconds
+        """
+        self.ttl = ttl
+        self.entries = {}  # key: (expire time, value)
+        self.purge_size = 1024  # the expired entries are removed when the cache grows over this size
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader=None):
+        """
+        Return the cached value for the {key}. If not cached or expired, the value is loaded by calling the {loader}
+        :param key: cache key
+        :param loader: function returning the value, optional
+        :return: the value, or {None} if not cached and no loader
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        if loader is None:
+            return None
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        """
+        Add the {value} to the cache, for the {key}. The expired entries are removed when the number of entries
+        doubles, the cache size is bounded by the number of entries added in one {ttl}
+        """
+        with self.lock:
+            now = time.time()
+            self.entries[key] = (now + self.ttl, value)
+            if len(self.entries) > self.purge_size:
+                self.entries = dict((entry_key, entry) for entry_key, entry in self.entries.items() if entry[0] > now)
+                self.purge_size = max(1024, 2 * len(self.entries))
+
+    def invalidate(self, key=None):
+        """
+        Delete the cache entry for the {key}, or all the entries if the {key} is {None}
+        """
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the DNA Center cluster registry, for the shops with many DNA Center clusters in each region.
+# Each cluster, from DNAC_CLUSTERS, has its own HTTP session and response cache, auth token, and inventory cache.
+# The "dnac_apis.py" functions are called for one cluster by activating the cluster in the calling thread. The
+# cross-cluster operations (find a device by serial number, PnP discovery, inventory search) call all the clusters
+# concurrently, up to CLUSTER_WORKERS at one time, and merge the results: the total time is the time of the slowest
+# cluster, not the sum.
+
+import sys
+import time
+import argparse
+import threading
+import contextlib
+
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.auth import HTTPBasicAuth  # for Basic Auth
+
+import dnac_apis
+import dnac_cache
+import dnac_session
+
+from config import DNAC_CLUSTERS, CLUSTER_WORKERS, CLUSTER_CACHE_TTL
+
+
+class DnacCluster:
+    """
+    DNA Center cluster: the HTTP session, the auth token and the caches used for the API calls to the cluster
+    """
+
+    def __init__(self, name, url, username, password, region='default', cache_ttl=CLUSTER_CACHE_TTL):
+        """
+        :param name: cluster name
+        :param url: DNA Center URL, example 'https://10.1.1.1'
+        :param username: DNA Center username
+        :param password: DNA Center password
+        :param region: region name, used to select the clusters
+        :param cache_ttl: inventory cache time to live, in seconds
+        """
+        self.name = name
+        self.url = url
+        self.region = region
+        self.auth = HTTPBasicAuth(username, password)
+        self.session = dnac_session.DnacSession()
+        self.token_info = {'token': None, 'time': 0}  # the token reused by dnac_apis.get_dnac_token
+        self.token_lock = threading.Lock()
+        self.inventory_cache = dnac_cache.TTLCache(cache_ttl)
+
+    @contextlib.contextmanager
+    def active(self):
+        """
+        Use this cluster for the "dnac_apis.py" calls made by the current thread, inside the with block
+        """
+        previous_cluster = dnac_apis.set_cluster(self)
+        try:
+            yield self
+        finally:
+            dnac_apis.set_cluster(previous_cluster)
+
+    def run(self, function, *args, **kwargs):
+        """
+        This function will call the {function} with this cluster active
+        :return: the function return value
+        """
+        with self.active():
+            return function(*args, **kwargs)
+
+    def get_token(self):
+        """
+        :return: valid DNA C JWT token for this cluster, reused until it expires
+        """
+        return self.run(dnac_apis.get_dnac_token)
+
+    def get_device_records(self):
+        """
+        :return: all the cluster network devices, list of dnac_models.NetworkDevice, from the cache if available
+        """
+        return self.inventory_cache.get('devices', lambda: self.run(dnac_apis.get_all_device_records,
+                                                                    self.get_token()))
+
+
+class ClusterRegistry:
+    """
+    The DNA Center clusters, and the cross-cluster operations
+    """
+
+    def __init__(self, cluster_configs=None, max_workers=CLUSTER_WORKERS):
+        """
+        :param cluster_configs: dict with the cluster name: dict with the url, username, password and region, default
+        DNAC_CLUSTERS
+        :param max_workers: maximum number of clusters called at one time
+        """
+        cluster_configs = DNAC_CLUSTERS if cluster_configs is None else cluster_configs
+        self.clusters = dict((name, DnacCluster(name, cluster_config['url'], cluster_config['username'],
+                                                cluster_config['password'], cluster_config.get('region', 'default')))
+                             for name, cluster_config in cluster_configs.items())
+        self.max_workers = max_workers
+
+    def get_clusters(self, regions=None):
+        """
+        :param regions: list of region names, optional
+        :return: list of the clusters in the {regions}, or all the clusters
+        """
+        return [cluster for cluster in self.clusters.values() if not regions or cluster.region in regions]
+
+    def fan_out(self, function, regions=None):
+        """
+        This function will call the {function} for each cluster, concurrently. The function is called with the
+        cluster as argument, and with the cluster active, the "dnac_apis.py" calls are made to the cluster
+        :param function: function to call
+        :param regions: list of region names, optional, default all the clusters
+        :return: dict with the cluster name: {result}, {error} and {time}, the call time in seconds
+        """
+        def call_cluster(cluster):
+            start_time = time.time()
+            try:
+                result, error = cluster.run(function, cluster), None
+            except Exception as cluster_error:
+                result, error = None, repr(cluster_error)
+            return {'cluster': cluster.name, 'region': cluster.region, 'result': result, 'error': error,
+                    'time': time.time() - start_time}
+
+        cluster_list = self.get_clusters(regions)
+        if not cluster_list:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(cluster_list))) as executor:
+            return dict((cluster_result['cluster'], cluster_result)
+                        for cluster_result in executor.map(call_cluster, cluster_list))
+
+    def find_device_serial(self, serial_number, regions=None):
+        """
+        This function will find the network device with the {serial_number} in all the clusters
+        :param serial_number: device serial number
+        :param regions: list of region names, optional
+        :return: list of (cluster name, dnac_models.NetworkDevice), and the fan out results, see {fan_out}
+        """
+        cluster_results = self.fan_out(
+            lambda cluster: dnac_apis.get_device_record_sn(serial_number, cluster.get_token()), regions)
+        return merge_results(cluster_results), cluster_results
+
+    def discover_pnp_devices(self, state='Unclaimed', serial_number=None, regions=None):
+        """
+        This function will find the PnP devices in all the clusters, filtered by the DNA C servers
+        :param state: PnP device state filter, {None} for all the devices
+        :param serial_number: serial number, or list of serial numbers, filter, optional
+        :param regions: list of region names, optional
+        :return: list of (cluster name, dnac_models.PnPDevice), and the fan out results, see {fan_out}
+        """
+        cluster_results = self.fan_out(lambda cluster: list(dnac_apis.pnp_query_devices(
+            cluster.get_token(), state=state, serial_number=serial_number)), regions)
+        return merge_results(cluster_results), cluster_results
+
+    def search_inventory(self, hostname=None, family=None, ip_prefix=None, software_version=None, regions=None):
+        """
+        This function will search the network devices in all the clusters inventory, the inventory of each cluster
+        is cached for CLUSTER_CACHE_TTL seconds
+        :param hostname: hostname substring, not case sensitive, optional
+        :param family: device family, example 'Unified AP', optional
+        :param ip_prefix: management IP address prefix, example '10.93.', optional
+        :param software_version: software version, optional
+        :param regions: list of region names, optional
+        :return: list of (cluster name, dnac_models.NetworkDevice), and the fan out results, see {fan_out}
+        """
+        def match_device(device):
+            return (hostname is None or hostname.lower() in (device.hostname or '').lower()) and \
+                (family is None or device.family == family) and \
+                (ip_prefix is None or (device.ip_address or '').startswith(ip_prefix)) and \
+                (software_version is None or device.software_version == software_version)
+
+        cluster_results = self.fan_out(lambda cluster: [device for device in cluster.get_device_records()
+                                                        if match_device(device)], regions)
+        return merge_results(cluster_results), cluster_results
+
+
+def merge_results(cluster_results):
+    """
+    This function will merge the results of the clusters, lists or single items, {None} results are skipped
+    :param cluster_results: fan out results, see {ClusterRegistry.fan_out}
+    :return: list of (cluster name, item), sorted by cluster name
+    """
+    merged_list = []
+    for cluster_name in sorted(cluster_results):
+        result = cluster_results[cluster_name]['result']
+        if isinstance(result, list):
+            merged_list.extend((cluster_name, item) for item in result)
+        elif result is not None:
+            merged_list.append((cluster_name, result))
+    return merged_list
+
+
+def main():
+    """
+    Run one cross-cluster operation, and print the merged results, and the time for each cluster
+    """
+    parser = argparse.ArgumentParser(description='Multi-cluster DNA Center operations')
+    parser.add_argument('command', choices=['list', 'find-serial', 'pnp', 'search'], help='operation')
+    parser.add_argument('value', nargs='?', default=None,
+                        help='serial number for find-serial, hostname substring for search')
+    parser.add_argument('--regions', default=None, help='comma separated region names, default all the clusters')
+    parser.add_argument('--state', default='Unclaimed', help='PnP device state, for the pnp operation')
+    parser.add_argument('--family', default=None, help='device family, for the search operation')
+    parser.add_argument('--ip-prefix', default=None, help='management IP address prefix, for the search operation')
+    args = parser.parse_args()
+
+    registry = ClusterRegistry()
+    regions = args.regions.split(',') if args.regions else None
+    if args.command == 'list':
+        for cluster in registry.get_clusters(regions):
+            print('%-20s %-12s %s' % (cluster.name, cluster.region, cluster.url))
+        return
+
+    start_time = time.time()
+    if args.command == 'find-serial':
+        if not args.value:
+            parser.error('the serial number is required')
+        match_list, cluster_results = registry.find_device_serial(args.value, regions)
+    elif args.command == 'pnp':
+        match_list, cluster_results = registry.discover_pnp_devices(args.state or None, regions=regions)
+    else:
+        match_list, cluster_results = registry.search_inventory(args.value, args.family, args.ip_prefix,
+                                                                regions=regions)
+    fan_out_time = time.time() - start_time
+
+    for cluster_name, item in match_list:
+        print('%-20s %s' % (cluster_name, item))
+    print('\n%-20s %-12s %10s  %s' % ('cluster', 'region', 'time (s)', 'result'))
+    for cluster_name in sorted(cluster_results):
+        cluster_result = cluster_results[cluster_name]
+        result = cluster_result['result']
+        print('%-20s %-12s %10.2f  %s' % (cluster_name, cluster_result['region'], cluster_result['time'],
+                                          cluster_result['error'] or (len(result) if isinstance(result, list)
+                                                                      else int(result is not None))))
+    slowest_time = max([cluster_result['time'] for cluster_result in cluster_results.values()] or [0])
+    print('\nMatches: ', len(match_list), ' , fan out time: %.2f seconds, slowest cluster: %.2f seconds'
+          % (fan_out_time, slowest_time))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
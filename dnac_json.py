@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the JSON decoding for the large DNA Center responses: inventory, topology, configurations.
+# The fastest installed decoder is used, msgspec, orjson, or the standard library json module. The records from
+# "dnac_models.py" are decoded selectively: with msgspec only the record fields are decoded, the other fields are
+# skipped while parsing; with orjson and json the response is decoded, the record fields are copied, and the dict
+# tree is released.
+
+import json
+import typing
+import threading
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import dnac_models
+
+
+JSON_BACKENDS = [backend for backend, module in [('msgspec', msgspec), ('orjson', orjson)] if module] + ['json']
+JSON_BACKEND = JSON_BACKENDS[0]
+
+DECODERS = {}  # (list path, record class) tuple: msgspec decoder
+DECODERS_LOCK = threading.Lock()
+
+
+def loads(content, backend=None):
+    """
+    This function will decode the JSON {content}
+    :param content: JSON bytes or string, example the requests response content
+    :param backend: 'msgspec', 'orjson' or 'json', default the fastest installed
+    :return: decoded dicts and lists
+    """
+    backend = backend or JSON_BACKEND
+    if backend == 'msgspec':
+        return msgspec.json.decode(content)
+    if backend == 'orjson':
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def decode_records(content, record_class, list_path=('response',), backend=None):
+    """
+    This function will decode the list at the {list_path} in the JSON {content} to records
+    :param content: JSON bytes or string
+    :param record_class: record class from "dnac_models.py"
+    :param list_path: path to the list in the JSON, () for the JSON list
+    :param backend: 'msgspec', 'orjson' or 'json', default the fastest installed
+    :return: list of records
+    """
+    return decode_record_lists(content, [(list_path, record_class)], backend)[0]
+
+
+def decode_record_lists(content, list_specs, backend=None):
+    """
+    This function will decode many lists from the same JSON {content} to records, example the topology nodes and links
+    :param content: JSON bytes or string
+    :param list_specs: list of (list path, record class)
+    :param backend: 'msgspec', 'orjson' or 'json', default the fastest installed
+    :return: list with the list of records for each list spec
+    """
+    backend = backend or JSON_BACKEND
+    decoded = None
+    if backend == 'msgspec':
+        try:
+            decoded = get_decoder(list_specs).decode(content)
+        except msgspec.ValidationError:
+            # a field with an unexpected type, the full response is decoded
+            backend = 'json'
+    if decoded is None:
+        decoded = loads(content, backend)
+    return [[record_class.from_json(item) for item in dnac_models.get_path_value(decoded, list_path) or []]
+            for list_path, record_class in list_specs]
+
+
+def get_decoder(list_specs):
+    """
+    This function will return the msgspec decoder for the {list_specs}, only the record fields are decoded
+    :param list_specs: list of (list path, record class)
+    :return: msgspec decoder
+    """
+    decoder_key = tuple((tuple(list_path), record_class) for list_path, record_class in list_specs)
+    with DECODERS_LOCK:
+        decoder = DECODERS.get(decoder_key)
+        if decoder is None:
+            envelope_tree = {}
+            for list_path, record_class in list_specs:
+                item_tree = {}
+                for attribute, key_path in record_class.FIELDS:
+                    add_key_path(item_tree, key_path)
+                item_type = typing.Optional[typing.List[build_type(record_class.__name__, item_tree)]]
+                if not list_path:
+                    envelope_tree = item_type
+                    break
+                node = envelope_tree
+                for key in list_path[:-1]:
+                    node = node.setdefault(key, {})
+                node[list_path[-1]] = item_type
+            decoder = msgspec.json.Decoder(build_type('Envelope', envelope_tree))
+            DECODERS[decoder_key] = decoder
+    return decoder
+
+
+def add_key_path(tree, key_path):
+    """
+    Add the {key_path} to the {tree}, nested dicts with the keys
+    """
+    for key in key_path:
+        tree = tree.setdefault(key, {})
+
+
+def build_type(name, tree):
+    """
+    This function will build the msgspec type for the {tree}: a struct with the tree keys as fields, a list for the
+    list indexes and the (key, value) list item selectors, or any value for the tree leaves
+    :param name: struct name
+    :param tree: nested dicts with the keys, or a type
+    :return: type
+    """
+    if not isinstance(tree, dict):
+        return tree
+    if not tree:
+        return typing.Any
+    if all(isinstance(key, (int, tuple)) for key in tree):
+        item_tree = {}
+        for key, child_tree in tree.items():
+            merge_tree(item_tree, child_tree)
+            if isinstance(key, tuple):
+                item_tree.setdefault(key[0], {})
+        return typing.Optional[typing.List[build_type(name, item_tree)]]
+    fields = [(key, build_type(name + '_' + key, child_tree), None) for key, child_tree in tree.items()]
+    return typing.Optional[msgspec.defstruct(name, fields)]
+
+
+def merge_tree(tree, other_tree):
+    """
+    Add the keys from the {other_tree} to the {tree}
+    """
+    for key, child_tree in other_tree.items():
+        merge_tree(tree.setdefault(key, {}), child_tree)
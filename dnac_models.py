@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the compact records for the DNA Center and ServiceNow objects retrieved in bulk: network
+# devices, PnP devices, sites, buildings and floors, topology nodes and links, incidents. Each record class has the
+# {FIELDS}, the record attribute and the path to the value in the API JSON, and only these fields are kept, in slots,
+# instead of the full response dict. The records are used by the caches and the bulk operations.
+
+import operator
+
+
+def get_path_value(item, key_path):
+    """
+    This function will return the value at the {key_path} in the {item}
+    :param item: dict decoded from the API JSON, or an object with the same attributes
+    :param key_path: tuple of keys, list indexes, and (key, value) to select the list item with the key value,
+    example ('deviceInfo', 'httpHeaders', 0, 'value'), ('additionalInfo', ('nameSpace', 'Location'), 'attributes')
+    :return: the value, or {None} if missing
+    """
+    for key in key_path:
+        if item is None:
+            return None
+        if isinstance(key, int):
+            item = item[key] if len(item) > key else None
+        elif isinstance(key, tuple):
+            selector_key, selector_value = key
+            item = next((list_item for list_item in item if (list_item.get(selector_key) if isinstance(list_item, dict)
+                         else getattr(list_item, selector_key, None)) == selector_value), None)
+        elif isinstance(item, dict):
+            item = item.get(key)
+        else:
+            item = getattr(item, key, None)
+    return item
+
+
+def slot_names(fields):
+    """
+    :return: the slot names for the record {fields}
+    """
+    return tuple(attribute for attribute, key_path in fields)
+
+
+class Record:
+    """
+    Base class for the records, the subclasses define the {FIELDS} and the {__slots__} for the fields added
+    """
+
+    __slots__ = ()
+    FIELDS = ()  # (attribute, key path in the API JSON)
+    ATTRIBUTES = ()
+    KEYS = None  # the API JSON keys, if all the key paths have one key
+    KEYS_GETTER = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.ATTRIBUTES = slot_names(cls.FIELDS)
+        cls.KEYS = None
+        if len(cls.FIELDS) > 1 and all(len(key_path) == 1 and isinstance(key_path[0], str)
+                                       for attribute, key_path in cls.FIELDS):
+            cls.KEYS = tuple(key_path[0] for attribute, key_path in cls.FIELDS)
+            cls.KEYS_GETTER = operator.attrgetter(*cls.KEYS)
+
+    def __init__(self, **values):
+        for attribute, key_path in self.FIELDS:
+            setattr(self, attribute, values.get(attribute))
+
+    @classmethod
+    def from_json(cls, item):
+        """
+        :param item: dict decoded from the API JSON, or the msgspec struct with the same fields
+        :return: new record with the {FIELDS} values from the {item}
+        """
+        if cls.KEYS is None:
+            values = [get_path_value(item, key_path) for attribute, key_path in cls.FIELDS]
+        elif isinstance(item, dict):
+            values = map(item.get, cls.KEYS)
+        else:
+            values = cls.KEYS_GETTER(item)
+        record = cls.__new__(cls)
+        for attribute, value in zip(cls.ATTRIBUTES, values):
+            setattr(record, attribute, value)
+        return record
+
+    def to_dict(self):
+        return dict((attribute, getattr(self, attribute)) for attribute, key_path in self.FIELDS)
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(' + ', '.join(attribute + '=' + repr(getattr(self, attribute))
+                                                          for attribute, key_path in self.FIELDS) + ')'
+
+
+class NetworkDevice(Record):
+    """
+    Network device from the inventory, '/api/v1/network-device'
+    """
+
+    FIELDS = (('device_id', ('id',)),
+              ('hostname', ('hostname',)),
+              ('ip_address', ('managementIpAddress',)),
+              ('serial_number', ('serialNumber',)),
+              ('mac_address', ('macAddress',)),
+              ('family', ('family',)),
+              ('platform_id', ('platformId',)),
+              ('software_version', ('softwareVersion',)),
+              ('role', ('role',)),
+              ('reachability', ('reachabilityStatus',)),
+              ('wlc_ip', ('associatedWlcIp',)),
+              ('last_update_time', ('lastUpdateTime',)))
+    __slots__ = slot_names(FIELDS)
+
+
+class PnPDevice(Record):
+    """
+    Device from the PnP database, '/dna/intent/api/v1/onboarding/pnp-device'
+    """
+
+    FIELDS = (('pnp_id', ('id',)),
+              ('serial_number', ('deviceInfo', 'serialNumber')),
+              ('hostname', ('deviceInfo', 'hostname')),
+              ('mac_address', ('deviceInfo', 'macAddress')),
+              ('pid', ('deviceInfo', 'pid')),
+              ('state', ('deviceInfo', 'state')),
+              ('onb_state', ('deviceInfo', 'onbState')),
+              ('ip_address', ('deviceInfo', 'httpHeaders', 0, 'value')))
+    __slots__ = slot_names(FIELDS)
+
+
+class TopologyNode(Record):
+    """
+    Physical topology node, '/api/v1/topology/physical-topology'
+    """
+
+    FIELDS = (('node_id', ('id',)),
+              ('label', ('label',)),
+              ('ip_address', ('ip',)),
+              ('device_type', ('deviceType',)),
+              ('family', ('family',)))
+    __slots__ = slot_names(FIELDS)
+
+
+class TopologyLink(Record):
+    """
+    Physical topology link, '/api/v1/topology/physical-topology'
+    """
+
+    FIELDS = (('source', ('source',)),
+              ('target', ('target',)),
+              ('start_port_ip', ('startPortIpv4Address',)),
+              ('start_port_name', ('startPortName',)),
+              ('end_port_ip', ('endPortIpv4Address',)),
+              ('end_port_name', ('endPortName',)))
+    __slots__ = slot_names(FIELDS)
+
+
+class Site(Record):
+    """
+    Site hierarchy group: area, building or floor, '/api/v1/group?groupType=SITE'
+    """
+
+    FIELDS = (('site_id', ('id',)),
+              ('name', ('name',)),
+              ('hierarchy', ('groupNameHierarchy',)),
+              ('parent_id', ('parentId',)),
+              ('site_type', ('additionalInfo', ('nameSpace', 'Location'), 'attributes', 'type')))
+    __slots__ = slot_names(FIELDS)
+
+
+class Building(Site):
+    """
+    Site hierarchy building, with the address and the geolocation
+    """
+
+    FIELDS = Site.FIELDS + (('address', ('additionalInfo', ('nameSpace', 'Location'), 'attributes', 'address')),
+                            ('latitude', ('additionalInfo', ('nameSpace', 'Location'), 'attributes', 'latitude')),
+                            ('longitude', ('additionalInfo', ('nameSpace', 'Location'), 'attributes', 'longitude')))
+    __slots__ = slot_names(FIELDS[len(Site.FIELDS):])
+
+
+class Floor(Site):
+    """
+    Site hierarchy floor, with the floor number and the dimensions
+    """
+
+    FIELDS = Site.FIELDS + (('floor_number', ('additionalInfo', ('nameSpace', 'mapsSummary'), 'attributes',
+                                              'floorIndex')),
+                            ('width', ('additionalInfo', ('nameSpace', 'mapGeometry'), 'attributes', 'width')),
+                            ('length', ('additionalInfo', ('nameSpace', 'mapGeometry'), 'attributes', 'length')),
+                            ('height', ('additionalInfo', ('nameSpace', 'mapGeometry'), 'attributes', 'height')))
+    __slots__ = slot_names(FIELDS[len(Site.FIELDS):])
+
+
+SITE_CLASSES = {'building': Building, 'floor': Floor}  # site type: record class, the other types are Site
+
+
+def site_from_json(item):
+    """
+    This function will return the record for the site group {item}, Building, Floor or Site, by the site type
+    :param item: site group dict decoded from the API JSON
+    :return: new record
+    """
+    site_type = get_path_value(item, Site.FIELDS[-1][1])
+    return SITE_CLASSES.get(site_type, Site).from_json(item)
+
+
+class Incident(Record):
+    """
+    ServiceNow incident, '/table/incident'
+    """
+
+    FIELDS = (('sys_id', ('sys_id',)),
+              ('number', ('number',)),
+              ('state', ('state',)),
+              ('short_description', ('short_description',)),
+              ('priority', ('priority',)),
+              ('opened_at', ('opened_at',)),
+              ('updated_on', ('sys_updated_on',)))
+    __slots__ = slot_names(FIELDS)
+
+
+class Topology:
+    """
+    Physical topology, the nodes and links records, indexed by the node id and the link start port IP address
+    """
+
+    __slots__ = ('nodes', 'links', 'node_labels', 'start_port_links')
+
+    def __init__(self, node_list, link_list):
+        """
+        :param node_list: list of TopologyNode
+        :param link_list: list of TopologyLink
+        """
+        self.nodes = node_list
+        self.links = link_list
+        self.node_labels = dict((node.node_id, node.label) for node in node_list)
+        self.start_port_links = {}  # link start port IP address: first link
+        for link in link_list:
+            if link.start_port_ip and link.start_port_ip not in self.start_port_links:
+                self.start_port_links[link.start_port_ip] = link
+
+    def find_connection(self, ip_address):
+        """
+        This function will find the connected device and interface for the device/client with the {ip_address}, see
+        {dnac_apis.find_topology_connection}
+        :param ip_address: device/interface IP address
+        :return: connected device hostname and interface, {None} if not found
+        """
+        link = self.start_port_links.get(ip_address)
+        if link is None:
+            return None, None
+        return self.node_labels.get(link.target), link.end_port_name
@@ -4,12 +4,20 @@
 # developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
 
 
+import os
 import time
 import urllib3
 import logging
+import argparse
 
 import dnac_apis
+import log_config
 import service_now_apis
+import ap_assignment
+import pnp_tracker
+import inventory_sync
+import ap_verify
+import metrics
 
 from requests.auth import HTTPBasicAuth  # for Basic Auth
 from urllib3.exceptions import InsecureRequestWarning  # for insecure https warnings
@@ -17,158 +25,288 @@ from urllib3.exceptions import InsecureRequestWarning  # for insecure https warn
 from config import DNAC_PASS, DNAC_USER
 from config import PnP_WLC_NAME
 from config import SNOW_DEV
-from config import AP_ASSIGN_SITE
+from config import AP_ASSIGN_SITE, AP_ASSIGN_FILE
+from config import METRICS_FILE, TRACE_DIR
+from config import PNP_POLL_INTERVAL, INVENTORY_SETTLE_TIME, PNP_PROVISION_TIMEOUT
 
 urllib3.disable_warnings(InsecureRequestWarning)  # disable insecure https warnings
 
+LOGGER = logging.getLogger(__name__)
+
 DNAC_AUTH = HTTPBasicAuth(DNAC_USER, DNAC_PASS)
 
+# inventory change feed, to find the provisioned APs added to the inventory
+INVENTORY = inventory_sync.InventorySync()
 
-def main():
+
+def scan_pnp_devices(assignment_db, dnac_jwt_token):
     """
-    - identify any PnP unclaimed APs
-    - map to local database to identify the floor to be provisioned to
-    - claim the device
+    This function will find the PnP devices in 'Unclaimed' and 'Initialized' state, assigned to a floor in the AP
+    assignment database
+    :param assignment_db: AP assignment database
+    :param dnac_jwt_token: DNA C token
+    :return: list of (PnP device, AP assignment) for the devices ready to be claimed
+    """
+    pnp_unclaimed_device_count = dnac_apis.pnp_get_device_count('Unclaimed', dnac_jwt_token)
+    if pnp_unclaimed_device_count == 0:
+        return []
+
+    # get the pnp devices info, ready to be claimed: state = Unclaimed "and" onboard_state = Initialized
+    pnp_device_list = list(dnac_apis.pnp_query_devices(dnac_jwt_token, state='Unclaimed', onb_state='Initialized'))
+
+    # map to the AP assignment database to identify the floor to be provisioned to
+    matched_list, unmatched_list = ap_assignment.match_pnp_devices(assignment_db, pnp_device_list)
+    ap_assignment.report_unmatched_devices(unmatched_list)
+    if matched_list:
+        print('\nFound Unclaimed PnP devices count: ', pnp_unclaimed_device_count)
+    return matched_list
+
+
+def discover_pnp_devices(assignment_db, dnac_jwt_token):
+    """
+    This function will wait for the PnP devices in 'Unclaimed' and 'Initialized' state, assigned to a floor in the AP
+    assignment database. If no devices are found, it will check again every 10 seconds
+    :param assignment_db: AP assignment database
+    :param dnac_jwt_token: DNA C token
+    :return: list of (PnP device, AP assignment) for the devices ready to be claimed
+    """
+    while True:
+        try:
+            matched_list = scan_pnp_devices(assignment_db, dnac_jwt_token)
+            if matched_list:
+                return matched_list
+        except:
+            pass
+        time.sleep(10)
+
+
+def log_pnp_transition(device_id, previous_state, device_state, timestamp):
+    """
+    This function will log the PnP state transition for the device with the {device_id}
+    :param device_id: PnP device id
+    :param previous_state: previous PnP state
+    :param device_state: new PnP state
+    :param timestamp: epoch time of the state transition
+    :return:
+    """
+    metrics.set_trace_id(device_id)
+    LOGGER.info('PnP device state changed from %s to %s', previous_state, device_state)
+    metrics.set_trace_id(None)
+
+
+def update_incident(onboarding, comment):
+    """
+    This function will update the ServiceNow incident for the device being onboarded, with the {comment}
+    :param onboarding: device onboarding info, including the PnP {device_id} and the {incident} number
+    :param comment: comment
+    :return:
+    """
+    metrics.set_trace_id(onboarding['device_id'])
+    with metrics.stage('servicenow'):
+        service_now_apis.update_incident(onboarding['incident'], comment, SNOW_DEV)
+
+
+def onboard_pnp_devices(matched_list, dnac_jwt_token, poll_interval=PNP_POLL_INTERVAL,
+                        settle_time=INVENTORY_SETTLE_TIME, provision_timeout=PNP_PROVISION_TIMEOUT):
+    """
+    This function will onboard the PnP devices in the {matched_list}:
+    - create a ServiceNow incident for each device
+    - claim the devices to the assigned floors
     - verify PnP process workflow
     - re-sync the WLC controller
-    - verify the AP on-boarded using the Cisco DNA Center Inventory
-      - reachability, IP address, access switch info, WLC info
-    - create, update a ServiceNow incident with the information
-    - close ServiceNow incident if PnP completes successfully
+    - verify the APs on-boarded using the Cisco DNA Center Inventory, update and close the ServiceNow incidents
+    :param matched_list: list of (PnP device, AP assignment) for the devices ready to be claimed
+    :param dnac_jwt_token: DNA C token
+    :param poll_interval: time between the PnP state polls, in seconds
+    :param settle_time: maximum time to wait for the APs to be added to the inventory after the WLC re-sync, seconds
+    :param provision_timeout: maximum time to wait for the claimed devices to be provisioned, in seconds, the devices
+    not provisioned are failed
+    :return: list of the provisioned devices onboarding info
     """
+    # create service now incident for each device
+    onboarding_list = []
+    for pnp_device, pnp_device_assign in matched_list:
+        pnp_device_name = pnp_device_assign['device_hostname'] or pnp_device.hostname
 
-    # run the application on demand, scanning for a new device in the Cisco DNA Center PnP Provisioning tab
+        print('\nThis application will assign the device \n', pnp_device_name,
+              ' to the site: ', pnp_device_assign['site_name'] + ' / ' + pnp_device_assign['floor_name'])
 
-    print('\n\nApplication "dnac_pnp_ap.py" started')
+        comment = '\nUnclaimed PnP device info:'
+        comment += '\nPnP Device Hostname: ' + pnp_device_name
+        comment += '\nPnP Device Id: ' + pnp_device.pnp_id
 
-    # device info and site
+        print(comment)
 
-    pnp_device_assign = AP_ASSIGN_SITE
+        metrics.set_trace_id(pnp_device.pnp_id)
+        with metrics.stage('servicenow'):
+            incident_number = service_now_apis.create_incident('AP PnP API Provisioning: ' + pnp_device_name,
+                                                               comment, SNOW_DEV, 3)
+        print('Created new ServiceNow Incident: ', incident_number)
 
-    site_name = pnp_device_assign['site_name']
-    floor_name = pnp_device_assign['floor_name']
-    pnp_device_name = pnp_device_assign['device_hostname']
+        onboarding_list.append({'device_id': pnp_device.pnp_id, 'serial': pnp_device.serial_number,
+                                'device_name': pnp_device_name,
+                                'floor_id': pnp_device_assign['floor_id'],
+                                'rf_profile': pnp_device_assign['rf_profile'], 'incident': incident_number})
 
-    print('\nThis application will assign the device \n', pnp_device_name,
-          ' to the site: ', pnp_device_assign['site_name'] + ' / ' + floor_name)
+    print('\nAP PnP Provisioning Started (this may take few minutes)')
 
-    # logging, debug level, to file {application_run.log}
-    logging.basicConfig(
-        filename='application_run.log',
-        level=logging.DEBUG,
-        format='%(asctime)s.%(msecs)03d %(levelname)s %(module)s - %(funcName)s: %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S')
+    # start the inventory change feed, the provisioned APs are found in the inventory changes after the claim
+    metrics.set_trace_id(None)
+    INVENTORY.start(dnac_jwt_token)
+
+    # start the claim process of the devices to the floors, using bulk claims
+    device_id_list = [onboarding['device_id'] for onboarding in onboarding_list]
+    with metrics.stage('claim', device_id_list):
+        claim_results = dnac_apis.pnp_claim_ap_site_bulk(onboarding_list, dnac_jwt_token)
+    claim_end = time.time()
+
+    for onboarding in onboarding_list:
+        comment = '\nClaim Result: ' + claim_results[onboarding['device_id']]
+        metrics.set_trace_id(onboarding['device_id'])
+        LOGGER.info('PnP device %s claim result: %s', onboarding['device_name'], claim_results[onboarding['device_id']])
+
+        # update ServiceNow incident
+        print(onboarding['device_name'], comment)
+        update_incident(onboarding, comment)
+
+    # check claim status every {poll_interval} seconds for all devices, using one PnP device list query,
+    # build a progress status list, end when state == provisioned or error
+    pnp_state_tracker = pnp_tracker.PnPStateTracker(dnac_jwt_token, poll_interval=poll_interval)
+    for onboarding in onboarding_list:
+        pnp_state_tracker.add_device(onboarding['device_id'], onboarding['serial'])
+    metrics.set_trace_id(None)
+    with metrics.stage('provisioning_poll'):
+        status_lists = pnp_state_tracker.run(provision_timeout, on_transition=log_pnp_transition)
+    dnac_jwt_token = pnp_state_tracker.dnac_jwt_token  # a new token, if created after the poll errors
+
+    for onboarding in onboarding_list:
+        comment = ''
+        for status, timestamp in status_lists[onboarding['device_id']]:
+            comment += '\nPnP Device State: ' + status + ' , ' + time.strftime('%H:%M:%S', time.localtime(timestamp))
+
+        # the device provisioning ends when the last state is reported
+        if status_lists[onboarding['device_id']]:
+            metrics.record_stage('provisioning', claim_end, status_lists[onboarding['device_id']][-1][1],
+                                 [onboarding['device_id']])
+
+        # update service now incident
+        print(onboarding['device_name'], comment)
+        update_incident(onboarding, comment)
+        onboarding['state'] = pnp_state_tracker.device_states.get(onboarding['device_id'])
+
+    # continue only with the provisioned devices
+    for onboarding in onboarding_list:
+        if onboarding['state'] != 'Provisioned':
+            print('\nPnP provisioning failed for the device: ', onboarding['device_name'])
+    onboarding_list = [onboarding for onboarding in onboarding_list if onboarding['state'] == 'Provisioned']
+
+    # sync the PnP WLC once for all the devices, wait {settle_time} seconds to complete
+    device_id_list = [onboarding['device_id'] for onboarding in onboarding_list]
+    metrics.set_trace_id(None)
+    with metrics.stage('wlc_sync', device_id_list):
+        dnac_apis.sync_device(PnP_WLC_NAME, dnac_jwt_token)
+    print('\nDNA Center Device Re-sync started: ', PnP_WLC_NAME)
 
-    dnac_token = dnac_apis.get_dnac_jwt_token(DNAC_AUTH)
+    # wait up to {settle_time} seconds for the APs to be added to the inventory
+    with metrics.stage('inventory_settle', device_id_list):
+        ap_device_dict = INVENTORY.wait_for_devices(dnac_jwt_token,
+                                                    [onboarding['device_name'] for onboarding in onboarding_list],
+                                                    settle_time)
 
-    # check if any devices in 'Unclaimed' and 'Initialized' state, if not wait for 10 seconds and run again
-    pnp_unclaimed_device_count = 0
-    while pnp_unclaimed_device_count == 0:
-        try:
-            pnp_unclaimed_device_count = dnac_apis.pnp_get_device_count('Unclaimed', dnac_token)
-            if pnp_unclaimed_device_count != 0:
-
-                # get the pnp device info
-                pnp_devices_info = dnac_apis.pnp_get_device_list(dnac_token)
-                device_state = pnp_devices_info[0]['deviceInfo']['state']
-                device_onb_state = pnp_devices_info[0]['deviceInfo']['onbState']
-
-                # verify if device is ready to be claimed: state = Unclaimed "and" onboard_state = Initialized
-                if device_state == 'Unclaimed' and device_onb_state == 'Initialized':
-                    break
-                else:
-                    pnp_unclaimed_device_count = 0
-        except:
-            pass
-        time.sleep(10)
+    # the new APs are included in the topology after the WLC re-sync
+    ap_verify.TOPOLOGY_CACHE.invalidate()
 
-    print('\nFound Unclaimed PnP devices count: ', pnp_unclaimed_device_count)
+    # verify the APs on-boarded, the inventory lookups for all the APs are made concurrently
+    ap_list = [{'device_name': onboarding['device_name'], 'device_id': onboarding['device_id'],
+                'device_info': ap_device_dict[onboarding['device_name']]} for onboarding in onboarding_list]
+    ap_summaries = ap_verify.verify_aps(ap_list, dnac_jwt_token)
 
-    pnp_device_id = pnp_devices_info[0]['id']
+    for onboarding in onboarding_list:
+        ap_summary = ap_summaries[onboarding['device_name']]
+        comment = ap_verify.format_ap_comment(ap_summary)
 
-    comment = '\nUnclaimed PnP device info:'
-    comment += '\nPnP Device Hostname: ' + pnp_device_name
-    comment += '\nPnP Device Id: ' + pnp_device_id
+        print(comment)
+        LOGGER.info('PnP device %s provisioned: %s', onboarding['device_name'], comment.replace('\n', ' '))
+        update_incident(onboarding, comment)
 
-    print(comment)
+        # the incident stays open if the AP info is not available
+        if ap_summary['error'] is None:
+            with metrics.stage('servicenow'):
+                service_now_apis.close_incident(onboarding['incident'], SNOW_DEV)
+    return onboarding_list
 
-    # create service now incident
-    incident_number = service_now_apis.create_incident('AP PnP API Provisioning: ' + pnp_device_name, comment, SNOW_DEV, 3)
-    print('Created new ServiceNow Incident: ', incident_number)
 
-    # get the floor id to assign device to using pnp
+def load_assignment():
+    """
+    This function will load the AP assignment database, or use the single AP assignment {AP_ASSIGN_SITE} if the
+    assignment file {AP_ASSIGN_FILE} does not exist
+    :return: AP assignment database
+    """
+    if os.path.isfile(AP_ASSIGN_FILE):
+        assignment_db = ap_assignment.load_assignment_db(AP_ASSIGN_FILE)
+    else:
+        assignment_db = ap_assignment.build_assignment_db([AP_ASSIGN_SITE])
+    print('\nAP assignment database loaded, assignments count: ',
+          len(ap_assignment.get_assignment_list(assignment_db)))
+    return assignment_db
 
-    floor_id = dnac_apis.get_floor_id(site_name, 'Floor 3', dnac_token)
-    print('Floor Id: ', floor_id)
 
-    print('\nAP PnP Provisioning Started (this may take few minutes)')
+def main():
+    """
+    - identify any PnP unclaimed APs
+    - map to local database to identify the floor to be provisioned to
+    - claim the devices
+    - verify PnP process workflow
+    - re-sync the WLC controller
+    - verify the APs on-boarded using the Cisco DNA Center Inventory
+      - reachability, IP address, access switch info, WLC info
+    - create, update a ServiceNow incident with the information, for each AP
+    - close ServiceNow incident if PnP completes successfully
+    """
 
-    # start the claim process of the device to site
-    claim_result = dnac_apis.pnp_claim_ap_site(pnp_device_id, floor_id, 'TYPICAL', dnac_token)
-    comment = '\nClaim Result: ' + claim_result
+    # run the application on demand, scanning for new devices in the Cisco DNA Center PnP Provisioning tab
 
-    # update ServiceNow incident
-    print(comment)
-    service_now_apis.update_incident(incident_number, comment, SNOW_DEV)
+    print('\n\nApplication "dnac_pnp_ap.py" started')
 
-    # check claim status every 5 seconds, build a progress status list, end when state == provisioned, exit
-    status_list = []
-    claim_status = dnac_apis.pnp_get_device_info(pnp_device_id, dnac_token)['state']
-    status_list.append(claim_status)
+    # logging, JSON records, to the rotating log file {LOG_FILE}
+    log_config.setup_logging()
 
-    while claim_status != 'Provisioned':
-        claim_status = dnac_apis.pnp_get_device_info(pnp_device_id, dnac_token)['state']
-        if claim_status not in status_list:
-            status_list.append(claim_status)
-        time.sleep(5)
+    dnac_token = dnac_apis.get_dnac_token(DNAC_AUTH)
 
-    comment = ''
-    for status in status_list:
-        comment += '\nPnP Device State: ' + status
+    assignment_db = load_assignment()
 
-    # update service now incident
-    print(comment)
-    service_now_apis.update_incident(incident_number, comment, SNOW_DEV)
+    # find the floor ids, once for each unique floor
+    missing_floors = ap_assignment.resolve_floor_ids(assignment_db, dnac_token)
+    for floor in missing_floors:
+        print('Floor not found: ', floor)
 
-    # sync the PnP WLC, wait 60 seconds to complete
-    dnac_apis.sync_device(PnP_WLC_NAME, dnac_token)
-    print('\nDNA Center Device Re-sync started: ', PnP_WLC_NAME)
+    # wait for unclaimed PnP devices, assigned to a floor
+    with metrics.stage('discovery') as stage_info:
+        matched_list = discover_pnp_devices(assignment_db, dnac_token)
+        stage_info['trace_ids'] = [pnp_device.pnp_id for pnp_device, pnp_device_assign in matched_list]
 
-    # wait 60 seconds and check for inventory for AP info
-    time.sleep(60)
-
-    # collect AP info
-    ap_device_id = dnac_apis.get_device_id_name(pnp_device_name, dnac_token)
-    ap_device_info = dnac_apis.get_device_info(ap_device_id, dnac_token)
-    ap_reachability = ap_device_info['reachabilityStatus']
-    ap_controller_ip = ap_device_info['associatedWlcIp']
-    ap_ip_address = ap_device_info['managementIpAddress']
-    ap_device_location = dnac_apis.get_device_location(pnp_device_name, dnac_token)
-    ap_access_switch_info = dnac_apis.get_physical_topology(ap_ip_address, dnac_token)
-    ap_access_switch_hostname = ap_access_switch_info[0]
-    ap_access_switch_port = ap_access_switch_info[1]
-
-    # collect WLC info
-    wlc_info = dnac_apis.get_device_info_ip(ap_controller_ip, dnac_token)
-    wlc_hostname = wlc_info['hostname']
-
-    comment = '\nProvisioned Access Point Info:\n - Reachability: ' + ap_reachability
-    comment += '\n - IP Address: ' + ap_ip_address
-    comment += '\n - Connected to: ' + ap_access_switch_hostname + ' , Interface: ' + ap_access_switch_port
-    comment += '\n - Location: ' + ap_device_location
-    comment += '\n - WLC Controller: ' + wlc_hostname + ' , IP Address: ' + ap_controller_ip
-
-    print(comment)
-    service_now_apis.update_incident(incident_number, comment, SNOW_DEV)
+    # onboard the devices
+    onboard_pnp_devices(matched_list, dnac_token)
 
     print('\n\nAP PnP provisoning completed')
 
-    service_now_apis.close_incident(incident_number, SNOW_DEV)
+    # save the onboarding metrics and the JSON trace for each AP
+    metrics.write_prometheus(METRICS_FILE)
+    metrics.write_traces(TRACE_DIR)
+    print('\nOnboarding metrics saved to: ', METRICS_FILE, ' , AP traces saved to: ', TRACE_DIR)
 
-    print('\nPnP provisioning completed successfully, ServiceNow incident closed')
+    print('\nPnP provisioning completed successfully, ServiceNow incidents closed')
 
     print('\n\nEnd of Application "dnac_pnp_ap.py" Run')
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Cisco DNA Center PnP AP onboarding')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep running, onboard the new PnP devices as they are found')
+    args = parser.parse_args()
+    if args.daemon:
+        import pnp_daemon
+        pnp_daemon.main()
+    else:
+        main()
@@ -6,13 +6,12 @@
 
 import time
 import urllib3
-import logging
 
 import dnac_apis
+import log_config
 
 from requests.auth import HTTPBasicAuth  # for Basic Auth
 from urllib3.exceptions import InsecureRequestWarning  # for insecure https warnings
-from netmiko import ConnectHandler
 
 from config import DNAC_PASS, DNAC_USER
 from config import PnP_WLC_NAME, PnP_WLC_IP, PnP_WLC_USER, PnP_WLC_PASS
@@ -31,6 +30,30 @@ DEVICE_INFO = {
     }
 
 
+def clear_ap_config(pnp_device_name):
+    """
+    This function will connect to the C9800-CL using ssh/netmiko, and clear the AP CAPWAP config
+    netmiko (paramiko, cryptography) is imported only when needed, it is slow to import
+    :param pnp_device_name: AP hostname
+    :return: the CLI command output
+    """
+    from netmiko import ConnectHandler
+
+    # connect to C9800-CL using ssh/netmiko
+    net_connect = ConnectHandler(**DEVICE_INFO)
+    command_output = net_connect.find_prompt()
+    print('\nPrompt of the connected device: ', command_output)
+
+    # send the command to clear the PnP AP capwap config
+    command = 'clear ap config ' + pnp_device_name
+    command_output = net_connect.send_command(command)
+    print(command_output)
+
+    # disconnect from the C9800-CL
+    net_connect.disconnect()
+    return command_output
+
+
 def main():
     """
     This application will:
@@ -54,12 +77,8 @@ def main():
 
     print('\nThis application will reset the DNA Center PnP AP demo')
 
-    # logging, debug level, to file {application_run.log}
-    logging.basicConfig(
-        filename='application_run.log',
-        level=logging.DEBUG,
-        format='%(asctime)s.%(msecs)03d %(levelname)s %(module)s - %(funcName)s: %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S')
+    # logging, JSON records, to the rotating log file {LOG_FILE}
+    log_config.setup_logging()
 
     dnac_token = dnac_apis.get_dnac_jwt_token(DNAC_AUTH)
 
@@ -74,18 +93,8 @@ def main():
     if device_state != 'Unclaimed':
         # if AP is unclaimed, go through the process to delete all configs
 
-        # connect to C9800-CL using ssh/netmiko
-        net_connect = ConnectHandler(**DEVICE_INFO)
-        command_output = net_connect.find_prompt()
-        print('\nPrompt of the connected device: ', command_output)
-
-        # send the command to clear the PnP AP capwap config
-        command = 'clear ap config ' + pnp_device_name
-        command_output = net_connect.send_command(command)
-        print(command_output)
-
-        # disconnect from the C9800-CL
-        net_connect.disconnect()
+        # clear the PnP AP capwap config from the C9800-CL
+        command_output = clear_ap_config(pnp_device_name)
 
         # check if error during CLI command and delete config manually
 
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the DNA Center HTTP session used by "dnac_apis.py". The identical GET requests made at the same
+# time by many threads are coalesced: one request is sent, and the response is shared by all the callers.
+# The GET responses are cached: reused for the endpoint time to live from HTTP_CACHE_TTLS, and revalidated with
+# If-None-Match or If-Modified-Since when the response includes the ETag or Last-Modified header. The cache is
+# bounded (least recently used responses are removed first), and saved to HTTP_CACHE_DIR if configured. Each
+# POST, PUT or DELETE request increments the generation of the API resource, before and after the request, and the
+# GET responses for the resource are not cached if the generation changed while the GET request was in progress.
+# The write requests completed by a task (site, building or floor create) change the resource when the task ends: the
+# resource is invalidated again when the task is reported completed, see {DnacSession.complete_task}.
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+import requests
+
+from requests.structures import CaseInsensitiveDict
+
+import metrics
+
+from config import HTTP_CACHE_TTLS, HTTP_CACHE_MAX_ENTRIES, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_DIR
+
+
+WRITE_TASKS_MAX = 1024  # maximum number of the write requests tasks tracked, the oldest tasks are removed first
+
+
+class InFlightRequest:
+    """
+    A GET request in progress, the response or the error is shared by all the callers waiting for it
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.waiters = 0
+        self.generation = 0  # the resource generation when the request was sent
+
+
+class CachedResponse:
+    """
+    A cached GET response: status, headers and content, the expiry time and the validators
+    """
+
+    def __init__(self, url, status_code, headers, content, encoding, expires):
+        self.url = url
+        self.status_code = status_code
+        self.headers = dict(headers)
+        self.content = content
+        self.encoding = encoding
+        self.expires = expires
+        self.etag = self.headers.get('ETag')
+        self.last_modified = self.headers.get('Last-Modified')
+
+    def is_fresh(self):
+        return time.time() < self.expires
+
+    def to_response(self):
+        """
+        :return: new requests response, with the cached status, headers and content
+        """
+        response = requests.Response()
+        response.url = self.url
+        response.status_code = self.status_code
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response._content = self.content
+        response._content_consumed = True
+        return response
+
+
+class HttpCache:
+    """
+    Least recently used cache of the GET responses, bounded by the number of responses and the total content size
+    """
+
+    def __init__(self, max_entries=HTTP_CACHE_MAX_ENTRIES, max_bytes=HTTP_CACHE_MAX_BYTES, cache_dir=HTTP_CACHE_DIR):
+        """
+        :param max_entries: maximum number of cached responses
+        :param max_bytes: maximum total size of the cached content
+        :param cache_dir: directory for the cached responses, optional
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()  # cache key: CachedResponse
+        self.size = 0
+        self.lock = threading.Lock()
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, cache_key):
+        """
+        :return: the cached response for the {cache_key}, fresh or not, or {None}
+        """
+        with self.lock:
+            cached_response = self.entries.get(cache_key)
+            if cached_response is not None:
+                self.entries.move_to_end(cache_key)
+                return cached_response
+        if self.cache_dir:
+            cached_response = self.load(cache_key)
+            if cached_response is not None:
+                self.set(cache_key, cached_response, save=False)
+        return cached_response
+
+    def set(self, cache_key, cached_response, save=True):
+        """
+        Save the response, and remove the least recently used responses over the limits
+        """
+        removed_list = []
+        with self.lock:
+            if cache_key in self.entries:
+                self.size -= len(self.entries.pop(cache_key).content)
+            self.entries[cache_key] = cached_response
+            self.size += len(cached_response.content)
+            while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                removed_key, removed_response = self.entries.popitem(last=False)
+                self.size -= len(removed_response.content)
+                removed_list.append(removed_key)
+        if self.cache_dir:
+            for removed_key in removed_list:
+                self.remove_file(removed_key)
+            if save:
+                self.save(cache_key, cached_response)
+
+    def invalidate_prefix(self, path_prefix):
+        """
+        Remove the cached responses for the URLs with the path starting with {path_prefix}
+        :return: number of responses removed
+        """
+        with self.lock:
+            removed_list = [cache_key for cache_key in self.entries
+                            if get_url_path(cache_key[0]).startswith(path_prefix)]
+            for cache_key in removed_list:
+                self.size -= len(self.entries.pop(cache_key).content)
+        if self.cache_dir:
+            for cache_key in removed_list:
+                self.remove_file(cache_key)
+        return len(removed_list)
+
+    def clear(self):
+        with self.lock:
+            removed_list = list(self.entries)
+            self.entries.clear()
+            self.size = 0
+        if self.cache_dir:
+            for cache_key in removed_list:
+                self.remove_file(cache_key)
+
+    def file_name(self, cache_key):
+        """
+        :return: the file name for the {cache_key}, the SHA-1 digest of the key
+        """
+        return os.path.join(self.cache_dir, hashlib.sha1(repr(cache_key).encode('utf-8')).hexdigest() + '.http')
+
+    def save(self, cache_key, cached_response):
+        """
+        Save the response to the file: one line with the JSON header, and the content
+        """
+        header = {'url': cached_response.url, 'status_code': cached_response.status_code,
+                  'headers': cached_response.headers, 'encoding': cached_response.encoding,
+                  'expires': cached_response.expires}
+        file_name = self.file_name(cache_key)
+        with open(file_name + '.tmp', 'wb') as cache_file:
+            cache_file.write(json.dumps(header).encode('utf-8') + b'\n')
+            cache_file.write(cached_response.content)
+        os.replace(file_name + '.tmp', file_name)
+
+    def load(self, cache_key):
+        """
+        :return: the response saved to the file for the {cache_key}, or {None}
+        """
+        try:
+            with open(self.file_name(cache_key), 'rb') as cache_file:
+                header = json.loads(cache_file.readline().decode('utf-8'))
+                content = cache_file.read()
+        except (IOError, ValueError):
+            return None
+        return CachedResponse(header['url'], header['status_code'], header['headers'], content, header['encoding'],
+                              header['expires'])
+
+    def remove_file(self, cache_key):
+        try:
+            os.remove(self.file_name(cache_key))
+        except OSError:
+            pass
+
+
+class DnacSession(metrics.TimedSession):
+    """
+    requests Session with the concurrent identical GET requests coalesced, and the GET responses cached. The requests
+    sent are recorded by the metrics module, the cache hits are recorded with the status 'cache_hit'
+    """
+
+    def __init__(self, cache_ttls=None, http_cache=None):
+        """
+        :param cache_ttls: dict with the endpoint: response time to live, in seconds, default HTTP_CACHE_TTLS
+        :param http_cache: HttpCache, default new cache
+        """
+        metrics.TimedSession.__init__(self)
+        self.in_flight = {}  # request key: InFlightRequest
+        self.in_flight_lock = threading.Lock()
+        self.generations = {}  # API resource path: number of POST, PUT or DELETE requests started and completed
+        self.write_tasks = OrderedDict()  # task id: API resource path, for the tasks started by the write requests
+        self.sent_count = 0
+        self.coalesced_count = 0
+        self.cache_ttls = HTTP_CACHE_TTLS if cache_ttls is None else cache_ttls
+        self.http_cache = http_cache or HttpCache()
+        self.cache_counts = {'hit': 0, 'miss': 0, 'revalidated': 0}
+
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        if kwargs.get('stream'):
+            return metrics.TimedSession.request(self, method, url, params=params, headers=headers, **kwargs)
+        if method.upper() != 'GET':
+            resource_path = get_resource_path(url)
+            self.increment_generation(resource_path)
+            try:
+                response = metrics.TimedSession.request(self, method, url, params=params, headers=headers, **kwargs)
+            finally:
+                self.increment_generation(resource_path)
+                self.http_cache.invalidate_prefix(resource_path)
+            self.add_write_task(response, resource_path)
+            return response
+        return self.cached_get(url, params=params, headers=headers, **kwargs)
+
+    def add_write_task(self, response, resource_path):
+        """
+        Save the id of the task started by the write request, if any, the {resource_path} is invalidated again when
+        the task is completed
+        """
+        try:
+            task_id = response.json()['response']['taskId']
+        except (ValueError, KeyError, TypeError):
+            return
+        with self.in_flight_lock:
+            self.write_tasks[task_id] = resource_path
+            while len(self.write_tasks) > WRITE_TASKS_MAX:
+                self.write_tasks.popitem(last=False)
+
+    def complete_task(self, task_id):
+        """
+        Invalidate the API resource changed by the write request that started the task with the {task_id}, called
+        when the task is completed. The GET responses cached while the task was in progress are removed
+        """
+        with self.in_flight_lock:
+            resource_path = self.write_tasks.pop(task_id, None)
+        if resource_path is not None:
+            self.increment_generation(resource_path)
+            self.http_cache.invalidate_prefix(resource_path)
+
+    def increment_generation(self, resource_path):
+        """
+        Increment the generation of the API resource, the GET requests in progress for the resource are not cached
+        """
+        with self.in_flight_lock:
+            self.generations[resource_path] = self.generations.get(resource_path, 0) + 1
+
+    def get_generation(self, resource_path):
+        with self.in_flight_lock:
+            return self.generations.get(resource_path, 0)
+
+    def cached_get(self, url, params=None, headers=None, **kwargs):
+        """
+        Return the cached response if fresh, or send the GET request, conditional if the cached response has
+        validators, and cache the response
+        :return: requests response
+        """
+        start_time = time.time()
+        endpoint = metrics.get_endpoint(url)
+        cache_key = get_cache_key(url, params)
+        cached_response = self.http_cache.get(cache_key)
+        if cached_response is not None and cached_response.is_fresh():
+            self.count_cache_result(endpoint, 'hit')
+            metrics.record_call('GET', url, 'cache_hit', len(cached_response.content), time.time() - start_time)
+            return cached_response.to_response()
+
+        request_headers = dict(headers or {})
+        if cached_response is not None:
+            if cached_response.etag:
+                request_headers['If-None-Match'] = cached_response.etag
+            if cached_response.last_modified:
+                request_headers['If-Modified-Since'] = cached_response.last_modified
+        response, generation = self.coalesced_get(url, params=params, headers=request_headers, **kwargs)
+
+        # the resource was changed while the request was in progress, the response may be older than the change
+        cacheable = generation == self.get_generation(get_resource_path(url))
+        ttl = self.cache_ttls.get(endpoint, 0)
+        if response.status_code == 304 and cached_response is not None:
+            self.count_cache_result(endpoint, 'revalidated')
+            if cacheable:
+                cached_response.expires = time.time() + ttl
+                self.http_cache.set(cache_key, cached_response)
+            return cached_response.to_response()
+
+        self.count_cache_result(endpoint, 'miss')
+        if cacheable and response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', '') \
+                and (ttl or 'ETag' in response.headers or 'Last-Modified' in response.headers):
+            self.http_cache.set(cache_key, CachedResponse(url, response.status_code, response.headers,
+                                                          response.content, response.encoding, time.time() + ttl))
+        return response
+
+    def count_cache_result(self, endpoint, result):
+        self.cache_counts[result] += 1
+        metrics.increment_counter('dnac_http_cache_requests_total', {'endpoint': endpoint, 'result': result},
+                                  'DNA Center GET requests by response cache result: hit, miss or revalidated')
+
+    def coalesced_get(self, url, params=None, headers=None, **kwargs):
+        """
+        Send the GET request, or wait for the identical GET request already in progress, and return its response
+        The requests with the same URL, query parameters, auth token and validators are identical
+        :return: requests response, and the API resource generation when the request was sent
+        """
+        request_key = get_request_key(url, params, headers)
+        with self.in_flight_lock:
+            in_flight_request = self.in_flight.get(request_key)
+            leader = in_flight_request is None
+            if leader:
+                in_flight_request = InFlightRequest()
+                in_flight_request.generation = self.generations.get(get_resource_path(url), 0)
+                self.in_flight[request_key] = in_flight_request
+                self.sent_count += 1
+            else:
+                in_flight_request.waiters += 1
+                self.coalesced_count += 1
+
+        if not leader:
+            metrics.increment_counter('dnac_coalesced_requests_total', {'endpoint': metrics.get_endpoint(url)},
+                                      'DNA Center GET requests sharing the response of an identical request')
+            in_flight_request.done.wait()
+            if in_flight_request.error is not None:
+                raise in_flight_request.error
+            return in_flight_request.response, in_flight_request.generation
+
+        try:
+            in_flight_request.response = metrics.TimedSession.request(self, 'GET', url, params=params,
+                                                                       headers=headers, **kwargs)
+            return in_flight_request.response, in_flight_request.generation
+        except Exception as request_error:
+            in_flight_request.error = request_error
+            raise
+        finally:
+            with self.in_flight_lock:
+                del self.in_flight[request_key]
+            in_flight_request.done.set()
+
+
+def get_request_key(url, params=None, headers=None):
+    """
+    This function will return the key identifying the GET request: the URL, the query parameters, the auth token and
+    the conditional request validators
+    :param url: request URL
+    :param params: query parameters, dict or list of tuples, optional
+    :param headers: request headers, optional
+    :return: request key
+    """
+    headers = headers or {}
+    return get_cache_key(url, params) + (headers.get('x-auth-token'), headers.get('If-None-Match'),
+                                         headers.get('If-Modified-Since'))
+
+
+def get_cache_key(url, params=None):
+    """
+    This function will return the key identifying the cached GET response: the URL and the query parameters
+    :param url: request URL
+    :param params: query parameters, dict or list of tuples, optional
+    :return: cache key
+    """
+    if isinstance(params, dict):
+        params = sorted(params.items())
+    return url, repr(params)
+
+
+def get_url_path(url):
+    """
+    This function will return the path of the {url}, without the server and the query string
+    """
+    return re.sub(r'^https?://[^/]+', '', url).split('?')[0]
+
+
+def get_resource_path(url):
+    """
+    This function will return the API resource path for the {url}, the path up to the segment after the API version,
+    example: '/api/v1/group' for '/api/v1/group/site/123/device'. The cached responses for the resource are not valid
+    after a POST, PUT or DELETE request
+    :param url: request URL
+    :return: resource path
+    """
+    segments = get_url_path(url).split('/')
+    for index, segment in enumerate(segments):
+        if segment in ('v1', 'v2'):
+            return '/'.join(segments[:index + 2])
+    return '/'.join(segments)
@@ -0,0 +1,667 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains a local stand-in HTTP server for Cisco DNA Center and ServiceNow, to measure and regression test
+# the applications without a live DNA Center, ServiceNow or WLC.
+# The server replays the recorded responses found in the fixture directory, and simulates the APIs not recorded:
+# PnP device list and claims, task API, inventory, topology, configs, templates, sites, hosts and ServiceNow incidents.
+# The response latency, the error injection rate and the inventory size are configurable.
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import metrics
+
+
+WLC_IP = '10.93.141.40'
+WLC_NAME = 'C9800-CL'
+SITE_NAME = 'PDX'
+FLOOR_NAME = 'Floor 3'
+
+
+def fixture_file_name(method, url):
+    """
+    This function will return the fixture file name for the API call {method} {url}
+    :param method: HTTP method
+    :param url: request URL
+    :return: file name, example 'GET__api_v1_network-device_{id}_config.json'
+    """
+    endpoint = metrics.get_endpoint(url)
+    return method.upper() + endpoint.replace('/', '_') + '.json'
+
+
+def start_recording(fixture_dir):
+    """
+    This function will save the responses of all the DNA Center and ServiceNow API calls to the {fixture_dir}, to be
+    replayed by the stub server. The last response for each endpoint is saved
+    :param fixture_dir: fixture directory
+    :return:
+    """
+    import dnac_apis
+    import service_now_apis
+
+    if not os.path.isdir(fixture_dir):
+        os.makedirs(fixture_dir)
+
+    def record_fixture(response, *args, **kwargs):
+        try:
+            response_json = response.json()
+        except ValueError:
+            return
+        file_name = os.path.join(fixture_dir, fixture_file_name(response.request.method, response.url))
+        with open(file_name, 'w') as fixture_file:
+            json.dump({'status': response.status_code, 'body': response_json}, fixture_file, indent=4)
+
+    dnac_apis.DNAC_SESSION.hooks['response'].append(record_fixture)
+    service_now_apis.SNOW_SESSION.hooks['response'].append(record_fixture)
+
+
+class StubState:
+    """
+    The simulated DNA Center and ServiceNow data
+    """
+
+    def __init__(self, ap_count=1, inventory_size=10, provision_time=3.0, fixture_dir=None):
+        """
+        :param ap_count: number of unclaimed APs in the PnP database
+        :param inventory_size: number of switches in the inventory, the WLC and the provisioned APs are added
+        :param provision_time: time from the AP claim to the Provisioned state, in seconds
+        :param fixture_dir: directory with the recorded responses, optional
+        """
+        self.lock = threading.Lock()
+        self.provision_time = provision_time
+        self.fixtures = {}
+        if fixture_dir and os.path.isdir(fixture_dir):
+            for file_name in os.listdir(fixture_dir):
+                with open(os.path.join(fixture_dir, file_name), 'r') as fixture_file:
+                    self.fixtures[file_name] = json.load(fixture_file)
+
+        self.sites = [{'id': str(uuid.uuid4()), 'name': 'Global', 'groupNameHierarchy': 'Global'}]
+        self.sites.append({'id': str(uuid.uuid4()), 'name': SITE_NAME, 'groupNameHierarchy': 'Global/' + SITE_NAME})
+        self.sites.append({'id': str(uuid.uuid4()), 'name': FLOOR_NAME,
+                           'groupNameHierarchy': 'Global/' + SITE_NAME + '/' + FLOOR_NAME})
+
+        # inventory: switches and the WLC, the access ports are connected to the APs
+        self.devices = []
+        self.switch_list = []
+        self.topology_links = []
+        for index in range(inventory_size):
+            self.add_device('SW-%04d' % index, '10.93.%d.%d' % (index // 250, index % 250 + 1), 'Switches and Hubs')
+        self.add_device(WLC_NAME, WLC_IP, 'Wireless Controller')
+        self.configs = {}
+        for device in self.devices:
+            self.configs[device['id']] = build_config(device)
+        self.hosts = []
+        for index in range(inventory_size * 4):
+            switch = self.devices[index % inventory_size] if inventory_size else self.devices[-1]
+            self.hosts.append({'id': str(uuid.uuid4()), 'hostIp': '10.94.%d.%d' % (index // 250, index % 250 + 1),
+                               'hostMac': '00:50:56:%02x:%02x:%02x' % (index >> 16 & 255, index >> 8 & 255,
+                                                                        index & 255),
+                               'connectedNetworkDeviceName': switch['hostname'],
+                               'connectedNetworkDeviceIpAddress': switch['managementIpAddress'],
+                               'connectedInterfaceName': 'GigabitEthernet1/0/%d' % (index % 48 + 1),
+                               'vlanId': str(100 + index % 10), 'hostType': 'wired'})
+
+        # PnP database: unclaimed APs
+        self.pnp_devices = []
+        for index in range(ap_count):
+            mac_address = '00:b0:26:%02x:%02x:%02x' % (index >> 16 & 255, index >> 8 & 255, index & 255)
+            self.pnp_devices.append({'id': uuid.uuid4().hex[:24],
+                                     'deviceInfo': {'serialNumber': 'FGL%08d' % index,
+                                                    'hostname': 'AP%04d' % index,
+                                                    'macAddress': mac_address,
+                                                    'state': 'Unclaimed', 'onbState': 'Initialized',
+                                                    'pid': 'AIR-AP3802I-B-K9',
+                                                    'httpHeaders': [{'key': 'clientAddress',
+                                                                     'value': '10.95.%d.%d' % (index // 250,
+                                                                                               index % 250 + 1)}]},
+                                     'claim_time': None})
+        self.tasks = {}
+        self.templates = {}
+        self.projects = {'Onboarding Configuration': str(uuid.uuid4())}
+        self.incidents = {}
+
+    def add_device(self, hostname, ip_address, family, wlc_ip=None, serial_number=None):
+        """
+        Add a network device to the inventory, and connect it to a switch access port, in the physical topology
+        :return: the network device
+        """
+        device = {'id': str(uuid.uuid4()), 'hostname': hostname, 'managementIpAddress': ip_address,
+                  'family': family, 'type': family, 'platformId': 'C9300-48U',
+                  'serialNumber': serial_number or 'FOC%08d' % len(self.devices),
+                  'softwareVersion': '16.12.4', 'reachabilityStatus': 'Reachable', 'role': 'ACCESS',
+                  'associatedWlcIp': wlc_ip or '', 'macAddress': '00:00:00:00:%02x:%02x' % divmod(len(self.devices),
+                                                                                                   256),
+                  'lastUpdateTime': int(time.time() * 1000), 'upTime': '1 days, 00:00:00.00'}
+        if self.switch_list:
+            switch = self.switch_list[len(self.devices) % len(self.switch_list)]
+            self.topology_links.append({'source': device['id'], 'target': switch['id'],
+                                        'startPortIpv4Address': ip_address, 'startPortName': 'GigabitEthernet0',
+                                        'endPortName': 'GigabitEthernet1/0/%d' % (len(self.devices) % 48 + 1)})
+        self.devices.append(device)
+        if family == 'Switches and Hubs':
+            self.switch_list.append(device)
+        return device
+
+    def add_task(self, progress='', is_error=False):
+        """
+        Add a completed task
+        :return: the task id
+        """
+        task_id = str(uuid.uuid4())
+        self.tasks[task_id] = {'id': task_id, 'isError': is_error, 'progress': progress,
+                               'startTime': int(time.time() * 1000), 'endTime': int(time.time() * 1000)}
+        return task_id
+
+    def update_pnp_states(self):
+        """
+        Move the claimed APs through the PnP states, Planned, Onboarding and Provisioned, and add the provisioned APs to
+        the inventory
+        """
+        now = time.time()
+        for pnp_device in self.pnp_devices:
+            if pnp_device['claim_time'] is None:
+                continue
+            device_info = pnp_device['deviceInfo']
+            elapsed_time = now - pnp_device['claim_time']
+            if elapsed_time < self.provision_time / 3:
+                device_info['state'], device_info['onbState'] = 'Planned', 'Planned'
+            elif elapsed_time < self.provision_time:
+                device_info['state'], device_info['onbState'] = 'Onboarding', 'Onboarding'
+            elif device_info['state'] != 'Provisioned':
+                device_info['state'], device_info['onbState'] = 'Provisioned', 'Provisioned'
+                device = self.add_device(device_info['hostname'], device_info['httpHeaders'][0]['value'],
+                                         'Unified AP', WLC_IP, device_info['serialNumber'])
+                device['platformId'] = device_info['pid']
+                self.configs[device['id']] = ''
+
+
+def build_config(device):
+    """
+    This function will build a running configuration for the network {device}
+    :param device: network device
+    :return: configuration text
+    """
+    config_lines = ['hostname ' + device['hostname'], '!']
+    config_lines += ['interface Loopback0', ' ip address ' + device['managementIpAddress'] + ' 255.255.255.255', '!']
+    for vlan in range(100, 104):
+        config_lines += ['interface Vlan' + str(vlan),
+                         ' ip address 10.%d.%d.1 255.255.255.0' % (vlan, len(device['hostname']) % 250), '!']
+    config_lines += ['end']
+    return '\n'.join(config_lines)
+
+
+def paginate(item_list, query, offset_base=0, default_limit=500):
+    """
+    This function will return one page of the {item_list}, using the offset and limit query parameters
+    """
+    offset = int(query.get('offset', [offset_base])[0]) - offset_base
+    limit = int(query.get('limit', [default_limit])[0])
+    return item_list[offset:offset + limit]
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """
+    The HTTP request handler, one handler method for each simulated API
+    """
+    protocol_version = 'HTTP/1.1'  # keep-alive, the HTTP sessions reuse the connections
+    disable_nagle_algorithm = True  # the headers and the body are separate writes, not delayed on the kept alive socket
+    server_version = 'DNACStub/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_api('GET')
+
+    def do_POST(self):
+        self.handle_api('POST')
+
+    def do_PUT(self):
+        self.handle_api('PUT')
+
+    def do_PATCH(self):
+        self.handle_api('PATCH')
+
+    def do_DELETE(self):
+        self.handle_api('DELETE')
+
+    def send_json(self, status, body, headers=None):
+        response_bytes = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response_bytes)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(response_bytes)
+
+    def send_json_etag(self, body):
+        """
+        Send the response with the ETag header, or 304 Not Modified if the request ETag is the same
+        """
+        etag = '"' + hashlib.md5(json.dumps(body).encode('utf-8')).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self.send_json(200, body, {'ETag': etag})
+
+    def handle_api(self, method):
+        server = self.server
+        content_length = int(self.headers.get('Content-Length') or 0)
+        request_body = self.rfile.read(content_length) if content_length else b''
+        with server.counter_lock:
+            server.request_count += 1
+
+        # simulated latency and error injection
+        if server.latency:
+            time.sleep(max(0.0, random.gauss(server.latency, server.latency / 4)))
+        if server.error_rate and random.random() < server.error_rate:
+            self.send_json(500, {'response': {'errorCode': 'Internal Server Error', 'message': 'injected error'}})
+            return
+
+        # recorded responses
+        fixture = server.state.fixtures.get(fixture_file_name(method, self.path))
+        if fixture is not None:
+            self.send_json(fixture['status'], fixture['body'])
+            return
+
+        url_info = urlsplit(self.path)
+        query = parse_qs(url_info.query)
+        try:
+            body = json.loads(request_body) if request_body else None
+        except ValueError:
+            body = None
+        for route_method, pattern, handler_name in ROUTES:
+            if route_method != method:
+                continue
+            match = re.match(pattern + '$', url_info.path)
+            if match:
+                try:
+                    with server.state.lock:
+                        status, response = getattr(self, handler_name)(query, body, *match.groups())
+                except Exception as error:
+                    status, response = 500, {'response': {'errorCode': 'Internal Server Error', 'message': str(error)}}
+                if method == 'GET' and status == 200 and server.etags:
+                    self.send_json_etag(response)
+                else:
+                    self.send_json(status, response)
+                return
+        self.send_json(404, {'response': {'errorCode': 'Not found', 'message': 'stub endpoint not found'}})
+
+    # DNA Center APIs
+
+    def auth_token(self, query, body):
+        return 200, {'Token': 'stub-token-' + uuid.uuid4().hex}
+
+    def network_device_list(self, query, body):
+        state = self.server.state
+        device_list = state.devices
+        for field in ['id', 'hostname', 'serialNumber', 'managementIpAddress']:
+            if field in query:
+                device_list = [device for device in device_list if device[field] in query[field]]
+        if 'sortBy' in query:
+            device_list = sorted(device_list, key=lambda device: device.get(query['sortBy'][0], 0),
+                                 reverse=query.get('sortOrder', ['asc'])[0] == 'desc')
+        return 200, {'response': paginate(device_list, query, offset_base=1), 'version': '1.0'}
+
+    def network_device_count(self, query, body):
+        return 200, {'response': len(self.server.state.devices), 'version': '1.0'}
+
+    def network_device_ip(self, query, body, ip_address):
+        for device in self.server.state.devices:
+            if device['managementIpAddress'] == ip_address:
+                return 200, {'response': device, 'version': '1.0'}
+        return 404, {'response': {'errorCode': 'Not found', 'message': 'device not found'}}
+
+    def network_device_serial(self, query, body, serial_number):
+        for device in self.server.state.devices:
+            if device['serialNumber'] == serial_number:
+                return 200, {'response': device, 'version': '1.0'}
+        return 404, {'response': {'errorCode': 'Not found', 'message': 'device not found'}}
+
+    def network_device_delete(self, query, body, device_id):
+        state = self.server.state
+        state.devices = [device for device in state.devices if device['id'] != device_id]
+        return 200, {'response': {'taskId': state.add_task(), 'url': '/api/v1/task'}}
+
+    def network_device_sync(self, query, body):
+        return 202, {'response': {'taskId': self.server.state.add_task(), 'url': '/api/v1/task'}}
+
+    def network_device_configs(self, query, body):
+        state = self.server.state
+        config_list = [{'id': device_id, 'runningConfig': config} for device_id, config in state.configs.items()]
+        return 200, {'response': config_list, 'version': '1.0'}
+
+    def network_device_config(self, query, body, device_id):
+        return 200, {'response': self.server.state.configs.get(device_id, ''), 'version': '1.0'}
+
+    def device_detail(self, query, body):
+        device_id = query.get('searchBy', [''])[0]
+        for device in self.server.state.devices:
+            if device['id'] == device_id:
+                return 200, {'response': {'nwDeviceName': device['hostname'], 'overallHealth': random.randint(7, 10),
+                                          'cpuScore': 10, 'memoryScore': 10, 'cpu': random.random() * 20,
+                                          'memory': 30 + random.random() * 20,
+                                          'managementIpAddr': device['managementIpAddress']}}
+        return 404, {'response': {'errorCode': 'Not found', 'message': 'device not found'}}
+
+    def group_list(self, query, body):
+        return 200, {'response': self.server.state.sites, 'version': '1.0'}
+
+    def group_create(self, query, body):
+        state = self.server.state
+        parent_hierarchy = 'Global'
+        for site in state.sites:
+            if site['id'] == body.get('parentId'):
+                parent_hierarchy = site['groupNameHierarchy']
+        state.sites.append({'id': str(uuid.uuid4()), 'name': body['name'],
+                            'groupNameHierarchy': parent_hierarchy + '/' + body['name']})
+        return 202, {'response': {'taskId': state.add_task(), 'url': '/api/v1/task'}}
+
+    def group_child(self, query, body, group_id):
+        state = self.server.state
+        child_list = []
+        for site in state.sites:
+            if site['id'] == group_id:
+                prefix = site['groupNameHierarchy'] + '/'
+                child_list = [child for child in state.sites if child['groupNameHierarchy'].startswith(prefix) and
+                              '/' not in child['groupNameHierarchy'][len(prefix):]]
+        return 200, {'response': child_list, 'version': '1.0'}
+
+    def group_member(self, query, body, device_id):
+        return 200, {'response': [self.server.state.sites[-1]], 'version': '1.0'}
+
+    def physical_topology(self, query, body):
+        state = self.server.state
+        node_list = [{'id': device['id'], 'label': device['hostname'], 'ip': device['managementIpAddress']}
+                     for device in state.devices]
+        return 200, {'response': {'nodes': node_list, 'links': state.topology_links}, 'version': '1.0'}
+
+    def host_list(self, query, body):
+        host_list = self.server.state.hosts
+        if 'hostIp' in query:
+            host_list = [host for host in host_list if host['hostIp'] in query['hostIp']]
+        if 'hostMac' in query:
+            host_list = [host for host in host_list if host['hostMac'] in query['hostMac']]
+        return 200, {'response': paginate(host_list, query, offset_base=1), 'version': '1.0'}
+
+    def host_count(self, query, body):
+        return 200, {'response': len(self.server.state.hosts), 'version': '1.0'}
+
+    def interface_ip(self, query, body, ip_address):
+        for device in self.server.state.devices:
+            if device['managementIpAddress'] == ip_address and device['family'] != 'Unified AP':
+                return 200, {'response': [{'portName': 'Loopback0', 'deviceId': device['id']}], 'version': '1.0'}
+        return 404, {'response': {'errorCode': 'Not found', 'message': 'interface not found'}}
+
+    def task_info(self, query, body, task_id):
+        task = self.server.state.tasks.get(task_id)
+        if task is None:
+            return 404, {'response': {'errorCode': 'Not found', 'message': 'task not found'}}
+        return 200, {'response': task, 'version': '1.0'}
+
+    def flow_analysis_create(self, query, body):
+        state = self.server.state
+        flow_id = str(uuid.uuid4())
+        state.tasks[flow_id] = {'request': {'id': flow_id, 'sourceIP': body['sourceIP'], 'destIP': body['destIP'],
+                                            'status': 'INPROGRESS'}, 'create_time': time.time()}
+        return 202, {'response': {'flowAnalysisId': flow_id, 'taskId': state.add_task()}}
+
+    def flow_analysis_info(self, query, body, flow_id):
+        flow_info = self.server.state.tasks.get(flow_id)
+        if flow_info is None:
+            return 404, {'response': {'errorCode': 'Not found', 'message': 'flow analysis not found'}}
+        if time.time() - flow_info['create_time'] > 1:
+            flow_info['request']['status'] = 'COMPLETED'
+            flow_info['networkElementsInfo'] = [{'name': WLC_NAME,
+                                                 'ingressInterface': {'physicalInterface': {'name': 'Gi1'}}}]
+        return 200, {'response': {key: value for key, value in flow_info.items() if key != 'create_time'}}
+
+    def legit_reads(self, query, body):
+        return 200, {'response': ['show', 'display', 'ping', 'traceroute'], 'version': '1.0'}
+
+    # PnP APIs
+
+    def pnp_device_list(self, query, body):
+        state = self.server.state
+        state.update_pnp_states()
+        pnp_list = state.pnp_devices
+        for param, field in [('state', 'state'), ('onbState', 'onbState'), ('serialNumber', 'serialNumber')]:
+            if param in query:
+                value_list = []
+                for value in query[param]:
+                    value_list += value.split(',')
+                pnp_list = [pnp_device for pnp_device in pnp_list if pnp_device['deviceInfo'][field] in value_list]
+        pnp_list = [{key: value for key, value in pnp_device.items() if key != 'claim_time'}
+                    for pnp_device in paginate(pnp_list, query, default_limit=len(pnp_list))]
+        return 200, pnp_list
+
+    def pnp_device_count(self, query, body):
+        state = self.server.state
+        state.update_pnp_states()
+        pnp_list = state.pnp_devices
+        if 'state' in query:
+            pnp_list = [pnp_device for pnp_device in pnp_list if pnp_device['deviceInfo']['state'] in query['state']]
+        return 200, {'response': len(pnp_list)}
+
+    def pnp_device_info(self, query, body, device_id):
+        state = self.server.state
+        state.update_pnp_states()
+        for pnp_device in state.pnp_devices:
+            if pnp_device['id'] == device_id:
+                return 200, {key: value for key, value in pnp_device.items() if key != 'claim_time'}
+        return 404, {'response': {'errorCode': 'Not found', 'message': 'PnP device not found'}}
+
+    def pnp_device_delete(self, query, body, device_id):
+        state = self.server.state
+        for pnp_device in state.pnp_devices:
+            if pnp_device['id'] == device_id:
+                state.pnp_devices.remove(pnp_device)
+                pnp_device['deviceInfo']['state'] = 'Deleted'
+                return 200, {key: value for key, value in pnp_device.items() if key != 'claim_time'}
+        return 404, {'response': {'errorCode': 'Not found', 'message': 'PnP device not found'}}
+
+    def pnp_site_claim(self, query, body):
+        for pnp_device in self.server.state.pnp_devices:
+            if pnp_device['id'] == body.get('deviceId'):
+                if pnp_device['claim_time'] is None:
+                    pnp_device['claim_time'] = time.time()
+                return 200, {'response': 'Device Claimed', 'version': '1.0'}
+        return 404, {'response': {'errorCode': 'Not found', 'message': 'PnP device not found'}}
+
+    # template programmer APIs
+
+    def project_info(self, query, body):
+        state = self.server.state
+        project_list = []
+        for project_name, project_id in state.projects.items():
+            if 'name' in query and project_name not in query['name']:
+                continue
+            template_list = [{'name': template['name'], 'id': template_id}
+                             for template_id, template in state.templates.items()
+                             if template['parentTemplateId'] == project_id]
+            project_list.append({'name': project_name, 'id': project_id, 'templates': template_list})
+        return 200, project_list
+
+    def template_create(self, query, body, project_id):
+        state = self.server.state
+        template_id = str(uuid.uuid4())
+        body['versionsInfo'] = []
+        state.templates[template_id] = body
+        return 202, {'response': {'taskId': state.add_task(template_id), 'url': '/api/v1/task'}}
+
+    def template_update(self, query, body):
+        state = self.server.state
+        if body.get('id') in state.templates:
+            state.templates[body['id']].update(body)
+        return 202, {'response': {'taskId': state.add_task(), 'url': '/api/v1/task'}}
+
+    def template_version(self, query, body):
+        state = self.server.state
+        template = state.templates.get(body.get('templateId'))
+        if template is not None:
+            version = len(template['versionsInfo']) + 1
+            template['versionsInfo'].append({'id': str(uuid.uuid4()), 'version': str(version)})
+        return 202, {'response': {'taskId': state.add_task(), 'url': '/api/v1/task'}}
+
+    def template_list(self, query, body):
+        state = self.server.state
+        return 200, [dict(template, id=template_id) for template_id, template in state.templates.items()]
+
+    def template_info(self, query, body, template_id):
+        template = self.server.state.templates.get(template_id)
+        if template is None:
+            return 404, {'response': {'errorCode': 'Not found', 'message': 'template not found'}}
+        return 200, dict(template, id=template_id)
+
+    # ServiceNow APIs
+
+    def snow_user(self, query, body):
+        return 200, {'result': [{'sys_id': 'stub-user-' + query.get('name', ['admin'])[0]}]}
+
+    def snow_incident_list(self, query, body):
+        incident_list = list(self.server.state.incidents.values())
+        if 'number' in query:
+            incident_list = [incident for incident in incident_list if incident['number'] in query['number']]
+        limit = int(query.get('sysparm_limit', [len(incident_list)])[0])
+        return 200, {'result': incident_list[:limit]}
+
+    def snow_incident_create(self, query, body):
+        state = self.server.state
+        number = 'INC%07d' % (len(state.incidents) + 10001)
+        incident = dict(body, number=number, sys_id=uuid.uuid4().hex, state='1')
+        state.incidents[incident['sys_id']] = incident
+        return 201, {'result': incident}
+
+    def snow_incident_update(self, query, body, sys_id):
+        incident = self.server.state.incidents.get(sys_id)
+        if incident is None:
+            return 404, {'error': {'message': 'No Record found'}}
+        incident.update(body)
+        return 200, {'result': incident}
+
+    def snow_incident_delete(self, query, body, sys_id):
+        self.server.state.incidents.pop(sys_id, None)
+        return 204, {}
+
+    def snow_journal(self, query, body):
+        return 200, {'result': []}
+
+
+ROUTES = [
+    ('POST', r'/dna/system/api/v1/auth/token', 'auth_token'),
+    ('GET', r'/(?:api/v1|dna/intent/api/v1)/network-device', 'network_device_list'),
+    ('GET', r'/(?:api/v1|dna/intent/api/v1)/network-device/count', 'network_device_count'),
+    ('GET', r'/api/v1/network-device/ip-address/([^/]+)', 'network_device_ip'),
+    ('GET', r'/api/v1/network-device/serial-number/([^/]+)', 'network_device_serial'),
+    ('DELETE', r'/dna/intent/api/v1/network-device/([^/]+)', 'network_device_delete'),
+    ('PUT', r'/api/v1/network-device/sync', 'network_device_sync'),
+    ('GET', r'/api/v1/network-device/config', 'network_device_configs'),
+    ('GET', r'/api/v1/network-device/([^/]+)/config', 'network_device_config'),
+    ('GET', r'/dna/intent/api/v1/device-detail', 'device_detail'),
+    ('GET', r'/api/v1/group', 'group_list'),
+    ('POST', r'/api/v1/group', 'group_create'),
+    ('GET', r'/api/v1/group/([^/]+)/child', 'group_child'),
+    ('GET', r'/api/v1/group/member/([^/]+)', 'group_member'),
+    ('GET', r'/api/v1/topology/physical-topology', 'physical_topology'),
+    ('GET', r'/api/v1/host', 'host_list'),
+    ('GET', r'/api/v1/host/count', 'host_count'),
+    ('GET', r'/api/v1/interface/ip-address/([^/]+)', 'interface_ip'),
+    ('GET', r'/api/v1/task/([^/]+)', 'task_info'),
+    ('POST', r'/api/v1/flow-analysis', 'flow_analysis_create'),
+    ('GET', r'/api/v1/flow-analysis/([^/]+)', 'flow_analysis_info'),
+    ('GET', r'/api/v1/network-device-poller/cli/legit-reads', 'legit_reads'),
+    ('GET', r'/dna/intent/api/v1/onboarding/pnp-device', 'pnp_device_list'),
+    ('GET', r'/dna/intent/api/v1/onboarding/pnp-device/count', 'pnp_device_count'),
+    ('POST', r'/dna/intent/api/v1/onboarding/pnp-device/site-claim', 'pnp_site_claim'),
+    ('GET', r'/(?:api/v1|dna/intent/api/v1)/onboarding/pnp-device/([^/]+)', 'pnp_device_info'),
+    ('DELETE', r'/dna/intent/api/v1/onboarding/pnp-device/([^/]+)', 'pnp_device_delete'),
+    ('GET', r'/api/v1/template-programmer/project', 'project_info'),
+    ('POST', r'/api/v1/template-programmer/project/([^/]+)/template', 'template_create'),
+    ('PUT', r'/api/v1/template-programmer/template', 'template_update'),
+    ('POST', r'/api/v1/template-programmer/template/version', 'template_version'),
+    ('GET', r'/api/v1/template-programmer/template', 'template_list'),
+    ('GET', r'/api/v1/template-programmer/template/([^/]+)', 'template_info'),
+    ('GET', r'/api/now/table/sys_user', 'snow_user'),
+    ('GET', r'/api/now/table/incident', 'snow_incident_list'),
+    ('POST', r'/api/now/table/incident', 'snow_incident_create'),
+    ('PATCH', r'/api/now/table/incident/([^/]+)', 'snow_incident_update'),
+    ('PUT', r'/api/now/table/incident/([^/]+)', 'snow_incident_update'),
+    ('DELETE', r'/api/now/table/incident/([^/]+)', 'snow_incident_delete'),
+    ('GET', r'/api/now/table/sys_journal_field', 'snow_journal'),
+]
+
+
+def start_stub_server(port=0, ap_count=1, inventory_size=10, latency=0.0, error_rate=0.0, provision_time=3.0,
+                      fixture_dir=None, etags=False):
+    """
+    This function will start the stub server, in a background thread
+    :param port: TCP port, 0 for any free port
+    :param ap_count: number of unclaimed APs in the PnP database
+    :param inventory_size: number of switches in the inventory
+    :param latency: average response latency, in seconds
+    :param error_rate: fraction of the requests answered with an injected HTTP 500 error
+    :param provision_time: time from the AP claim to the Provisioned state, in seconds
+    :param fixture_dir: directory with the recorded responses, optional
+    :param etags: send the ETag header with the GET responses, and answer the conditional requests
+    :return: the server, and the base URL, example 'http://127.0.0.1:8080'
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubRequestHandler)
+    server.daemon_threads = True
+    server.state = StubState(ap_count, inventory_size, provision_time, fixture_dir)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.etags = etags
+    server.request_count = 0
+    server.counter_lock = threading.Lock()
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    return server, 'http://127.0.0.1:' + str(server.server_address[1])
+
+
+def main():
+    """
+    Run the stub server, until interrupted
+    """
+    parser = argparse.ArgumentParser(description='Cisco DNA Center and ServiceNow stub server')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--aps', type=int, default=1, help='number of unclaimed APs')
+    parser.add_argument('--inventory-size', type=int, default=10, help='number of switches in the inventory')
+    parser.add_argument('--latency', type=float, default=0.0, help='average response latency, seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of the requests failed')
+    parser.add_argument('--provision-time', type=float, default=3.0, help='AP claim to Provisioned time, seconds')
+    parser.add_argument('--fixtures', default=None, help='directory with the recorded responses')
+    parser.add_argument('--etags', action='store_true', help='send ETag headers, answer the conditional requests')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.aps, args.inventory_size, args.latency, args.error_rate,
+                                         args.provision_time, args.fixtures, args.etags)
+    print('Stub server started: ', base_url)
+    print('Set DNAC_URL = \'' + base_url + '\' and SNOW_URL = \'' + base_url + '/api/now\' in config.py')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the persistent geolocation cache for the building addresses, {normalized address: lat/lng}.
+# The Google Geocoding API is called only for the addresses not found in the cache, or expired.
+
+import re
+import json
+import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from config import GOOGLE_API_KEY
+from config import GEO_CACHE_FILE, GEO_CACHE_TTL, GEO_OFFLINE
+
+
+GEO_CACHE = None  # in memory copy of the cache file, loaded on first use
+GEO_CACHE_LOCK = threading.Lock()
+
+
+def normalize_address(address):
+    """
+    This function will normalize the {address}: lower case, single spaces, and one space after each comma
+    :param address: address string
+    :return: normalized address
+    """
+    address = re.sub(r'\s*,\s*', ', ', address.strip().lower())
+    return ' '.join(address.split())
+
+
+def load_geo_cache():
+    """
+    This function will load the geolocation cache from the file {GEO_CACHE_FILE}, only once
+    :return: geolocation cache - dict {normalized address: {'lat', 'lng', 'timestamp'}}
+    """
+    global GEO_CACHE
+    if GEO_CACHE is None:
+        try:
+            with open(GEO_CACHE_FILE, 'r') as cache_file:
+                GEO_CACHE = json.load(cache_file)
+        except (IOError, ValueError):
+            GEO_CACHE = {}
+    return GEO_CACHE
+
+
+def save_geo_cache():
+    """
+    This function will save the geolocation cache to the file {GEO_CACHE_FILE}
+    :return:
+    """
+    with GEO_CACHE_LOCK:
+        with open(GEO_CACHE_FILE, 'w') as cache_file:
+            json.dump(load_geo_cache(), cache_file, indent=4, sort_keys=True)
+
+
+def get_cached_geo_info(address, ttl=GEO_CACHE_TTL):
+    """
+    This function will return the cached geolocation info for the {address}
+    :param address: address, including ZIP and Country
+    :param ttl: cache entries time to live, in seconds, {None} if entries never expire
+    :return: longitude/latitude, or {None} if not cached or expired
+    """
+    cache_entry = load_geo_cache().get(normalize_address(address))
+    if cache_entry is None:
+        return None
+    if ttl is not None and time.time() - cache_entry['timestamp'] > ttl:
+        return None
+    return {'lat': cache_entry['lat'], 'lng': cache_entry['lng']}
+
+
+def cache_geo_info(address, geo_info):
+    """
+    This function will add the geolocation info for the {address} to the cache
+    :param address: address, including ZIP and Country
+    :param geo_info: longitude/latitude
+    :return:
+    """
+    with GEO_CACHE_LOCK:
+        load_geo_cache()[normalize_address(address)] = {'lat': geo_info['lat'], 'lng': geo_info['lng'],
+                                                        'timestamp': int(time.time())}
+
+
+def get_geo_info_cached(address, google_key=GOOGLE_API_KEY, ttl=GEO_CACHE_TTL, offline=GEO_OFFLINE):
+    """
+    The function will return the longitude/latitude for the {address}, from the cache if available, otherwise from the
+    Google Geolocation API. New results are saved to the cache file.
+    :param address: address, including ZIP and Country
+    :param google_key: Google API Key
+    :param ttl: cache entries time to live, in seconds, {None} if entries never expire
+    :param offline: if {True} the Google Geolocation API is not called
+    :return: longitude/latitude, or {None} if not cached and offline
+    """
+    geo_info = get_cached_geo_info(address, ttl)
+    if geo_info is None and not offline:
+        import dnac_apis  # imported when needed, dnac_apis uses this module
+        geo_info = dnac_apis.get_geo_info(address, google_key)
+        cache_geo_info(address, geo_info)
+        save_geo_cache()
+    return geo_info
+
+
+def get_geo_info_bulk(address_list, google_key=GOOGLE_API_KEY, ttl=GEO_CACHE_TTL, offline=GEO_OFFLINE,
+                      max_workers=5):
+    """
+    The function will return the longitude/latitude for all the addresses in the {address_list}. Each unique address is
+    looked up once, the addresses not cached are resolved in parallel and the cache file is saved once.
+    :param address_list: list of addresses
+    :param google_key: Google API Key
+    :param ttl: cache entries time to live, in seconds, {None} if entries never expire
+    :param offline: if {True} the Google Geolocation API is not called
+    :param max_workers: maximum number of parallel Google Geolocation API calls
+    :return: dict {address: longitude/latitude}, {None} for the addresses not cached, if offline, or not found
+    """
+    geo_info_dict = {}
+    missing_address_list = []
+    for address in set(address_list):
+        geo_info_dict[address] = get_cached_geo_info(address, ttl)
+        if geo_info_dict[address] is None:
+            missing_address_list.append(address)
+
+    if missing_address_list and not offline:
+        import dnac_apis  # imported when needed, dnac_apis uses this module
+
+        def geocode_address(address):
+            try:
+                return dnac_apis.get_geo_info(address, google_key)
+            except:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            geo_info_list = list(executor.map(geocode_address, missing_address_list))
+        for address, geo_info in zip(missing_address_list, geo_info_list):
+            if geo_info is not None:
+                cache_geo_info(address, geo_info)
+            geo_info_dict[address] = geo_info
+        save_geo_cache()
+    return geo_info_dict
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the device health collector for the onboarded APs and their uplink switches. The device health
+# is retrieved periodically, using the cached DNA Center device ids, with up to HEALTH_WORKERS requests in progress.
+# The samples are saved to a local columnar time series store: for each device, one array for the timestamps and
+# one array for each health metric.
+
+import os
+import sys
+import json
+import math
+import time
+import array
+import bisect
+import logging
+import argparse
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import dnac_apis
+import ap_verify
+import inventory_sync
+import log_config
+
+from config import HEALTH_INTERVAL, HEALTH_WORKERS, HEALTH_STORE_FILE, HEALTH_MAX_SAMPLES
+
+LOGGER = logging.getLogger(__name__)
+
+HEALTH_FIELDS = ('overallHealth', 'cpu', 'memory', 'cpuScore', 'memoryScore')  # device detail health metrics
+AP_FAMILY = 'Unified AP'
+
+
+class HealthStore:
+    """
+    Columnar time series store: for each device, the timestamps array ('d', epoch seconds) and one array ('f') for
+    each health metric. The missing values are saved as NaN
+    """
+
+    def __init__(self, fields=HEALTH_FIELDS, max_samples=HEALTH_MAX_SAMPLES):
+        """
+        :param fields: health metrics names
+        :param max_samples: number of samples kept for each device, the oldest samples are deleted
+        """
+        self.fields = fields
+        self.max_samples = max_samples
+        self.series = {}  # device id: dict with the {timestamp} array and one array for each field
+        self.device_names = {}  # device id: device hostname
+        self.lock = threading.Lock()
+
+    def add_sample(self, device_id, device_name, timestamp, device_detail):
+        """
+        Save the health sample for the device, the samples are expected in timestamp order
+        :param device_id: DNA C device id
+        :param device_name: device hostname
+        :param timestamp: sample epoch time, seconds
+        :param device_detail: device detail, from the device health API
+        """
+        with self.lock:
+            columns = self.series.get(device_id)
+            if columns is None:
+                columns = {'timestamp': array.array('d')}
+                for field in self.fields:
+                    columns[field] = array.array('f')
+                self.series[device_id] = columns
+            self.device_names[device_id] = device_name
+            columns['timestamp'].append(timestamp)
+            for field in self.fields:
+                columns[field].append(to_float(device_detail.get(field)))
+            if len(columns['timestamp']) > self.max_samples:
+                for column in columns.values():
+                    del column[:len(column) - self.max_samples]
+
+    def get_device_id(self, device_name):
+        """
+        :return: the device id for the device with the hostname {device_name}, or {None}
+        """
+        for device_id, name in self.device_names.items():
+            if name == device_name:
+                return device_id
+        return None
+
+    def query(self, device_id, field, start_time=None, end_time=None):
+        """
+        Return the samples of the health metric {field} for the device, between {start_time} and {end_time}
+        :param device_id: DNA C device id
+        :param field: health metric name
+        :param start_time: start epoch time, optional
+        :param end_time: end epoch time, optional
+        :return: list of (timestamp, value), the missing values are skipped
+        """
+        with self.lock:
+            columns = self.series.get(device_id)
+            if columns is None:
+                return []
+            timestamps = columns['timestamp']
+            start_index = 0 if start_time is None else bisect.bisect_left(timestamps, start_time)
+            end_index = len(timestamps) if end_time is None else bisect.bisect_right(timestamps, end_time)
+            values = columns[field][start_index:end_index]
+            timestamps = timestamps[start_index:end_index]
+        return [(timestamp, value) for timestamp, value in zip(timestamps, values) if not math.isnan(value)]
+
+    def trend(self, device_id, field, start_time=None, end_time=None):
+        """
+        Return the trend of the health metric {field} for the device, between {start_time} and {end_time}
+        :return: dict with the sample {count}, {min}, {max}, {avg}, {last} and the {slope}, change for each hour using
+        the least squares fit, or {None} if no samples
+        """
+        sample_list = self.query(device_id, field, start_time, end_time)
+        if not sample_list:
+            return None
+        count = len(sample_list)
+        value_list = [value for timestamp, value in sample_list]
+        mean_time = sum(timestamp for timestamp, value in sample_list) / count
+        mean_value = sum(value_list) / count
+        variance = sum((timestamp - mean_time) ** 2 for timestamp, value in sample_list)
+        slope = 0.0
+        if variance:
+            slope = sum((timestamp - mean_time) * (value - mean_value) for timestamp, value in sample_list) / variance
+        return {'count': count, 'min': min(value_list), 'max': max(value_list), 'avg': mean_value,
+                'last': value_list[-1], 'slope': slope * 3600}
+
+    def save(self, file_name):
+        """
+        Save the store to the file {file_name}: one JSON header line with the devices and the samples counts, followed
+        by the arrays content
+        :param file_name: file name
+        """
+        with self.lock:
+            header = {'fields': list(self.fields), 'devices': []}
+            for device_id, columns in self.series.items():
+                header['devices'].append({'id': device_id, 'name': self.device_names[device_id],
+                                          'count': len(columns['timestamp'])})
+            with open(file_name + '.tmp', 'wb') as store_file:
+                store_file.write(json.dumps(header).encode('utf-8') + b'\n')
+                for device_id, columns in self.series.items():
+                    columns['timestamp'].tofile(store_file)
+                    for field in self.fields:
+                        columns[field].tofile(store_file)
+        os.replace(file_name + '.tmp', file_name)
+
+    def load(self, file_name):
+        """
+        Load the store from the file {file_name}, saved by {save}
+        :param file_name: file name
+        """
+        with open(file_name, 'rb') as store_file:
+            header = json.loads(store_file.readline().decode('utf-8'))
+            with self.lock:
+                self.fields = tuple(header['fields'])
+                self.series = {}
+                self.device_names = {}
+                for device in header['devices']:
+                    columns = {'timestamp': array.array('d')}
+                    columns['timestamp'].fromfile(store_file, device['count'])
+                    for field in self.fields:
+                        columns[field] = array.array('f')
+                        columns[field].fromfile(store_file, device['count'])
+                    self.series[device['id']] = columns
+                    self.device_names[device['id']] = device['name']
+
+
+def to_float(value):
+    """
+    :return: the {value} as float, NaN if missing or not a number
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class HealthCollector:
+    """
+    Collect the health of the onboarded APs and their uplink switches, and save the samples to the health store
+    """
+
+    def __init__(self, health_store, max_workers=HEALTH_WORKERS):
+        """
+        :param health_store: the health store
+        :param max_workers: maximum number of health requests in progress at one time
+        """
+        self.health_store = health_store
+        self.max_workers = max_workers
+        self.devices = {}  # device id: device hostname, the devices collected
+        self.inventory = inventory_sync.InventorySync()
+        self.collect_count = 0
+        self.error_count = 0
+
+    def add_device(self, device_id, device_name):
+        """
+        Add the device to the collected devices
+        """
+        self.devices[device_id] = device_name
+
+    def add_ap(self, ap_device_info, topology_info):
+        """
+        Add the AP and its uplink switch, from the physical topology, to the collected devices
+        :param ap_device_info: AP inventory info, dnac_models.NetworkDevice
+        :param topology_info: physical topology, dnac_models.Topology
+        """
+        self.add_device(ap_device_info.device_id, ap_device_info.hostname)
+        link = topology_info.start_port_links.get(ap_device_info.ip_address)
+        if link is not None:
+            self.add_device(link.target, topology_info.node_labels.get(link.target, link.target))
+
+    def discover_devices(self, dnac_jwt_token, page_size=500):
+        """
+        Add all the APs in the inventory, and their uplink switches. The new APs are found using the inventory change
+        feed, started before the inventory is read
+        :param dnac_jwt_token: DNA C token
+        :return: number of APs found
+        """
+        self.inventory.start(dnac_jwt_token)
+        ap_list = [device for device in dnac_apis.get_all_device_records(dnac_jwt_token, page_size)
+                   if device.family == AP_FAMILY]
+        topology_info = ap_verify.get_topology_info(dnac_jwt_token)
+        for ap_device_info in ap_list:
+            self.add_ap(ap_device_info, topology_info)
+        return len(ap_list)
+
+    def update_devices(self, dnac_jwt_token):
+        """
+        Add the new APs found by the inventory change feed, and their uplink switches
+        :param dnac_jwt_token: DNA C token
+        :return: number of new APs
+        """
+        self.inventory.sync(dnac_jwt_token)
+        new_ap_list = [device for device in self.inventory.devices.values()
+                       if device.family == AP_FAMILY and device.device_id not in self.devices]
+        if new_ap_list:
+            ap_verify.TOPOLOGY_CACHE.invalidate()
+            topology_info = ap_verify.get_topology_info(dnac_jwt_token)
+            for ap_device_info in new_ap_list:
+                self.add_ap(ap_device_info, topology_info)
+        return len(new_ap_list)
+
+    def collect(self, dnac_jwt_token):
+        """
+        Retrieve the health of all the collected devices, concurrently, and save the samples to the health store
+        :param dnac_jwt_token: DNA C token
+        :return: number of devices collected
+        """
+        epoch_time = int(time.time() * 1000)
+
+        def collect_device(device_id):
+            device_detail = dnac_apis.get_device_health_id(device_id, epoch_time, dnac_jwt_token)
+            self.health_store.add_sample(device_id, self.devices[device_id], epoch_time / 1000.0, device_detail)
+
+        collected_count = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            collect_function = dnac_apis.with_cluster(collect_device)
+            future_list = [(device_id, executor.submit(collect_function, device_id)) for device_id in self.devices]
+            for device_id, future in future_list:
+                try:
+                    future.result()
+                    collected_count += 1
+                except Exception as collect_error:
+                    self.error_count += 1
+                    LOGGER.warning('Health collection failed for the device %s: %r', self.devices[device_id],
+                                   collect_error)
+        self.collect_count += 1
+        return collected_count
+
+    def run(self, interval=HEALTH_INTERVAL, iterations=None, store_file=HEALTH_STORE_FILE):
+        """
+        Collect the health every {interval} seconds, save the health store to the {store_file} after each collection
+        :param interval: time between the collections, in seconds
+        :param iterations: number of collections, {None} to run until interrupted
+        :param store_file: health store file name
+        """
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            start_time = time.time()
+            dnac_token = dnac_apis.get_dnac_token()
+            new_ap_count = self.update_devices(dnac_token)
+            collected_count = self.collect(dnac_token)
+            self.health_store.save(store_file)
+            print('Health collected, devices: ', collected_count, ' , new APs: ', new_ap_count,
+                  ' , time: %.2f seconds' % (time.time() - start_time))
+            iteration += 1
+            if iterations is None or iteration < iterations:
+                time.sleep(max(0.0, interval - (time.time() - start_time)))
+
+
+def print_trends(health_store, device_name, hours=24):
+    """
+    This function will print the health trends for the device with the hostname {device_name}, for the last {hours}
+    :param health_store: the health store
+    :param device_name: device hostname
+    :param hours: trend period, in hours
+    """
+    device_id = health_store.get_device_id(device_name)
+    if device_id is None:
+        print('Device not found in the health store: ', device_name)
+        return
+    print('\nHealth trends for the device: ', device_name, ' , last ', hours, ' hours')
+    print('%-16s %8s %8s %8s %8s %8s %10s' % ('metric', 'samples', 'min', 'max', 'avg', 'last', 'slope/h'))
+    for field in health_store.fields:
+        trend = health_store.trend(device_id, field, start_time=time.time() - hours * 3600)
+        if trend:
+            print('%-16s %8d %8.1f %8.1f %8.1f %8.1f %10.2f' % (field, trend['count'], trend['min'], trend['max'],
+                                                                 trend['avg'], trend['last'], trend['slope']))
+
+
+def main():
+    """
+    Collect the health of the APs and uplink switches periodically, or print the trends for one device
+    """
+    parser = argparse.ArgumentParser(description='Device health collector for the APs and their uplink switches')
+    parser.add_argument('--interval', type=float, default=HEALTH_INTERVAL, help='collection interval, seconds')
+    parser.add_argument('--iterations', type=int, default=None, help='number of collections, default until stopped')
+    parser.add_argument('--store', default=HEALTH_STORE_FILE, help='health store file name')
+    parser.add_argument('--trend', default=None, help='print the health trends for the device hostname, and exit')
+    parser.add_argument('--hours', type=float, default=24, help='trend period, hours')
+    args = parser.parse_args()
+
+    health_store = HealthStore()
+    try:
+        health_store.load(args.store)
+    except (IOError, OSError, ValueError):
+        pass
+
+    if args.trend:
+        print_trends(health_store, args.trend, args.hours)
+        return
+
+    # logging, JSON records, to the rotating log file {LOG_FILE}
+    log_config.setup_logging()
+
+    health_collector = HealthCollector(health_store)
+    ap_count = health_collector.discover_devices(dnac_apis.get_dnac_token())
+    print('\nAPs found: ', ap_count, ' , devices collected: ', len(health_collector.devices))
+    try:
+        health_collector.run(args.interval, args.iterations, args.store)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
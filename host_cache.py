@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the host (client) table snapshot cache. The DNA Center host table is retrieved one page at a
+# time, with up to HOST_LOAD_WORKERS pages retrieved at one time, and indexed by the host IP and MAC addresses.
+# The snapshot is reused for HOST_CACHE_TTL seconds, many clients are located with one snapshot load, without one
+# API call for each client.
+
+import sys
+import time
+import argparse
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import dnac_apis
+import ap_assignment
+
+from config import HOST_CACHE_TTL, HOST_PAGE_SIZE, HOST_LOAD_WORKERS
+
+
+class HostTable:
+    """
+    Snapshot of the DNA Center host table, indexed by IP and MAC address
+    """
+
+    def __init__(self, ttl=HOST_CACHE_TTL, page_size=HOST_PAGE_SIZE, max_workers=HOST_LOAD_WORKERS):
+        """
+        :param ttl: snapshot time to live, in seconds
+        :param page_size: number of hosts retrieved with each API call
+        :param max_workers: maximum number of pages retrieved at one time
+        """
+        self.ttl = ttl
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.ip_index = {}  # host IP address: host info
+        self.mac_index = {}  # normalized host MAC address: host info
+        self.loaded = None  # snapshot load epoch time
+        self.load_count = 0
+        self.lock = threading.Lock()
+
+    def load(self, dnac_jwt_token):
+        """
+        Load a new snapshot of the host table. The host count is retrieved first, and the pages are retrieved
+        concurrently
+        :param dnac_jwt_token: DNA C token
+        :return: number of hosts
+        """
+        host_count = dnac_apis.get_host_count(dnac_jwt_token)
+        offset_list = list(range(1, host_count + 1, self.page_size)) or [1]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            page_list = list(executor.map(dnac_apis.with_cluster(
+                lambda offset: dnac_apis.get_host_page(dnac_jwt_token, offset, self.page_size)), offset_list))
+
+        # the hosts added after the count was retrieved are in the extra pages
+        offset = offset_list[-1]
+        while len(page_list[-1]) == self.page_size:
+            offset += self.page_size
+            page_list.append(dnac_apis.get_host_page(dnac_jwt_token, offset, self.page_size))
+
+        ip_index = {}
+        mac_index = {}
+        for page in page_list:
+            for host in page:
+                if host.get('hostIp'):
+                    ip_index[host['hostIp']] = host
+                mac_address = ap_assignment.normalize_mac(host.get('hostMac'))
+                if mac_address:
+                    mac_index[mac_address] = host
+        with self.lock:
+            self.ip_index = ip_index
+            self.mac_index = mac_index
+            self.loaded = time.time()
+            self.load_count += 1
+        return len(ip_index)
+
+    def refresh(self, dnac_jwt_token):
+        """
+        Load a new snapshot if the snapshot is older than the time to live
+        :param dnac_jwt_token: DNA C token
+        """
+        if self.loaded is None or time.time() - self.loaded > self.ttl:
+            self.load(dnac_jwt_token)
+
+    def get_host_ip(self, client_ip):
+        """
+        :return: the host info for the client with the IP address {client_ip}, or {None}
+        """
+        with self.lock:
+            return self.ip_index.get(client_ip)
+
+    def get_host_mac(self, client_mac):
+        """
+        :return: the host info for the client with the MAC address {client_mac}, any format, or {None}
+        """
+        with self.lock:
+            return self.mac_index.get(ap_assignment.normalize_mac(client_mac))
+
+    def locate_clients(self, client_ip_list, dnac_jwt_token):
+        """
+        Locate the clients in the infrastructure by using the client IP addresses, see {dnac_apis.locate_client_ip}
+        :param client_ip_list: list of client IP addresses
+        :param dnac_jwt_token: DNA C token
+        :return: dict with the client IP: (hostname, interface_name, vlan_id), or {None} if the client does not exist
+        """
+        self.refresh(dnac_jwt_token)
+        client_locations = {}
+        for client_ip in client_ip_list:
+            client_info = self.get_host_ip(client_ip)
+            if client_info is not None:
+                client_locations[client_ip] = (client_info['connectedNetworkDeviceName'],
+                                               client_info['connectedInterfaceName'], client_info['vlanId'])
+            else:
+                client_locations[client_ip] = None
+        return client_locations
+
+
+def main():
+    """
+    Locate the clients, and print the switch, interface and VLAN for each client
+    """
+    parser = argparse.ArgumentParser(description='Locate many clients using one host table snapshot')
+    parser.add_argument('client_ips', nargs='*', help='client IP addresses')
+    parser.add_argument('--file', default=None, help='file with one client IP address on each line')
+    args = parser.parse_args()
+
+    client_ip_list = list(args.client_ips)
+    if args.file:
+        with open(args.file) as ip_file:
+            client_ip_list += [line.strip() for line in ip_file if line.strip()]
+
+    start_time = time.time()
+    host_table = HostTable()
+    client_locations = host_table.locate_clients(client_ip_list, dnac_apis.get_dnac_token())
+    for client_ip in client_ip_list:
+        client_location = client_locations[client_ip]
+        if client_location is None:
+            print('%-16s not found' % client_ip)
+        else:
+            print('%-16s %s , %s , VLAN %s' % ((client_ip,) + tuple(client_location)))
+    print('\nClients located: ', len(client_ip_list), ' , hosts in the snapshot: ', len(host_table.ip_index),
+          ' , time: %.2f seconds' % (time.time() - start_time))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
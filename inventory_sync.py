@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the DNA Center inventory change feed. Only the devices changed since the last sync are
+# retrieved: the inventory is read sorted by the last update time, newest first, until the last update time of the
+# previous sync (the watermark) is reached. The sync is skipped when the inventory device count is unchanged.
+# The changed devices are saved to the local store, and the threads waiting for a hostname or serial number are
+# notified when the device is found. When the device count drops, devices were deleted: all the inventory is read,
+# and the local store is replaced. The inventory is read again the same way if the server does not return the devices
+# sorted by the last update time, the sort parameters are not supported by all the DNA Center releases.
+
+import time
+import logging
+import threading
+
+import dnac_apis
+
+from config import INVENTORY_SYNC_PAGE_SIZE, INVENTORY_SYNC_FORCE_INTERVAL, INVENTORY_POLL_INTERVAL
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class InventorySync:
+    """
+    Local store of the inventory devices changed since the change feed started, updated using delta syncs
+    """
+
+    def __init__(self, page_size=INVENTORY_SYNC_PAGE_SIZE, force_interval=INVENTORY_SYNC_FORCE_INTERVAL):
+        """
+        :param page_size: number of devices retrieved with each API call
+        :param force_interval: time after which the changed devices are retrieved, even if the device count is
+        unchanged, in seconds
+        """
+        self.page_size = page_size
+        self.force_interval = force_interval
+        self.devices = {}  # device id: dnac_models.NetworkDevice
+        self.hostname_index = {}  # hostname: device id
+        self.serial_index = {}  # serial number: device id
+        self.device_count = None
+        self.watermark = None  # last update time of the newest device retrieved, epoch milliseconds
+        self.last_fetch = 0
+        self.sync_count = 0
+        self.skip_count = 0
+        self.page_count = 0
+        self.resync_count = 0
+        self.sync_lock = threading.Lock()
+        self.condition = threading.Condition()
+
+    def start(self, dnac_jwt_token):
+        """
+        Start the change feed: save the device count and the newest device last update time. The devices updated
+        before the start are not retrieved. The change feed is started only once
+        :param dnac_jwt_token: DNA C token
+        """
+        with self.sync_lock:
+            if self.watermark is not None:
+                return
+            self.device_count = dnac_apis.get_device_count(dnac_jwt_token)
+            newest_device_list = dnac_apis.get_device_record_page(dnac_jwt_token, offset=1, limit=1)
+            self.page_count += 1
+            self.watermark = newest_device_list[0].last_update_time if newest_device_list else 0
+            self.last_fetch = time.time()
+
+    def sync(self, dnac_jwt_token, blocking=True):
+        """
+        Retrieve the devices changed since the last sync, and save them to the local store
+        :param dnac_jwt_token: DNA C token
+        :param blocking: wait for the sync in progress by other thread, if {False} return {None}
+        :return: number of changed devices, {None} if not synced
+        """
+        if self.watermark is None:
+            self.start(dnac_jwt_token)
+        if not self.sync_lock.acquire(blocking):
+            return None
+        try:
+            self.sync_count += 1
+            device_count = dnac_apis.get_device_count(dnac_jwt_token)
+            if device_count == self.device_count and time.time() - self.last_fetch < self.force_interval:
+                self.skip_count += 1
+                return 0
+            if device_count < self.device_count:
+                return self.resync(dnac_jwt_token, device_count)
+
+            # the devices with the same last update time as the watermark are retrieved again, they may have been
+            # updated after the previous sync
+            changed_list = []
+            watermark = self.watermark
+            previous_time = None
+            offset = 1
+            while True:
+                device_list = dnac_apis.get_device_record_page(dnac_jwt_token, offset=offset, limit=self.page_size)
+                self.page_count += 1
+                watermark_reached = False
+                for device in device_list:
+                    # the sort order was not applied, the watermark can't be used to find the changed devices
+                    if previous_time is not None and device.last_update_time > previous_time:
+                        LOGGER.warning('Inventory not sorted by the last update time, reading all the devices')
+                        return self.resync(dnac_jwt_token, device_count)
+                    previous_time = device.last_update_time
+                    if device.last_update_time < self.watermark:
+                        watermark_reached = True
+                        break
+                    changed_list.append(device)
+                    watermark = max(watermark, device.last_update_time)
+                if watermark_reached or len(device_list) < self.page_size:
+                    break
+                offset += self.page_size
+
+            self.device_count = device_count
+            self.watermark = watermark
+            self.last_fetch = time.time()
+            self.apply_changes(changed_list)
+            return len(changed_list)
+        finally:
+            self.sync_lock.release()
+
+    def resync(self, dnac_jwt_token, device_count):
+        """
+        Retrieve all the inventory devices, and replace the local store, the deleted devices are removed. Called by
+        {sync}, with the sync lock acquired
+        :param dnac_jwt_token: DNA C token
+        :param device_count: inventory device count
+        :return: number of devices retrieved
+        """
+        self.resync_count += 1
+        device_list = []
+        offset = 1
+        while True:
+            page_list = dnac_apis.get_device_record_page(dnac_jwt_token, offset=offset, limit=self.page_size)
+            self.page_count += 1
+            device_list.extend(page_list)
+            if len(page_list) < self.page_size:
+                break
+            offset += self.page_size
+
+        self.device_count = device_count
+        self.watermark = max([self.watermark] + [device.last_update_time for device in device_list])
+        self.last_fetch = time.time()
+        with self.condition:
+            self.devices = {}
+            self.hostname_index = {}
+            self.serial_index = {}
+            self.apply_changes(device_list)
+        return len(device_list)
+
+    def apply_changes(self, device_list):
+        """
+        Save the changed devices to the local store, and notify the waiting threads. The index entries of the
+        previous hostname and serial number of a changed device are removed
+        :param device_list: list of dnac_models.NetworkDevice for the changed devices
+        """
+        with self.condition:
+            for device in device_list:
+                previous_device = self.devices.get(device.device_id)
+                if previous_device is not None:
+                    if self.hostname_index.get(previous_device.hostname) == device.device_id:
+                        del self.hostname_index[previous_device.hostname]
+                    if self.serial_index.get(previous_device.serial_number) == device.device_id:
+                        del self.serial_index[previous_device.serial_number]
+                self.devices[device.device_id] = device
+                if device.hostname:
+                    self.hostname_index[device.hostname] = device.device_id
+                if device.serial_number:
+                    self.serial_index[device.serial_number] = device.device_id
+            self.condition.notify_all()
+
+    def find_device(self, hostname=None, serial_number=None):
+        """
+        Find the device with the {hostname} or the {serial_number} in the local store
+        :return: dnac_models.NetworkDevice, or {None} if not found
+        """
+        with self.condition:
+            device_id = self.hostname_index.get(hostname) or self.serial_index.get(serial_number)
+            return self.devices.get(device_id)
+
+    def wait_for_devices(self, dnac_jwt_token, hostname_list, timeout, poll_interval=INVENTORY_POLL_INTERVAL):
+        """
+        Wait for the devices with the hostnames in the {hostname_list} to be added to the inventory. One thread syncs
+        the inventory every {poll_interval} seconds, the other threads waiting are notified of the changes
+        :param dnac_jwt_token: DNA C token
+        :param hostname_list: list of device hostnames
+        :param timeout: maximum time to wait, in seconds. The inventory is synced at least once, the sync errors are
+        logged, and the devices are waited for until the timeout
+        :param poll_interval: time between the inventory syncs, in seconds
+        :return: dict with the hostname: dnac_models.NetworkDevice, {None} for the devices not found
+        """
+        end_time = time.time() + timeout
+        while True:
+            try:
+                self.sync(dnac_jwt_token, blocking=False)
+            except Exception:
+                LOGGER.exception('Inventory sync failed, waiting for the devices: %s', ', '.join(hostname_list))
+            device_dict = dict((hostname, self.find_device(hostname=hostname)) for hostname in hostname_list)
+            remaining_time = end_time - time.time()
+            if None not in device_dict.values() or remaining_time <= 0:
+                return device_dict
+            with self.condition:
+                self.condition.wait(min(poll_interval, remaining_time))
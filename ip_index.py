@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the IPv4 address index, used to check an IP address plan against all the known addresses in one
+# bulk operation. The interface and host addresses, and the subnets, from the DNA Center inventory, the host table
+# and the devices configurations, are saved as 32 bit integers, in sorted arrays. The membership tests, the duplicate
+# and overlapping subnets detection, and the nearest free address search, are vectorized with NumPy if installed,
+# or use the array module and binary search.
+
+import sys
+import time
+import array
+import bisect
+import socket
+import struct
+import argparse
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import dnac_apis
+import host_cache
+import config_analytics
+
+from config import CONFIG_ARCHIVE_DIR
+
+
+def ip_to_int(ip_address):
+    """
+    :param ip_address: IPv4 address, example '10.93.130.1'
+    :return: the 32 bit integer value, or {None} if not a valid IPv4 address
+    """
+    try:
+        return struct.unpack('!I', socket.inet_pton(socket.AF_INET, ip_address.strip()))[0]
+    except (OSError, AttributeError):
+        return None
+
+
+def int_to_ip(value):
+    """
+    :return: the IPv4 address for the 32 bit integer {value}
+    """
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+def ips_to_ints(ip_list):
+    """
+    This function will convert the IPv4 addresses to integer values, all the addresses at one time if valid
+    :param ip_list: list of IPv4 addresses
+    :return: list of integer values, {None} for the invalid addresses
+    """
+    try:
+        packed = b''.join([socket.inet_pton(socket.AF_INET, ip_address) for ip_address in ip_list])
+        return list(struct.unpack('!%dI' % len(ip_list), packed))
+    except (OSError, TypeError):
+        return [ip_to_int(ip_address) for ip_address in ip_list]
+
+
+def parse_subnet(subnet):
+    """
+    :param subnet: IPv4 subnet, example '10.93.130.0/24', the host bits are ignored
+    :return: the first and the last address integer values, or {None}, {None} if not a valid subnet
+    """
+    network, separator, prefix_length = subnet.partition('/')
+    start = ip_to_int(network)
+    if start is None or not prefix_length.isdigit() or int(prefix_length) > 32:
+        return None, None
+    host_mask = (1 << (32 - int(prefix_length))) - 1
+    return start & ~host_mask & 0xffffffff, start | host_mask
+
+
+class IPIndex:
+    """
+    Index of the known IPv4 addresses and subnets, with the source of each address and subnet
+    """
+
+    def __init__(self, use_numpy=None):
+        """
+        :param use_numpy: use the NumPy vectorized operations if installed, default {True}
+        """
+        self.use_numpy = numpy is not None and use_numpy is not False
+        self.address_values = array.array('I')  # address integer values, in the order added
+        self.address_sources = []  # the source of each address, example 'SW-0001 Vlan100'
+        self.subnet_starts = array.array('I')
+        self.subnet_ends = array.array('I')
+        self.subnet_names = []
+        self.subnet_sources = []  # list of the sources of each subnet
+        self.subnet_keys = {}  # (first, last address value): subnet index, the identical subnets are added once
+        self.sorted_values = None  # the address values sorted, and the order, built on the first query
+        self.sorted_order = None
+        self.unique_values = None
+
+    def __len__(self):
+        return len(self.address_values)
+
+    def add_address(self, ip_address, source):
+        """
+        Add the IPv4 {ip_address}, used by the {source}. The invalid addresses are skipped
+        :return: {True} if added
+        """
+        value = ip_to_int(ip_address)
+        if value is None:
+            return False
+        self.address_values.append(value)
+        self.address_sources.append(source)
+        self.sorted_values = None
+        return True
+
+    def add_addresses(self, ip_list, source_list):
+        """
+        Add many IPv4 addresses, the invalid addresses are skipped
+        :param ip_list: list of IPv4 addresses
+        :param source_list: the source of each address
+        :return: number of addresses added
+        """
+        added_count = 0
+        for value, source in zip(ips_to_ints(ip_list), source_list):
+            if value is not None:
+                self.address_values.append(value)
+                self.address_sources.append(source)
+                added_count += 1
+        self.sorted_values = None
+        return added_count
+
+    def add_subnet(self, subnet, source):
+        """
+        Add the IPv4 {subnet}, configured by the {source}. A subnet already added, same network and prefix length, is
+        not added again, the {source} is added to the subnet sources
+        :return: {True} if added or merged, {False} if not a valid subnet
+        """
+        start, end = parse_subnet(subnet)
+        if start is None:
+            return False
+        subnet_index = self.subnet_keys.get((start, end))
+        if subnet_index is not None:
+            if source not in self.subnet_sources[subnet_index]:
+                self.subnet_sources[subnet_index].append(source)
+            return True
+        self.subnet_keys[(start, end)] = len(self.subnet_names)
+        self.subnet_starts.append(start)
+        self.subnet_ends.append(end)
+        self.subnet_names.append(subnet)
+        self.subnet_sources.append([source])
+        return True
+
+    def add_device_records(self, device_list):
+        """
+        Add the management IP addresses of the network devices, list of dnac_models.NetworkDevice
+        """
+        return self.add_addresses([device.ip_address for device in device_list],
+                                  [device.hostname for device in device_list])
+
+    def add_host_table(self, host_table):
+        """
+        Add the host (client) IP addresses from the host table snapshot, host_cache.HostTable
+        """
+        host_list = list(host_table.ip_index.items())
+        return self.add_addresses([host_ip for host_ip, host in host_list],
+                                  ['host ' + str(host.get('hostMac')) for host_ip, host in host_list])
+
+    def add_config_analysis(self, analysis):
+        """
+        Add the interface addresses and subnets from the devices configurations, config_analytics.ConfigAnalysis
+        """
+        ip_list = []
+        source_list = []
+        for hostname, interface_list in analysis.interfaces.items():
+            for name, description, shutdown, address_list in interface_list:
+                source = hostname + ' ' + name
+                for subnet in set(subnet for ip_address, subnet, secondary in address_list):
+                    self.add_subnet(subnet, source)
+                for ip_address, subnet, secondary in address_list:
+                    ip_list.append(ip_address)
+                    source_list.append(source)
+        return self.add_addresses(ip_list, source_list)
+
+    def build(self):
+        """
+        Sort the address values, done once after the addresses are added
+        """
+        if self.use_numpy:
+            values = numpy.frombuffer(self.address_values, dtype=numpy.uint32)
+            self.sorted_order = numpy.argsort(values, kind='stable')
+            self.sorted_values = values[self.sorted_order]
+            # the values are sorted, the unique values are the values different from the previous value
+            unique_mask = numpy.ones(len(self.sorted_values), dtype=bool)
+            unique_mask[1:] = self.sorted_values[1:] != self.sorted_values[:-1]
+            self.unique_values = self.sorted_values[unique_mask]
+        else:
+            self.sorted_order = sorted(range(len(self.address_values)), key=self.address_values.__getitem__)
+            self.sorted_values = array.array('I', [self.address_values[index] for index in self.sorted_order])
+            self.unique_values = array.array('I', sorted(set(self.address_values)))
+
+    def find_values(self, value_list):
+        """
+        This function will find the address values in the index, one vectorized search if NumPy is used
+        :param value_list: list of address integer values
+        :return: list with the index of the first matching address, in the order added, or {None} if not found
+        """
+        if self.sorted_values is None:
+            self.build()
+        if not len(self.sorted_values):
+            return [None] * len(value_list)
+        if self.use_numpy:
+            query_values = numpy.array(value_list, dtype=numpy.uint32)
+            positions = numpy.searchsorted(self.sorted_values, query_values)
+            positions = numpy.minimum(positions, len(self.sorted_values) - 1)
+            found = self.sorted_values[positions] == query_values
+            return [int(address_index) if is_found else None
+                    for address_index, is_found in zip(self.sorted_order[positions].tolist(), found.tolist())]
+        found_list = []
+        sorted_values = self.sorted_values
+        for value in value_list:
+            position = bisect.bisect_left(sorted_values, value)
+            if position < len(sorted_values) and sorted_values[position] == value:
+                found_list.append(self.sorted_order[position])
+            else:
+                found_list.append(None)
+        return found_list
+
+    def contains(self, ip_list):
+        """
+        :param ip_list: list of IPv4 addresses
+        :return: list of {True} for the addresses in the index, {False} for the others and the invalid addresses
+        """
+        value_list = ips_to_ints(ip_list)
+        found_list = self.find_values([value or 0 for value in value_list])
+        return [value is not None and address_index is not None
+                for value, address_index in zip(value_list, found_list)]
+
+    def check_plan(self, ip_list):
+        """
+        This function will check an IP address plan against the index, all the addresses at one time
+        :param ip_list: list of the planned IPv4 addresses
+        :return: dict with the {conflicts}, dict with the IP address: source of the address already used, the
+        {duplicates}, the addresses listed more than once in the plan, and the {invalid} addresses
+        """
+        value_list = ips_to_ints(ip_list)
+        found_list = self.find_values([value or 0 for value in value_list])
+        conflicts = {}
+        invalid_list = []
+        planned = set()
+        duplicate_list = []
+        for ip_address, value, address_index in zip(ip_list, value_list, found_list):
+            if value is None:
+                invalid_list.append(ip_address)
+                continue
+            if value in planned:
+                duplicate_list.append(ip_address)
+            planned.add(value)
+            if address_index is not None:
+                conflicts[ip_address] = self.address_sources[address_index]
+        return {'conflicts': conflicts, 'duplicates': duplicate_list, 'invalid': invalid_list}
+
+    def get_duplicates(self):
+        """
+        :return: dict with the IP address: list of the sources, for the addresses added more than once
+        """
+        if self.sorted_values is None:
+            self.build()
+        sorted_values = self.sorted_values
+        if self.use_numpy:
+            positions = numpy.nonzero(sorted_values[1:] == sorted_values[:-1])[0].tolist()
+        else:
+            positions = [position for position in range(len(sorted_values) - 1)
+                         if sorted_values[position] == sorted_values[position + 1]]
+        duplicates = {}
+        for position in positions:
+            ip_address = int_to_ip(int(sorted_values[position]))
+            if ip_address not in duplicates:
+                duplicates[ip_address] = [self.address_sources[self.sorted_order[position]]]
+            duplicates[ip_address].append(self.address_sources[self.sorted_order[position + 1]])
+        return duplicates
+
+    def get_overlapping_subnets(self):
+        """
+        This function will find the overlapping subnets: the subnets sorted by the first address, each subnet that
+        starts before the end of a previous subnet overlaps it. The identical subnets are added once, see
+        {add_subnet}, the same subnet configured by many sources is not an overlap
+        :return: list of (subnet, list of sources, overlapped subnet, list of the overlapped subnet sources)
+        """
+        subnet_count = len(self.subnet_starts)
+        if subnet_count < 2:
+            return []
+        if self.use_numpy:
+            starts = numpy.frombuffer(self.subnet_starts, dtype=numpy.uint32)
+            ends = numpy.frombuffer(self.subnet_ends, dtype=numpy.uint32)
+            order = numpy.lexsort((numpy.uint32(0xffffffff) - ends, starts))  # by start, the larger subnets first
+            # running maximum of the previous subnets end, with the subnet position in the low 32 bits
+            end_keys = (ends[order].astype(numpy.uint64) << numpy.uint64(32)) | numpy.arange(subnet_count,
+                                                                                            dtype=numpy.uint64)
+            max_keys = numpy.maximum.accumulate(end_keys)
+            overlap_positions = numpy.nonzero(starts[order][1:].astype(numpy.uint64) <=
+                                              (max_keys[:-1] >> numpy.uint64(32)))[0]
+            overlap_list = [(int(order[position + 1]), int(order[int(max_keys[position]) & 0xffffffff]))
+                            for position in overlap_positions.tolist()]
+        else:
+            order = sorted(range(subnet_count), key=lambda index: (self.subnet_starts[index],
+                                                                   -self.subnet_ends[index]))
+            overlap_list = []
+            max_end, max_index = self.subnet_ends[order[0]], order[0]
+            for index in order[1:]:
+                if self.subnet_starts[index] <= max_end:
+                    overlap_list.append((index, max_index))
+                if self.subnet_ends[index] >= max_end:
+                    max_end, max_index = self.subnet_ends[index], index
+        return [(self.subnet_names[index], self.subnet_sources[index], self.subnet_names[overlapped_index],
+                 self.subnet_sources[overlapped_index]) for index, overlapped_index in overlap_list]
+
+    def find_free_address(self, subnet, near_address=None):
+        """
+        This function will find the free address, not in the index, nearest to the {near_address}, in the {subnet}.
+        The network and broadcast addresses are not used, for the subnets larger than /31
+        :param subnet: IPv4 subnet, example '10.93.130.0/24'
+        :param near_address: IPv4 address, default the first host address of the subnet
+        :return: the free IPv4 address, or {None} if the subnet is full
+        """
+        start, end = parse_subnet(subnet)
+        if start is None:
+            return None
+        if end - start > 1:
+            start, end = start + 1, end - 1
+        near_value = ip_to_int(near_address) if near_address else start
+        if near_value is None or not start <= near_value <= end:
+            near_value = start
+        if self.sorted_values is None:
+            self.build()
+        up_value = self.next_free_value(near_value, end, 1)
+        down_value = self.next_free_value(near_value, start, -1)
+        if up_value is None and down_value is None:
+            return None
+        if up_value is None or (down_value is not None and near_value - down_value < up_value - near_value):
+            return int_to_ip(down_value)
+        return int_to_ip(up_value)
+
+    def next_free_value(self, value, limit, step, window_size=4096):
+        """
+        This function will find the first free address value from the {value} to the {limit}, going up ({step} 1) or
+        down ({step} -1). The used addresses are compared with the consecutive values, one window at a time
+        :return: the free address value, or {None}
+        """
+        unique_values = self.unique_values
+        position = bisect.bisect_left(unique_values, value) if step > 0 else bisect.bisect_right(unique_values,
+                                                                                                  value) - 1
+        while (limit - value) * step >= 0:
+            if position < 0 or position >= len(unique_values) or unique_values[position] != value:
+                return value
+            # the used values from the position are consecutive up to the first gap
+            if step > 0:
+                window = unique_values[position:position + window_size]
+            else:
+                window = unique_values[max(position - window_size + 1, 0):position + 1][::-1]
+            if self.use_numpy:
+                gaps = numpy.nonzero(window.astype(numpy.int64) - (value + step * numpy.arange(len(window))))[0]
+                run_length = int(gaps[0]) if len(gaps) else len(window)
+            else:
+                run_length = next((offset for offset, window_value in enumerate(window)
+                                   if window_value != value + step * offset), len(window))
+            value += step * run_length
+            position += step * run_length
+        return None
+
+
+def build_index(dnac_jwt_token, config_source='dnac', archive_dir=CONFIG_ARCHIVE_DIR, hosts=True, use_numpy=None):
+    """
+    This function will build the index with the known addresses: the inventory devices, the host table, and the
+    devices configurations interfaces and subnets
+    :param dnac_jwt_token: DNA C token
+    :param config_source: 'dnac', 'archive' or {None}, see {config_analytics.analyze_configs}
+    :param archive_dir: configuration archive directory
+    :param hosts: add the host table addresses
+    :param use_numpy: use the NumPy vectorized operations, default if NumPy is installed
+    :return: IPIndex
+    """
+    ip_index = IPIndex(use_numpy)
+    ip_index.add_device_records(dnac_apis.get_all_device_records(dnac_jwt_token))
+    if hosts:
+        host_table = host_cache.HostTable()
+        host_table.load(dnac_jwt_token)
+        ip_index.add_host_table(host_table)
+    if config_source == 'dnac':
+        ip_index.add_config_analysis(config_analytics.analyze_configs(
+            config_analytics.iter_dnac_configs(dnac_jwt_token)))
+    elif config_source == 'archive':
+        ip_index.add_config_analysis(config_analytics.analyze_configs(
+            config_analytics.iter_archive_configs(archive_dir)))
+    ip_index.build()
+    return ip_index
+
+
+def main():
+    """
+    Check an IP address plan against the known addresses, and print the conflicts
+    """
+    parser = argparse.ArgumentParser(description='Check an IP address plan against the known addresses')
+    parser.add_argument('plan_file', nargs='?', default=None, help='file with one planned IP address on each line')
+    parser.add_argument('--configs', choices=['dnac', 'archive', 'none'], default='dnac',
+                        help='devices configurations source')
+    parser.add_argument('--archive-dir', default=CONFIG_ARCHIVE_DIR, help='configuration archive directory')
+    parser.add_argument('--no-hosts', action='store_true', help='do not add the host table addresses')
+    parser.add_argument('--free', default=None, help='print the free address nearest to the start of the subnet')
+    parser.add_argument('--overlaps', action='store_true', help='print the overlapping subnets')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    ip_index = build_index(dnac_apis.get_dnac_token(), None if args.configs == 'none' else args.configs,
+                           args.archive_dir, not args.no_hosts)
+    print('Addresses: ', len(ip_index), ' , subnets: ', len(ip_index.subnet_names),
+          ' , index built: %.2f seconds' % (time.time() - start_time), ' , NumPy: ', ip_index.use_numpy)
+
+    if args.plan_file:
+        with open(args.plan_file) as plan_file:
+            ip_list = [line.strip() for line in plan_file if line.strip()]
+        check_time = time.time()
+        plan_check = ip_index.check_plan(ip_list)
+        check_time = time.time() - check_time
+        for ip_address, source in sorted(plan_check['conflicts'].items()):
+            print('%-16s used by %s' % (ip_address, source))
+        for ip_address in plan_check['duplicates']:
+            print('%-16s listed more than once' % ip_address)
+        for ip_address in plan_check['invalid']:
+            print('%-16s not a valid IPv4 address' % ip_address)
+        print('\nPlanned addresses: ', len(ip_list), ' , conflicts: ', len(plan_check['conflicts']),
+              ' , check time: %.1f ms' % (check_time * 1000))
+
+    if args.overlaps:
+        for subnet, source, overlapped_subnet, overlapped_source in ip_index.get_overlapping_subnets():
+            print('%-18s %-30s overlaps %-18s %s' % (subnet, ', '.join(source), overlapped_subnet,
+                                                     ', '.join(overlapped_source)))
+
+    if args.free:
+        print('Free address in ', args.free, ': ', ip_index.find_free_address(args.free))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the application logging setup. The log records are queued by the application threads and written
+# by one background thread, as JSON records, to a size based rotating log file. Each record includes the correlation
+# id, the PnP device id of the onboarding, and the per-request debug logs from the HTTP libraries are sampled.
+
+import json
+import atexit
+import queue
+import random
+import logging
+import logging.handlers
+
+import metrics
+
+from config import LOG_FILE, LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_DEBUG_SAMPLE_RATE
+
+
+REQUEST_LOGGERS = ('urllib3', 'requests')  # loggers with one debug record for each HTTP request
+
+LOG_LISTENER = None
+
+
+class CorrelationFilter(logging.Filter):
+    """
+    Add the correlation id, the trace id of the current thread, to each log record, and sample the per-request debug
+    records from the HTTP libraries
+    """
+
+    def __init__(self, debug_sample_rate):
+        """
+        :param debug_sample_rate: fraction of the per-request debug records logged, between 0 and 1
+        """
+        logging.Filter.__init__(self)
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG and record.name.startswith(REQUEST_LOGGERS):
+            if random.random() >= self.debug_sample_rate:
+                return False
+        record.correlation_id = metrics.get_trace_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format the log records as one JSON object for each line
+    """
+
+    def format(self, record):
+        log_record = {'time': self.formatTime(record, '%Y-%m-%d %H:%M:%S') + '.%03d' % record.msecs,
+                      'level': record.levelname,
+                      'logger': record.name,
+                      'module': record.module,
+                      'function': record.funcName,
+                      'correlation_id': getattr(record, 'correlation_id', None),
+                      'message': record.getMessage()}
+        if record.exc_info:
+            log_record['exception'] = self.formatException(record.exc_info)
+        return json.dumps(log_record)
+
+
+def setup_logging(log_file=LOG_FILE, level=LOG_LEVEL, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                  debug_sample_rate=LOG_DEBUG_SAMPLE_RATE):
+    """
+    This function will configure the root logger to queue the log records, and start the background thread writing
+    the records to the rotating log file {log_file}
+    :param log_file: log file name
+    :param level: logging level, example 'DEBUG'
+    :param max_bytes: maximum log file size, the file is rotated when the size is reached
+    :param backup_count: number of rotated log files kept
+    :param debug_sample_rate: fraction of the per-request debug records logged, between 0 and 1
+    :return:
+    """
+    global LOG_LISTENER
+    if LOG_LISTENER is not None:
+        return
+
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(CorrelationFilter(debug_sample_rate))
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.addHandler(queue_handler)
+
+    LOG_LISTENER = logging.handlers.QueueListener(log_queue, file_handler)
+    LOG_LISTENER.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    This function will write all the queued log records and stop the background logging thread
+    :return:
+    """
+    global LOG_LISTENER
+    if LOG_LISTENER is not None:
+        LOG_LISTENER.stop()
+        LOG_LISTENER = None
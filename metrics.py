@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the latency instrumentation for the AP onboarding: the duration of each onboarding stage, and the
+# endpoint, status, size and latency of each DNA Center and ServiceNow API call. The API calls are timed by the HTTP
+# sessions, the latency includes the response body transfer.
+# The measurements are exported as Prometheus metrics (text format) and as a JSON trace for each AP.
+
+import os
+import re
+import json
+import time
+import threading
+
+from collections import deque
+from contextlib import contextmanager
+
+import requests
+
+from config import METRICS_MAX_RECORDS
+
+
+METRICS_LOCK = threading.Lock()
+METRICS_CONTEXT = threading.local()  # current trace id (PnP device id) and stage, for each thread
+
+# the last METRICS_MAX_RECORDS raw records, for the traces
+STAGE_RECORDS = deque(maxlen=METRICS_MAX_RECORDS)  # dict with the {trace_id}, {stage}, {start}, {end}, {duration}
+CALL_RECORDS = deque(maxlen=METRICS_MAX_RECORDS)  # dict with the {trace_id}, {stage}, {method}, {endpoint},
+# {status}, {bytes}, {latency}, {timestamp}
+
+# cumulative totals for all the records, for the Prometheus metrics
+STAGE_TOTALS = {}  # labels: (count, duration)
+CALL_TOTALS = {}  # labels: (count, latency, bytes)
+COUNTER_TOTALS = {}  # counter name: dict with the labels: value
+COUNTER_HELP = {}  # counter name: description
+
+ENDPOINT_ID_PATTERNS = [
+    (re.compile(r'/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'), '/{id}'),
+    (re.compile(r'/\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}'), '/{ip}'),
+    (re.compile(r'/[0-9a-f]{24,32}(?=/|$)'), '/{id}'),
+    (re.compile(r'/INC\d+'), '/{incident}'),
+    (re.compile(r'/\d+(?=/|$)'), '/{n}')
+]
+
+
+def set_trace_id(trace_id):
+    """
+    This function will set the trace id, the PnP device id, for the API calls made by the current thread
+    :param trace_id: trace id, {None} for the calls not related to one device
+    :return:
+    """
+    METRICS_CONTEXT.trace_id = trace_id
+
+
+def get_trace_id():
+    """
+    :return: the trace id for the current thread
+    """
+    return getattr(METRICS_CONTEXT, 'trace_id', None)
+
+
+def set_stage(stage_name):
+    """
+    This function will set the stage name for the API calls made by the current thread, used by the worker threads
+    running part of a stage
+    :param stage_name: stage name, {None} for the calls not related to a stage
+    :return:
+    """
+    METRICS_CONTEXT.stage = stage_name
+
+
+def record_stage(stage_name, start, end, trace_ids=None):
+    """
+    This function will record the duration of the onboarding stage {stage_name}, for each trace id
+    :param stage_name: stage name
+    :param start: stage start epoch time, seconds
+    :param end: stage end epoch time, seconds
+    :param trace_ids: list of trace ids, the stage applies to all of them, {None} for the current thread trace id
+    :return:
+    """
+    if trace_ids is None:
+        trace_ids = [get_trace_id()]
+    with METRICS_LOCK:
+        labels = format_labels({'stage': stage_name})
+        for trace_id in trace_ids:
+            STAGE_RECORDS.append({'trace_id': trace_id, 'stage': stage_name, 'start': start, 'end': end,
+                                  'duration': end - start})
+            count, total = STAGE_TOTALS.get(labels, (0, 0.0))
+            STAGE_TOTALS[labels] = (count + 1, total + end - start)
+
+
+@contextmanager
+def stage(stage_name, trace_ids=None):
+    """
+    Context manager to measure the onboarding stage {stage_name}. The API calls made by the current thread during the
+    stage are recorded with the stage name. The trace ids may be updated during the stage, using the yielded dict
+    :param stage_name: stage name
+    :param trace_ids: list of trace ids, {None} for the current thread trace id
+    :return: dict with the {trace_ids}
+    """
+    stage_info = {'trace_ids': trace_ids}
+    previous_stage = getattr(METRICS_CONTEXT, 'stage', None)
+    METRICS_CONTEXT.stage = stage_name
+    start = time.time()
+    try:
+        yield stage_info
+    finally:
+        METRICS_CONTEXT.stage = previous_stage
+        record_stage(stage_name, start, time.time(), stage_info['trace_ids'])
+
+
+def get_endpoint(url):
+    """
+    This function will return the endpoint for the {url}, the path with the ids replaced by placeholders
+    :param url: request URL
+    :return: endpoint
+    """
+    path = re.sub(r'^https?://[^/]+', '', url).split('?')[0]
+    for pattern, placeholder in ENDPOINT_ID_PATTERNS:
+        path = pattern.sub(placeholder, path)
+    return path
+
+
+def record_call(method, url, status, response_size, latency):
+    """
+    This function will record the API call: endpoint, status, response size and latency
+    :param method: HTTP method
+    :param url: request URL
+    :param status: response status code, or 'cache_hit' for the responses served from the HTTP cache
+    :param response_size: response content size, bytes
+    :param latency: time from the request start until the response content was received, seconds
+    :return:
+    """
+    call_record = {'trace_id': get_trace_id(),
+                   'stage': getattr(METRICS_CONTEXT, 'stage', None),
+                   'method': method,
+                   'endpoint': get_endpoint(url),
+                   'status': status,
+                   'bytes': response_size,
+                   'latency': latency,
+                   'timestamp': time.time()}
+    labels = format_labels({'method': call_record['method'], 'endpoint': call_record['endpoint'],
+                            'status': call_record['status'], 'stage': call_record['stage'] or ''})
+    with METRICS_LOCK:
+        CALL_RECORDS.append(call_record)
+        count, total, size = CALL_TOTALS.get(labels, (0, 0.0, 0))
+        CALL_TOTALS[labels] = (count + 1, total + call_record['latency'], size + call_record['bytes'])
+
+
+class TimedSession(requests.Session):
+    """
+    requests Session recording each API call, see {record_call}. For the streamed responses the body is not read, the
+    size is the Content-Length header, and the latency is the time until the response headers were received
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        start_time = time.time()
+        response = requests.Session.request(self, method, url, *args, **kwargs)
+        if kwargs.get('stream'):
+            content_length = response.headers.get('Content-Length', '')
+            response_size = int(content_length) if content_length.isdigit() else 0
+        else:
+            response_size = len(response.content or b'')
+        record_call(method.upper(), response.url, response.status_code, response_size, time.time() - start_time)
+        return response
+
+
+def increment_counter(counter_name, label_dict, description, amount=1):
+    """
+    This function will increment the Prometheus counter {counter_name}, for the labels in the {label_dict}
+    :param counter_name: counter name, example 'dnac_coalesced_requests_total'
+    :param label_dict: dict with the label names and values
+    :param description: counter description, the HELP text
+    :param amount: increment
+    :return:
+    """
+    labels = format_labels(label_dict)
+    with METRICS_LOCK:
+        COUNTER_HELP[counter_name] = description
+        counter = COUNTER_TOTALS.setdefault(counter_name, {})
+        counter[labels] = counter.get(labels, 0) + amount
+
+
+def reset():
+    """
+    This function will delete all the recorded stages and API calls, and the totals
+    :return:
+    """
+    with METRICS_LOCK:
+        STAGE_RECORDS.clear()
+        CALL_RECORDS.clear()
+        STAGE_TOTALS.clear()
+        CALL_TOTALS.clear()
+        COUNTER_TOTALS.clear()
+
+
+def get_trace(trace_id):
+    """
+    This function will return the trace for the {trace_id}: the stages and the API calls
+    :param trace_id: trace id, the PnP device id
+    :return: dict with the {trace_id}, the {stages} and the {calls}
+    """
+    with METRICS_LOCK:
+        stage_list = [record for record in STAGE_RECORDS if record['trace_id'] == trace_id]
+        call_list = [record for record in CALL_RECORDS if record['trace_id'] == trace_id]
+    return {'trace_id': trace_id, 'stages': stage_list, 'calls': call_list}
+
+
+def write_traces(trace_dir, trace_ids=None):
+    """
+    This function will save the JSON trace for each trace id to the directory {trace_dir}, file {trace_id}.json
+    :param trace_dir: directory name
+    :param trace_ids: list of trace ids to save, {None} for all the recorded trace ids
+    :return: list of the file names
+    """
+    if not os.path.isdir(trace_dir):
+        os.makedirs(trace_dir)
+    if trace_ids is None:
+        with METRICS_LOCK:
+            trace_ids = set(record['trace_id'] for record in list(STAGE_RECORDS) + list(CALL_RECORDS))
+    file_list = []
+    for trace_id in trace_ids:
+        if trace_id is None:
+            continue
+        file_name = os.path.join(trace_dir, str(trace_id) + '.json')
+        with open(file_name, 'w') as trace_file:
+            json.dump(get_trace(trace_id), trace_file, indent=4)
+        file_list.append(file_name)
+    return file_list
+
+
+def format_labels(label_dict):
+    """
+    This function will format the Prometheus labels
+    :param label_dict: dict with the label names and values
+    :return: labels string, example {method="GET",status="200"}
+    """
+    label_list = []
+    for name, value in sorted(label_dict.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        label_list.append(name + '="' + value + '"')
+    return '{' + ','.join(label_list) + '}'
+
+
+def export_prometheus():
+    """
+    This function will export the recorded stages and API calls totals as Prometheus metrics, text exposition format
+    :return: metrics text
+    """
+    with METRICS_LOCK:
+        stage_metrics = dict(STAGE_TOTALS)
+        call_metrics = dict(CALL_TOTALS)
+        counter_metrics = dict((counter_name, dict(counter)) for counter_name, counter in COUNTER_TOTALS.items())
+
+    lines = ['# HELP onboarding_stage_seconds AP onboarding stage duration',
+             '# TYPE onboarding_stage_seconds summary']
+    for labels, (count, total) in sorted(stage_metrics.items()):
+        lines.append('onboarding_stage_seconds_count' + labels + ' ' + str(count))
+        lines.append('onboarding_stage_seconds_sum' + labels + ' ' + repr(total))
+    lines += ['# HELP api_call_seconds API call latency',
+              '# TYPE api_call_seconds summary']
+    for labels, (count, total, size) in sorted(call_metrics.items()):
+        lines.append('api_call_seconds_count' + labels + ' ' + str(count))
+        lines.append('api_call_seconds_sum' + labels + ' ' + repr(total))
+    lines += ['# HELP api_call_response_bytes_total API call response size',
+              '# TYPE api_call_response_bytes_total counter']
+    for labels, (count, total, size) in sorted(call_metrics.items()):
+        lines.append('api_call_response_bytes_total' + labels + ' ' + str(size))
+    for counter_name, counter in sorted(counter_metrics.items()):
+        lines += ['# HELP ' + counter_name + ' ' + COUNTER_HELP[counter_name],
+                  '# TYPE ' + counter_name + ' counter']
+        for labels, value in sorted(counter.items()):
+            lines.append(counter_name + labels + ' ' + str(value))
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(file_name):
+    """
+    This function will save the Prometheus metrics to the file {file_name}, for the node exporter textfile collector
+    :param file_name: file name
+    :return:
+    """
+    temp_file_name = file_name + '.tmp'
+    with open(temp_file_name, 'w') as metrics_file:
+        metrics_file.write(export_prometheus())
+    os.replace(temp_file_name, file_name)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the path trace batch runner. The identical source/destination pairs are traced once, the recent
+# completed path traces are reused from the cache, and up to PATH_TRACE_MAX_IN_FLIGHT path traces are in progress at
+# one time. All the path traces in progress are polled together, the poll interval increases while they are running.
+
+import sys
+import time
+import argparse
+
+from concurrent.futures import ThreadPoolExecutor
+
+import dnac_apis
+import dnac_cache
+
+from config import PATH_TRACE_MAX_IN_FLIGHT, PATH_TRACE_CACHE_TTL, PATH_TRACE_TIMEOUT
+
+
+class PathTraceRunner:
+    """
+    Run many path traces concurrently, and cache the completed path traces
+    """
+
+    def __init__(self, max_in_flight=PATH_TRACE_MAX_IN_FLIGHT, cache_ttl=PATH_TRACE_CACHE_TTL,
+                 timeout=PATH_TRACE_TIMEOUT, poll_interval=1, max_poll_interval=8):
+        """
+        :param max_in_flight: maximum number of path traces in progress at one time
+        :param cache_ttl: completed path traces cache time to live, in seconds
+        :param timeout: maximum time to wait for each path trace, in seconds
+        :param poll_interval: first poll interval, in seconds
+        :param max_poll_interval: maximum poll interval, in seconds
+        """
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.cache = dnac_cache.TTLCache(cache_ttl)
+        self.created_count = 0
+        self.poll_count = 0
+
+    def run(self, pair_list, dnac_jwt_token):
+        """
+        Run the path traces for the source/destination IP address pairs in the {pair_list}
+        :param pair_list: list of (source IP, destination IP)
+        :param dnac_jwt_token: DNA C token
+        :return: dict with the (source IP, destination IP): dict with the path trace {status} (COMPLETED, FAILED,
+        TIMEOUT or ERROR), the {path} list, see {dnac_apis.get_path_trace_info}, and the {error}
+        """
+        results = {}
+        pending_list = []
+        unique_pairs = set()
+        for pair in pair_list:
+            if pair in unique_pairs:
+                continue
+            unique_pairs.add(pair)
+            cached_result = self.cache.get(pair)
+            if cached_result is not None:
+                results[pair] = cached_result
+            else:
+                pending_list.append(pair)
+        pending_list.reverse()
+
+        in_flight = {}  # path trace id: (source IP, destination IP), start time
+        poll_interval = self.poll_interval
+        create_path_trace = dnac_apis.with_cluster(dnac_apis.create_path_trace)
+        get_path_trace_info = dnac_apis.with_cluster(dnac_apis.get_path_trace_info)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            while pending_list or in_flight:
+
+                # start new path traces, up to {max_in_flight} in progress
+                start_list = []
+                while pending_list and len(in_flight) + len(start_list) < self.max_in_flight:
+                    start_list.append(pending_list.pop())
+                if start_list:
+                    poll_interval = self.poll_interval
+                for pair, future in [(pair, executor.submit(create_path_trace, pair[0], pair[1], dnac_jwt_token))
+                                     for pair in start_list]:
+                    try:
+                        in_flight[future.result()] = (pair, time.time())
+                        self.created_count += 1
+                    except Exception as trace_error:
+                        results[pair] = {'status': 'ERROR', 'path': [], 'error': repr(trace_error)}
+
+                time.sleep(poll_interval)
+                poll_interval = min(poll_interval * 2, self.max_poll_interval)
+
+                # poll all the path traces in progress
+                poll_list = [(path_id, executor.submit(get_path_trace_info, path_id, dnac_jwt_token))
+                             for path_id in in_flight]
+                self.poll_count += len(poll_list)
+                for path_id, future in poll_list:
+                    pair, start_time = in_flight[path_id]
+                    try:
+                        path_status, path_list = future.result()
+                    except Exception as trace_error:
+                        path_status, path_list = 'ERROR', []
+                        results[pair] = {'status': path_status, 'path': path_list, 'error': repr(trace_error)}
+                    if path_status == 'COMPLETED':
+                        results[pair] = {'status': path_status, 'path': path_list, 'error': None}
+                        self.cache.set(pair, results[pair])
+                    elif path_status == 'FAILED':
+                        results[pair] = {'status': path_status, 'path': path_list, 'error': None}
+                    elif path_status != 'ERROR' and time.time() - start_time > self.timeout:
+                        results[pair] = {'status': 'TIMEOUT', 'path': path_list, 'error': None}
+                    if pair in results:
+                        del in_flight[path_id]
+        return results
+
+
+def main():
+    """
+    Run the path traces for the source/destination pairs, and print the paths
+    """
+    parser = argparse.ArgumentParser(description='Path trace batch runner')
+    parser.add_argument('pairs', nargs='+', help='source and destination IP addresses, "source_ip,destination_ip"')
+    parser.add_argument('--max-in-flight', type=int, default=PATH_TRACE_MAX_IN_FLIGHT,
+                        help='maximum number of path traces in progress')
+    args = parser.parse_args()
+
+    pair_list = [tuple(pair.split(',')) for pair in args.pairs]
+    path_trace_runner = PathTraceRunner(max_in_flight=args.max_in_flight)
+    start_time = time.time()
+    results = path_trace_runner.run(pair_list, dnac_apis.get_dnac_token())
+    for pair in pair_list:
+        result = results[pair]
+        print('\n' + pair[0] + ' -> ' + pair[1] + ' : ' + result['status'])
+        if result['path']:
+            print('   ' + ' , '.join(result['path']))
+        if result['error']:
+            print('   ' + result['error'])
+    print('\nPath traces: ', len(results), ' , time: %.2f seconds' % (time.time() - start_time))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the long running AP onboarding daemon. The daemon keeps the DNA Center token, the HTTP
+# connections and the reference data caches warm, scans the PnP database every DAEMON_SCAN_INTERVAL seconds, and
+# onboards the new PnP devices as they are found, in batches, using the "dnac_pnp_ap.py" onboarding workflow.
+# The local HTTP status endpoint reports the queue depth and the in-flight workflows (/status, JSON format) and the
+# onboarding metrics (/metrics, Prometheus format).
+
+import sys
+import json
+import time
+import queue
+import logging
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import dnac_apis
+import dnac_cache
+import dnac_pnp_ap
+import ap_assignment
+import ap_verify
+import log_config
+import metrics
+
+from config import DAEMON_SCAN_INTERVAL, DAEMON_WORKERS, DAEMON_BATCH_SIZE, DAEMON_STATUS_PORT
+from config import DAEMON_RETRY_INTERVAL
+from config import SITE_CACHE_TTL
+from config import METRICS_FILE, TRACE_DIR
+
+LOGGER = logging.getLogger(__name__)
+
+
+class OnboardingDaemon:
+    """
+    Scan for the new PnP devices, queue them, and onboard the queued devices using the worker threads
+    """
+
+    def __init__(self, assignment_db, scan_interval=DAEMON_SCAN_INTERVAL, workers=DAEMON_WORKERS,
+                 batch_size=DAEMON_BATCH_SIZE, retry_interval=DAEMON_RETRY_INTERVAL):
+        """
+        :param assignment_db: AP assignment database
+        :param scan_interval: time between the PnP database scans, in seconds
+        :param workers: number of onboarding worker threads
+        :param batch_size: maximum number of devices onboarded by one worker, in one batch
+        :param retry_interval: time after which the devices not onboarded are queued again, in seconds
+        """
+        self.assignment_db = assignment_db
+        self.scan_interval = scan_interval
+        self.workers = workers
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.site_cache = dnac_cache.TTLCache(SITE_CACHE_TTL)
+        self.device_queue = queue.Queue()
+        self.known_devices = set()  # PnP device ids queued, in-flight or onboarded, not queued again
+        self.retry_times = {}  # PnP device id: time after which the device not onboarded may be queued again
+        self.in_flight = {}  # PnP device id: dict with the {device_name}, {site_name}, {floor_name}, {started}
+        self.onboarded_count = 0
+        self.failed_count = 0
+        self.scan_count = 0
+        self.scan_errors = 0
+        self.last_scan = None
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread_list = []
+
+    def scan(self):
+        """
+        Scan the PnP database once, and queue the new devices assigned to a floor
+        :return: number of devices queued
+        """
+        dnac_token = dnac_apis.get_dnac_token()
+
+        # refresh the floor ids, the floors may be created after the daemon start
+        self.site_cache.get('floor_ids', lambda: ap_assignment.resolve_floor_ids(self.assignment_db, dnac_token))
+
+        queued_count = 0
+        for pnp_device, pnp_device_assign in dnac_pnp_ap.scan_pnp_devices(self.assignment_db, dnac_token):
+            with self.lock:
+                if pnp_device.pnp_id in self.known_devices or \
+                        self.retry_times.get(pnp_device.pnp_id, 0) > time.time():
+                    continue
+                self.known_devices.add(pnp_device.pnp_id)
+                self.retry_times.pop(pnp_device.pnp_id, None)
+            self.device_queue.put((pnp_device, pnp_device_assign))
+            queued_count += 1
+        return queued_count
+
+    def scan_loop(self):
+        """
+        Scan the PnP database every {scan_interval} seconds, until stopped
+        """
+        while not self.stop_event.is_set():
+            try:
+                queued_count = self.scan()
+                if queued_count:
+                    LOGGER.info('PnP scan, devices queued: %d', queued_count)
+            except Exception:
+                LOGGER.exception('PnP scan failed')
+                with self.lock:
+                    self.scan_errors += 1
+            with self.lock:
+                self.scan_count += 1
+                self.last_scan = time.time()
+            self.stop_event.wait(self.scan_interval)
+
+    def get_batch(self):
+        """
+        Wait for the first queued device, and return it with the other queued devices, up to {batch_size} devices
+        :return: list of (PnP device, AP assignment), empty if no device is queued within one second
+        """
+        try:
+            batch = [self.device_queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.device_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def onboard_batch(self, batch):
+        """
+        Onboard the devices in the {batch}, and update the daemon counters
+        :param batch: list of (PnP device, AP assignment)
+        """
+        device_id_list = [pnp_device.pnp_id for pnp_device, pnp_device_assign in batch]
+        with self.lock:
+            for pnp_device, pnp_device_assign in batch:
+                self.in_flight[pnp_device.pnp_id] = {'device_name': pnp_device_assign['device_hostname'] or
+                                                     pnp_device.hostname,
+                                                     'site_name': pnp_device_assign['site_name'],
+                                                     'floor_name': pnp_device_assign['floor_name'],
+                                                     'started': time.time()}
+        onboarded_list = []
+        try:
+            onboarding_list = dnac_pnp_ap.onboard_pnp_devices(batch, dnac_apis.get_dnac_token())
+            onboarded_list = [onboarding['device_id'] for onboarding in onboarding_list]
+        except Exception:
+            LOGGER.exception('Onboarding failed, devices: %s', ', '.join(device_id_list))
+        finally:
+            metrics.set_trace_id(None)
+            with self.lock:
+                for device_id in device_id_list:
+                    self.in_flight.pop(device_id, None)
+                    # the devices not onboarded are queued again by the next scans, after the retry interval
+                    if device_id not in onboarded_list:
+                        self.known_devices.discard(device_id)
+                        self.retry_times[device_id] = time.time() + self.retry_interval
+                self.onboarded_count += len(onboarded_list)
+                self.failed_count += len(device_id_list) - len(onboarded_list)
+
+        # save the onboarding metrics and the JSON trace for each AP in the batch
+        metrics.write_prometheus(METRICS_FILE)
+        metrics.write_traces(TRACE_DIR, device_id_list)
+
+    def worker_loop(self):
+        """
+        Onboard the queued devices, until stopped
+        """
+        while not self.stop_event.is_set():
+            batch = self.get_batch()
+            if batch:
+                self.onboard_batch(batch)
+
+    def start(self):
+        """
+        Start the scan thread and the worker threads
+        """
+        thread_list = [threading.Thread(target=self.scan_loop, name='pnp-scan', daemon=True)]
+        for index in range(self.workers):
+            thread_list.append(threading.Thread(target=self.worker_loop, name='pnp-worker-' + str(index),
+                                                daemon=True))
+        for thread in thread_list:
+            thread.start()
+        self.thread_list = thread_list
+
+    def stop(self, timeout=None):
+        """
+        Stop the threads, the in-flight batches are completed
+        :param timeout: maximum time to wait for each thread, in seconds
+        """
+        self.stop_event.set()
+        for thread in self.thread_list:
+            thread.join(timeout)
+
+    def status(self):
+        """
+        :return: dict with the daemon status: queue depth, in-flight workflows, counters and cache statistics
+        """
+        now = time.time()
+        with self.lock:
+            in_flight_list = [dict(info, device_id=device_id, duration=now - info['started'])
+                              for device_id, info in self.in_flight.items()]
+            return {'uptime': now - self.started,
+                    'queue_depth': self.device_queue.qsize(),
+                    'in_flight_count': len(in_flight_list),
+                    'in_flight': in_flight_list,
+                    'onboarded': self.onboarded_count,
+                    'failed': self.failed_count,
+                    'scans': self.scan_count,
+                    'scan_errors': self.scan_errors,
+                    'retry_pending': len(self.retry_times),
+                    'last_scan': self.last_scan,
+                    'caches': {'topology': {'hits': ap_verify.TOPOLOGY_CACHE.hits,
+                                            'misses': ap_verify.TOPOLOGY_CACHE.misses},
+                               'wlc': {'hits': ap_verify.WLC_CACHE.hits, 'misses': ap_verify.WLC_CACHE.misses},
+                               'site': {'hits': self.site_cache.hits, 'misses': self.site_cache.misses},
+                               'http': dict(dnac_apis.DNAC_SESSION.cache_counts,
+                                            entries=len(dnac_apis.DNAC_SESSION.http_cache))},
+                    'dnac_requests': {'sent': dnac_apis.DNAC_SESSION.sent_count,
+                                      'coalesced': dnac_apis.DNAC_SESSION.coalesced_count}}
+
+
+class StatusRequestHandler(BaseHTTPRequestHandler):
+    """
+    The status endpoint request handler: /status, the daemon status in JSON format, /metrics, the onboarding metrics
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/status':
+            response_bytes = json.dumps(self.server.onboarding_daemon.status(), indent=4).encode('utf-8')
+            content_type = 'application/json'
+        elif path == '/metrics':
+            response_bytes = metrics.export_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(response_bytes)))
+        self.end_headers()
+        self.wfile.write(response_bytes)
+
+
+def start_status_server(onboarding_daemon, port=DAEMON_STATUS_PORT):
+    """
+    This function will start the local HTTP status endpoint, in a background thread
+    :param onboarding_daemon: the onboarding daemon
+    :param port: TCP port, 0 for any free port
+    :return: the server
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StatusRequestHandler)
+    server.daemon_threads = True
+    server.onboarding_daemon = onboarding_daemon
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    return server
+
+
+def main():
+    """
+    Run the onboarding daemon, until interrupted
+    """
+    print('\n\nApplication "dnac_pnp_ap.py" started, daemon mode')
+
+    # logging, JSON records, to the rotating log file {LOG_FILE}
+    log_config.setup_logging()
+
+    # the first token and the floor ids are loaded before the daemon start, to report the configuration errors
+    dnac_token = dnac_apis.get_dnac_token()
+    assignment_db = dnac_pnp_ap.load_assignment()
+    missing_floors = ap_assignment.resolve_floor_ids(assignment_db, dnac_token)
+    for floor in missing_floors:
+        print('Floor not found: ', floor)
+
+    onboarding_daemon = OnboardingDaemon(assignment_db)
+    status_server = start_status_server(onboarding_daemon)
+    onboarding_daemon.start()
+    print('\nOnboarding daemon started, status: http://127.0.0.1:' + str(status_server.server_address[1]) + '/status')
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print('\nOnboarding daemon stopping, waiting for the in-flight workflows')
+        onboarding_daemon.stop()
+        status_server.shutdown()
+
+    print('\n\nEnd of Application "dnac_pnp_ap.py" Run')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the PnP state tracker. The PnP device list is retrieved once for each poll, for all the tracked
+# devices, and the state changes are reported as transition events.
+
+import time
+import logging
+
+import dnac_apis
+
+from config import PNP_POLL_MAX_ERRORS
+
+LOGGER = logging.getLogger(__name__)
+
+PNP_FINAL_STATES = ['Provisioned', 'Error']
+PNP_TIMEOUT_STATE = 'Timeout'  # the state of the devices not in a final state when the tracking times out
+
+SERIAL_FILTER_SIZE = 50  # maximum number of serial numbers in one PnP device list query
+
+
+class PnPStateTracker:
+    """
+    Track the PnP state for many devices, using one PnP device list query for each poll.
+    Devices are no longer tracked after they reach one of the {PNP_FINAL_STATES}.
+    """
+
+    def __init__(self, dnac_jwt_token, poll_interval=5, max_errors=PNP_POLL_MAX_ERRORS):
+        """
+        :param dnac_jwt_token: DNA C token
+        :param poll_interval: time between polls, in seconds
+        :param max_errors: number of consecutive poll errors after which a new DNA C token is created
+        """
+        self.dnac_jwt_token = dnac_jwt_token
+        self.poll_interval = poll_interval
+        self.max_errors = max_errors
+        self.poll_errors = 0  # consecutive poll errors
+        self.serial_numbers = {}  # tracked device id: serial number
+        self.device_states = {}  # device id: current state
+        self.status_lists = {}  # device id: list of (state, timestamp), for each state seen
+
+    def add_device(self, device_id, serial_number=None):
+        """
+        Start tracking the PnP device with the {device_id}
+        :param device_id: PnP device id
+        :param serial_number: PnP device serial number, used to filter the PnP device list query
+        :return:
+        """
+        self.serial_numbers[device_id] = serial_number
+        self.status_lists.setdefault(device_id, [])
+
+    def tracked_devices(self):
+        """
+        :return: list of the device ids still tracked
+        """
+        return list(self.serial_numbers)
+
+    def query_devices(self):
+        """
+        Retrieve the PnP device records for all the tracked devices. The query is filtered by serial number when the
+        serial numbers of all tracked devices are known
+        :return: generator of dnac_models.PnPDevice
+        """
+        serial_list = list(self.serial_numbers.values())
+        if None in serial_list:
+            for pnp_device in dnac_apis.pnp_query_devices(self.dnac_jwt_token):
+                yield pnp_device
+            return
+        for index in range(0, len(serial_list), SERIAL_FILTER_SIZE):
+            serial_filter = serial_list[index:index + SERIAL_FILTER_SIZE]
+            for pnp_device in dnac_apis.pnp_query_devices(self.dnac_jwt_token, serial_number=serial_filter):
+                yield pnp_device
+
+    def poll(self):
+        """
+        Poll the PnP device list once, and find the state changes for the tracked devices
+        :return: list of transition events, (device id, previous state, new state, timestamp)
+        """
+        event_list = []
+        timestamp = time.time()
+        for pnp_device in self.query_devices():
+            device_id = pnp_device.pnp_id
+            if device_id not in self.serial_numbers:
+                continue
+            previous_state = self.device_states.get(device_id)
+            device_state = pnp_device.state
+            if device_state == previous_state:
+                continue
+            self.device_states[device_id] = device_state
+            self.status_lists[device_id].append((device_state, timestamp))
+            event_list.append((device_id, previous_state, device_state, timestamp))
+            if device_state in PNP_FINAL_STATES:
+                del self.serial_numbers[device_id]
+        return event_list
+
+    def run(self, timeout=None, on_transition=None):
+        """
+        Poll the PnP device list until all the devices reach one of the {PNP_FINAL_STATES}, or the {timeout}. The
+        devices still tracked at the timeout, example stuck in Onboarding or removed from the PnP database, are moved
+        to the {PNP_TIMEOUT_STATE}. After {max_errors} consecutive poll errors a new DNA C token is created
+        :param timeout: maximum time to track the devices, in seconds, {None} for no limit
+        :param on_transition: function called for each transition event, optional
+        :return: dict with the status list for each device id, list of (state, timestamp)
+        """
+        end_time = None if timeout is None else time.time() + timeout
+        while self.serial_numbers:
+            try:
+                event_list = self.poll()
+                self.poll_errors = 0
+            except Exception:
+                event_list = []
+                self.poll_errors += 1
+                LOGGER.exception('PnP state poll failed, consecutive errors: %d', self.poll_errors)
+                if self.poll_errors >= self.max_errors:
+                    self.refresh_token()
+            if end_time is not None and time.time() >= end_time:
+                event_list += self.expire_devices()
+            if on_transition:
+                for event in event_list:
+                    on_transition(*event)
+            if not self.serial_numbers:
+                break
+            time.sleep(self.poll_interval)
+        return self.status_lists
+
+    def refresh_token(self):
+        """
+        Create a new DNA C token, the token may be expired
+        """
+        try:
+            self.dnac_jwt_token = dnac_apis.get_dnac_token(max_age=0)
+            self.poll_errors = 0
+        except Exception:
+            LOGGER.exception('DNA C token refresh failed')
+
+    def expire_devices(self):
+        """
+        Stop tracking all the devices, the devices are moved to the {PNP_TIMEOUT_STATE}
+        :return: list of transition events, (device id, previous state, new state, timestamp)
+        """
+        event_list = []
+        timestamp = time.time()
+        for device_id in list(self.serial_numbers):
+            event_list.append((device_id, self.device_states.get(device_id), PNP_TIMEOUT_STATE, timestamp))
+            self.device_states[device_id] = PNP_TIMEOUT_STATE
+            self.status_lists[device_id].append((PNP_TIMEOUT_STATE, timestamp))
+            del self.serial_numbers[device_id]
+        return event_list
@@ -6,12 +6,23 @@
 
 # This file contains the ServiceNow functions to be used during the demo
 
-import requests
 import json
 import utils
+import metrics
+import dnac_cache
+import dnac_models
 
 
-from config import SNOW_ADMIN, SNOW_PASS, SNOW_URL
+from config import SNOW_ADMIN, SNOW_PASS, SNOW_URL, SNOW_CACHE_TTL
+
+
+# one HTTP session for all the API calls, the connections are reused, each call is recorded by the metrics module
+SNOW_SESSION = metrics.TimedSession()
+
+# the incidents created or retrieved, and the users sys_id, reused to find the incident and the caller sys_id. The
+# entries expire after SNOW_CACHE_TTL seconds, the closed and deleted incidents are removed
+INCIDENTS = dnac_cache.TTLCache(SNOW_CACHE_TTL)  # incident number: dnac_models.Incident
+USER_SYS_IDS = dnac_cache.TTLCache(SNOW_CACHE_TTL)  # username: user sys_id
 
 
 # users roles :
@@ -27,7 +38,7 @@ def get_last_incidents_list(incident_count):
     """
     url = SNOW_URL + '/table/incident?sysparm_limit=' + str(incident_count)
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
+    response = SNOW_SESSION.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
     incident_json = response.json()
     incident_info = incident_json['result']
     incident_list = []
@@ -44,12 +55,27 @@ def get_last_incidents_info(incident_count):
     """
     url = SNOW_URL + '/table/incident?sysparm_limit=' + str(incident_count)
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
+    response = SNOW_SESSION.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
     incident_json = response.json()
     incident_info = incident_json['result']
     return incident_info
 
 
+def get_last_incident_records(incident_count):
+    """
+    This function will return the last {incident_count} number of incidents, as compact records
+    :param incident_count: number of incidents
+    :return: list of dnac_models.Incident
+    """
+    url = SNOW_URL + '/table/incident?sysparm_limit=' + str(incident_count)
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    response = SNOW_SESSION.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
+    incident_list = [dnac_models.Incident.from_json(incident) for incident in response.json()['result']]
+    for incident in incident_list:
+        INCIDENTS.set(incident.number, incident)
+    return incident_list
+
+
 def get_incident_detail(incident):
     """
     This function will return the incident information for the incident with the number {incident}
@@ -59,7 +85,7 @@ def get_incident_detail(incident):
     incident_sys_id = get_incident_sys_id(incident)
     url = SNOW_URL + '/table/incident/' + incident_sys_id
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
+    response = SNOW_SESSION.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
     incident_json = response.json()
     return incident_json['result']
 
@@ -82,10 +108,11 @@ def create_incident(description, comment, username, severity):
                'priority': severity
                }
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.post(url, auth=(username, SNOW_PASS), data=json.dumps(payload), headers=headers)
+    response = SNOW_SESSION.post(url, auth=(username, SNOW_PASS), data=json.dumps(payload), headers=headers)
     incident_json = response.json()
-
-    return incident_json['result']['number']
+    incident = dnac_models.Incident.from_json(incident_json['result'])
+    INCIDENTS.set(incident.number, incident)
+    return incident.number
 
 
 def update_incident(incident, comment, username):
@@ -101,20 +128,26 @@ def update_incident(incident, comment, username):
     payload = {'comments': (comment + '\n\nUpdated using APIs by caller: ' + username),
                'caller_id': caller_sys_id}
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.patch(url, auth=(username, SNOW_PASS), data=json.dumps(payload), headers=headers)
+    response = SNOW_SESSION.patch(url, auth=(username, SNOW_PASS), data=json.dumps(payload), headers=headers)
 
 
 def get_incident_sys_id(incident):
     """
-    This function will find the incident sys_id for the incident with the number {incident}
+    This function will find the incident sys_id for the incident with the number {incident}, the incidents created or
+    retrieved before are not retrieved again
     :param incident: incident number
     :return: incident sys_id
     """
+    incident_record = INCIDENTS.get(incident)
+    if incident_record is not None and incident_record.sys_id:
+        return incident_record.sys_id
     url = SNOW_URL + '/table/incident?sysparm_limit=1&number=' + incident
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
+    response = SNOW_SESSION.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
     incident_json = response.json()
-    return incident_json['result'][0]['sys_id']
+    incident_record = dnac_models.Incident.from_json(incident_json['result'][0])
+    INCIDENTS.set(incident, incident_record)
+    return incident_record.sys_id
 
 
 def close_incident(incident, username):
@@ -132,20 +165,27 @@ def close_incident(incident, username):
                'caller_id': caller_id,
                'close_notes': ('Closed using APIs by caller: ' + username)}
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.put(url, auth=(username, SNOW_PASS), data=json.dumps(payload), headers=headers)
+    response = SNOW_SESSION.put(url, auth=(username, SNOW_PASS), data=json.dumps(payload), headers=headers)
+    if response.ok:
+        INCIDENTS.invalidate(incident)
 
 
 def get_user_sys_id(username):
     """
-    This function will retrieve the user sys_id for the user with the name {username}
+    This function will retrieve the user sys_id for the user with the name {username}, retrieved once for each user
     :param username: the username
     :return: user sys_id
     """
+    user_sys_id = USER_SYS_IDS.get(username)
+    if user_sys_id is not None:
+        return user_sys_id
     url = SNOW_URL + '/table/sys_user?sysparm_limit=1&name=' + username
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.get(url, auth=(username, SNOW_PASS), headers=headers)
+    response = SNOW_SESSION.get(url, auth=(username, SNOW_PASS), headers=headers)
     user_json = response.json()
-    return user_json['result'][0]['sys_id']
+    user_sys_id = user_json['result'][0]['sys_id']
+    USER_SYS_IDS.set(username, user_sys_id)
+    return user_sys_id
 
 
 def get_incident_comments(incident):
@@ -157,7 +197,7 @@ def get_incident_comments(incident):
     incident_sys_id = get_incident_sys_id(incident)
     url = SNOW_URL + '/table/sys_journal_field?sysparm_query=element_id=' + incident_sys_id
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
+    response = SNOW_SESSION.get(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
     comments_json = response.json()['result']
     return comments_json
 
@@ -171,7 +211,8 @@ def delete_incident(incident):
     incident_id = get_incident_sys_id(incident)
     url = SNOW_URL + '/table/incident/' + incident_id
     headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
-    response = requests.delete(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
+    response = SNOW_SESSION.delete(url, auth=(SNOW_ADMIN, SNOW_PASS), headers=headers)
+    INCIDENTS.invalidate(incident)
     return response.status_code
 
 
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+
+# developed by Gabi Zapodeanu, TME, Enterprise Networks, Cisco Systems
+
+
+# This file contains the site plan loader, to provision the site hierarchy (sites, buildings, floors) from a
+# declarative YAML or CSV file. Only the missing nodes are created, level by level, in parallel within each level.
+
+import csv
+import sys
+import urllib3
+
+import dnac_apis
+import log_config
+import geo_cache
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.auth import HTTPBasicAuth  # for Basic Auth
+from urllib3.exceptions import InsecureRequestWarning  # for insecure https warnings
+
+from config import DNAC_PASS, DNAC_USER
+from config import SITE_PLAN_WORKERS
+
+urllib3.disable_warnings(InsecureRequestWarning)  # disable insecure https warnings
+
+DNAC_AUTH = HTTPBasicAuth(DNAC_USER, DNAC_PASS)
+
+
+def load_site_plan(plan_file):
+    """
+    This function will load the site plan from the YAML or CSV file {plan_file}.
+    CSV columns: site, building, address, floor, floor_number. The building and floor columns may be empty.
+    YAML format:
+        sites:
+          - name: PDX
+            buildings:
+              - name: PDX-01
+                address: 1 Main Street, Portland, OR 97201, United States
+                floors:
+                  - name: Floor 1
+                    number: 1
+    :param plan_file: site plan file name, .yaml, .yml or .csv
+    :return: site plan - dict with the {sites}, {buildings} and {floors} to provision
+    """
+    site_plan = {'sites': [], 'buildings': {}, 'floors': {}}
+    if plan_file.endswith(('.yaml', '.yml')):
+        import yaml  # optional dependency, only required for YAML site plans
+        with open(plan_file, 'r') as yaml_file:
+            plan_info = yaml.safe_load(yaml_file)
+        for site in plan_info['sites']:
+            add_site_plan_node(site_plan, site['name'])
+            for building in site.get('buildings', []):
+                add_site_plan_node(site_plan, site['name'], building['name'], building.get('address'))
+                for floor in building.get('floors', []):
+                    add_site_plan_node(site_plan, site['name'], building['name'], building.get('address'),
+                                       floor['name'], floor.get('number', 1))
+    else:
+        with open(plan_file, 'r') as csv_file:
+            for row in csv.DictReader(csv_file):
+                add_site_plan_node(site_plan, row['site'], row.get('building'), row.get('address'),
+                                   row.get('floor'), row.get('floor_number') or 1)
+    return site_plan
+
+
+def add_site_plan_node(site_plan, site_name, building_name=None, address=None, floor_name=None, floor_number=1):
+    """
+    This function will add the site, building and floor to the {site_plan}
+    :param site_plan: site plan
+    :param site_name: site name
+    :param building_name: building name, optional
+    :param address: building address
+    :param floor_name: floor name, optional
+    :param floor_number: floor number
+    :return:
+    """
+    if site_name not in site_plan['sites']:
+        site_plan['sites'].append(site_name)
+    if building_name:
+        site_plan['buildings'].setdefault((site_name, building_name), address)
+        if floor_name:
+            site_plan['floors'][(site_name, building_name, floor_name)] = int(floor_number)
+
+
+def get_site_hierarchy(dnac_jwt_token):
+    """
+    This function will return the current DNA C site hierarchy, using one API call
+    :param dnac_jwt_token: DNA C token
+    :return: dict with the site ids, key {group name hierarchy}, example 'Global/PDX/PDX-01/Floor 1'
+    """
+    site_hierarchy = {}
+    for site in dnac_apis.get_all_site_records(dnac_jwt_token):
+        site_hierarchy[site.hierarchy] = site.site_id
+    return site_hierarchy
+
+
+def diff_site_plan(site_plan, site_hierarchy):
+    """
+    This function will compare the {site_plan} with the current {site_hierarchy} and return the missing nodes
+    :param site_plan: site plan
+    :param site_hierarchy: current site hierarchy
+    :return: dict with the missing {sites}, {buildings} and {floors}
+    """
+    missing_sites = [site for site in site_plan['sites'] if 'Global/' + site not in site_hierarchy]
+    missing_buildings = {key: address for key, address in site_plan['buildings'].items()
+                         if 'Global/' + '/'.join(key) not in site_hierarchy}
+    missing_floors = {key: number for key, number in site_plan['floors'].items()
+                      if 'Global/' + '/'.join(key) not in site_hierarchy}
+    return {'sites': missing_sites, 'buildings': missing_buildings, 'floors': missing_floors}
+
+
+def run_parallel(function, args_list):
+    """
+    This function will call the {function} for each of the arguments in the {args_list}, in parallel, using up to
+    {SITE_PLAN_WORKERS} threads
+    :param function: function to call
+    :param args_list: list of arguments tuples
+    :return: list with the results, same order as {args_list}, {None} for the failed calls
+    """
+    def call_function(args):
+        try:
+            return function(*args)
+        except:
+            return None
+
+    if not args_list:
+        return []
+    with ThreadPoolExecutor(max_workers=SITE_PLAN_WORKERS) as executor:
+        return list(executor.map(dnac_apis.with_cluster(call_function), args_list))
+
+
+def provision_site_plan(site_plan, dnac_jwt_token):
+    """
+    This function will create the missing sites, buildings and floors from the {site_plan}.
+    Each level is created in parallel, and all the level tasks are completed before starting the next level.
+    :param site_plan: site plan
+    :param dnac_jwt_token: DNA C token
+    :return: dict with the count of the nodes created, for each level, and the list of failed nodes
+    """
+    site_hierarchy = get_site_hierarchy(dnac_jwt_token)
+    missing_nodes = diff_site_plan(site_plan, site_hierarchy)
+    provision_result = {'sites': 0, 'buildings': 0, 'floors': 0, 'failed': []}
+
+    # create the missing sites
+    site_list = missing_nodes['sites']
+    task_list = run_parallel(dnac_apis.create_site, [(site, dnac_jwt_token) for site in site_list])
+    wait_site_tasks(provision_result, 'sites', site_list, task_list, dnac_jwt_token)
+    if site_list:
+        site_hierarchy = get_site_hierarchy(dnac_jwt_token)
+
+    # create the missing buildings, the geolocation info for all addresses is found using one bulk cache lookup. The
+    # buildings without an address in the site plan can't be created, and are reported as failed
+    geo_info_dict = geo_cache.get_geo_info_bulk([address for address in missing_nodes['buildings'].values()
+                                                 if address and address.strip()])
+    building_list = []
+    args_list = []
+    for (site_name, building_name), address in missing_nodes['buildings'].items():
+        site_id = site_hierarchy.get('Global/' + site_name)
+        geo_info = geo_info_dict.get(address) if address and address.strip() else None
+        if site_id is None or geo_info is None:
+            provision_result['failed'].append(site_name + '/' + building_name)
+            continue
+        building_list.append(site_name + '/' + building_name)
+        args_list.append((site_name, building_name, address, dnac_jwt_token, site_id, geo_info))
+    task_list = run_parallel(dnac_apis.create_building, args_list)
+    wait_site_tasks(provision_result, 'buildings', building_list, task_list, dnac_jwt_token)
+    if building_list:
+        site_hierarchy = get_site_hierarchy(dnac_jwt_token)
+
+    # create the missing floors
+    floor_list = []
+    args_list = []
+    for (site_name, building_name, floor_name), floor_number in missing_nodes['floors'].items():
+        building_id = site_hierarchy.get('Global/' + site_name + '/' + building_name)
+        if building_id is None:
+            provision_result['failed'].append(site_name + '/' + building_name + '/' + floor_name)
+            continue
+        floor_list.append(site_name + '/' + building_name + '/' + floor_name)
+        args_list.append((building_name, floor_name, floor_number, dnac_jwt_token, building_id))
+    task_list = run_parallel(dnac_apis.create_floor, args_list)
+    wait_site_tasks(provision_result, 'floors', floor_list, task_list, dnac_jwt_token)
+
+    return provision_result
+
+
+def wait_site_tasks(provision_result, level, node_list, task_list, dnac_jwt_token):
+    """
+    This function will wait for the site creation tasks for one level, and update the {provision_result}
+    :param provision_result: provision result
+    :param level: level name - {sites}, {buildings} or {floors}
+    :param node_list: list of the nodes names
+    :param task_list: list of the creation task ids, same order as {node_list}
+    :param dnac_jwt_token: DNA C token
+    :return:
+    """
+    task_status = dnac_apis.wait_task_list(task_list, dnac_jwt_token)
+    for node_name, task_id in zip(node_list, task_list):
+        if task_status.get(task_id) == 'SUCCESS':
+            provision_result[level] += 1
+        else:
+            provision_result['failed'].append(node_name)
+
+
+def main(plan_file):
+    """
+    This application will:
+    - load the site plan from the {plan_file}
+    - compare the site plan with the DNA C site hierarchy
+    - create the missing sites, buildings and floors
+    """
+
+    print('\n\nApplication "site_plan.py" started')
+
+    # logging, JSON records, to the rotating log file {LOG_FILE}
+    log_config.setup_logging()
+
+    site_plan = load_site_plan(plan_file)
+    print('\nSite plan: ', len(site_plan['sites']), ' sites, ', len(site_plan['buildings']), ' buildings, ',
+          len(site_plan['floors']), ' floors')
+
+    dnac_token = dnac_apis.get_dnac_jwt_token(DNAC_AUTH)
+
+    provision_result = provision_site_plan(site_plan, dnac_token)
+    print('\nCreated: ', provision_result['sites'], ' sites, ', provision_result['buildings'], ' buildings, ',
+          provision_result['floors'], ' floors')
+    for node_name in provision_result['failed']:
+        print('Failed to create: ', node_name)
+
+    print('\n\nEnd of Application "site_plan.py" Run')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])